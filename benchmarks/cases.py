@@ -0,0 +1,302 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Cases of the benchmark suite.
+
+The cases are named ``<group>/<variant>/<size>``, the groups being:
+
+* ``ec``: error reconciliation between Alice and Bob over the loopback transport, with the JSON serialization of the messages;
+* ``pa``: extraction of the final key with the extractors;
+* ``messages``: encoding and serialization of the EC_INITIALIZATION content and of the key replies of the servers.
+
+The data of a case is only generated when the case is prepared, so that the
+cases that are filtered out cost nothing.
+"""
+
+import json
+import threading
+from typing import Callable, List, Sequence
+
+import numpy as np
+
+from qosst_core.control_protocol.codes import QOSSTCodes
+
+from qosst_pp.encoding import (
+    BINARY_ENCODING,
+    LIST_ENCODING,
+    decode_fields,
+    encode_fields,
+)
+from qosst_pp.extractors import EXTRACTORS
+from qosst_pp.loopback import LoopbackServer, loopback_pair
+from qosst_pp.messages import key_frames
+from qosst_pp.reconciliation.reconciliation import reconcile_alice, reconcile_bob
+from qosst_pp.synthetic import generate_symbols
+
+BETA = 0.95  #: Reconciliation efficiency.
+SIGNAL_TO_NOISE_RATIO = 1.0  #: Signal to noise ratio of the symbols.
+MDR_DIMENSION = 8  #: Dimension of the multidimensional reconciliation.
+SECRET_KEY_RATIO = 0.1  #: Ratio of the final key length to the reconciled key length.
+
+SIZES = (1 << 16, 1 << 18, 1 << 20)  #: Sizes of the cases, in symbols or bits.
+QUICK_SIZES = (1 << 14, 1 << 16)  #: Sizes of the cases in quick mode.
+
+
+# pylint: disable=too-few-public-methods
+class Case:
+    """
+    Case of the benchmark suite.
+    """
+
+    name: str  #: Name of the case.
+    amount: int  #: Number of symbols or bits processed by a run.
+    unit: str  #: Unit of the amount.
+
+    def __init__(
+        self,
+        name: str,
+        amount: int,
+        unit: str,
+        setup: Callable[[], Callable[[], None]],
+    ):
+        """
+        Args:
+            name (str): name of the case.
+            amount (int): number of symbols or bits processed by a run.
+            unit (str): unit of the amount.
+            setup (Callable[[], Callable[[], None]]): function generating the data of the case and returning the function to time.
+        """
+        self.name = name
+        self.amount = amount
+        self.unit = unit
+        self._setup = setup
+
+    def prepare(self) -> Callable[[], None]:
+        """
+        Generate the data of the case.
+
+        Returns:
+            Callable[[], None]: the function to time.
+        """
+        return self._setup()
+
+
+def _run_alice(server: LoopbackServer, alice_symbols: np.ndarray):
+    """
+    Run the error reconciliation of Alice.
+
+    Args:
+        server (LoopbackServer): loopback socket of Alice.
+        alice_symbols (np.ndarray): symbols of Alice.
+    """
+    try:
+        code, data = server.recv()
+        if code == QOSSTCodes.EC_INITIALIZATION:
+            reconcile_alice(server, alice_symbols, MDR_DIMENSION, data)
+    finally:
+        server.close()
+
+
+def _reconciliation(num_symbols: int, encoding: str, batches: int = 1) -> Callable:
+    """
+    Prepare an error reconciliation case.
+
+    Args:
+        num_symbols (int): number of symbols.
+        encoding (str): encoding of the arrays in the messages.
+        batches (int, optional): number of batches of the pipelined mode, or 1 to reconcile all the symbols at once. Defaults to 1.
+
+    Returns:
+        Callable: the function to time.
+    """
+    alice_symbols, bob_symbols = generate_symbols(
+        num_symbols, SIGNAL_TO_NOISE_RATIO, MDR_DIMENSION, seed=0
+    )
+
+    def run():
+        server, client = loopback_pair()
+        alice = threading.Thread(target=_run_alice, args=(server, alice_symbols))
+        alice.start()
+        try:
+            key = reconcile_bob(
+                client,
+                bob_symbols,
+                BETA,
+                SIGNAL_TO_NOISE_RATIO,
+                MDR_DIMENSION,
+                encoding=encoding,
+                batch_size=num_symbols // batches if batches > 1 else None,
+            )
+        finally:
+            client.close()
+            alice.join()
+        if key is None:
+            raise RuntimeError("The reconciliation failed.")
+
+    return run
+
+
+def _extraction(extractor: str, key_size: int) -> Callable:
+    """
+    Prepare a privacy amplification case.
+
+    Args:
+        extractor (str): name of the extractor, in :data:`qosst_pp.extractors.EXTRACTORS`.
+        key_size (int): number of bits of the reconciled key.
+
+    Returns:
+        Callable: the function to time.
+    """
+    rng = np.random.default_rng(0)
+    key = rng.integers(0, 2, key_size, dtype=np.uint8)
+    instance = EXTRACTORS[extractor](key_size, int(key_size * SECRET_KEY_RATIO))
+    seed = rng.integers(0, 2, instance.seed_size, dtype=np.uint8)
+
+    def run():
+        final_key, _ = instance.extract(key, seed)
+        if final_key is None:
+            raise RuntimeError("The extraction failed.")
+
+    return run
+
+
+def _initialization_message(num_symbols: int, encoding: str) -> Callable:
+    """
+    Prepare a case encoding, serializing and decoding an EC_INITIALIZATION content.
+
+    Args:
+        num_symbols (int): number of symbols.
+        encoding (str): encoding of the arrays.
+
+    Returns:
+        Callable: the function to time.
+    """
+    rng = np.random.default_rng(0)
+    content = {
+        "channel_message": rng.normal(size=num_symbols),
+        "syndrome": rng.integers(0, 2, num_symbols // 2, dtype=np.uint8),
+        "normalization_vector": rng.normal(size=num_symbols // MDR_DIMENSION),
+    }
+    arrays = {"channel_message": np.float64, "normalization_vector": np.float64}
+
+    def run():
+        serialized = json.dumps(
+            encode_fields(content, encoding, arrays=arrays, bits=("syndrome",))
+        )
+        decode_fields(json.loads(serialized), arrays=arrays, bits=("syndrome",))
+
+    return run
+
+
+def _key_reply(key_size: int, multipart: bool) -> Callable:
+    """
+    Prepare a case building and parsing the reply of a server containing a key.
+
+    Args:
+        key_size (int): number of bits of the key.
+        multipart (bool): if True, use the multipart format, otherwise use the JSON format.
+
+    Returns:
+        Callable: the function to time.
+    """
+    key = np.random.default_rng(0).integers(0, 2, key_size, dtype=np.uint8)
+
+    def run():
+        frames = key_frames(key, multipart)
+        header = json.loads(frames[0])
+        if multipart:
+            np.unpackbits(frames[1], count=header["key_length"])
+        else:
+            np.asarray(header["key"], dtype=np.uint8)
+
+    return run
+
+
+def get_cases(sizes: Sequence[int]) -> List[Case]:
+    """
+    Get the cases of the benchmark suite.
+
+    Args:
+        sizes (Sequence[int]): sizes of the cases, in symbols or bits.
+
+    Returns:
+        List[Case]: the cases.
+    """
+    cases = []
+    for size in sizes:
+        cases.extend(
+            [
+                Case(
+                    f"ec/list/{size}",
+                    size,
+                    "symbols",
+                    lambda size=size: _reconciliation(size, LIST_ENCODING),
+                ),
+                Case(
+                    f"ec/binary/{size}",
+                    size,
+                    "symbols",
+                    lambda size=size: _reconciliation(size, BINARY_ENCODING),
+                ),
+                Case(
+                    f"ec/pipelined/{size}",
+                    size,
+                    "symbols",
+                    lambda size=size: _reconciliation(size, BINARY_ENCODING, 4),
+                ),
+            ]
+        )
+    for size in sizes:
+        cases.extend(
+            Case(
+                f"pa/{extractor}/{size}",
+                size,
+                "bits",
+                lambda extractor=extractor, size=size: _extraction(extractor, size),
+            )
+            for extractor in ("toeplitz", "numpy-toeplitz")
+        )
+    for size in sizes:
+        cases.extend(
+            [
+                Case(
+                    f"messages/initialization-list/{size}",
+                    size,
+                    "symbols",
+                    lambda size=size: _initialization_message(size, LIST_ENCODING),
+                ),
+                Case(
+                    f"messages/initialization-binary/{size}",
+                    size,
+                    "symbols",
+                    lambda size=size: _initialization_message(size, BINARY_ENCODING),
+                ),
+                Case(
+                    f"messages/key-json/{size}",
+                    size,
+                    "bits",
+                    lambda size=size: _key_reply(size, False),
+                ),
+                Case(
+                    f"messages/key-multipart/{size}",
+                    size,
+                    "bits",
+                    lambda size=size: _key_reply(size, True),
+                ),
+            ]
+        )
+    return cases
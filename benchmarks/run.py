@@ -0,0 +1,355 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Runner of the benchmark suite of qosst-pp.
+
+Each case is run once to warm up, and then timed several times. The median and
+the best times are recorded in a JSON file, together with the environment of
+the run. The results can be compared to a baseline recorded previously: a case
+is a regression if its median time exceeds the median time of the baseline by
+more than the tolerance.
+
+The error reconciliation uses IR_for_CVQKD if it is installed, and the stub of
+``benchmarks/stub`` otherwise (see ``--ir``). The baselines should only be
+compared between runs with the same backend on the same machine.
+
+Example:
+    python benchmarks/run.py --output results.json --baseline baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import fnmatch
+import argparse
+import platform
+import statistics
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+#: Directory of the stub of information_reconciliation.
+STUB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub")
+
+DEFAULT_TOLERANCE = 0.25  #: Default tolerated relative slowdown.
+
+
+def _select_backend(backend: str) -> str:
+    """
+    Make the selected information_reconciliation module importable.
+
+    This must be done before importing the reconciliation of qosst-pp.
+
+    Args:
+        backend (str): "library", "stub" or "auto" to use the library if it is installed.
+
+    Raises:
+        ModuleNotFoundError: if the library is requested and not installed.
+
+    Returns:
+        str: the used backend, "library" or "stub".
+    """
+    if backend != "stub":
+        try:
+            # pylint: disable=import-outside-toplevel, unused-import
+            import information_reconciliation
+
+            return "library"
+        except ModuleNotFoundError:
+            if backend == "library":
+                raise
+    sys.path.insert(0, STUB_PATH)
+    return "stub"
+
+
+def _environment(backend: str) -> Dict:
+    """
+    Describe the environment of the run.
+
+    Args:
+        backend (str): the information_reconciliation backend.
+
+    Returns:
+        Dict: the environment.
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+
+    from qosst_pp import __version__
+    from qosst_pp.extractors import HAS_CRYPTOMITE
+
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "qosst_pp": __version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpu_count": os.cpu_count(),
+        "information_reconciliation": backend,
+        "cryptomite": HAS_CRYPTOMITE,
+    }
+
+
+def run_cases(cases: List, repeat: int) -> Dict[str, Dict]:
+    """
+    Time the cases.
+
+    Args:
+        cases (List[Case]): the cases.
+        repeat (int): number of timed runs of each case.
+
+    Returns:
+        Dict[str, Dict]: the results by name of case, with the median and best times in seconds and the median throughput.
+    """
+    results = {}
+    for case in cases:
+        run = case.prepare()
+        run()
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        median = statistics.median(times)
+        results[case.name] = {
+            "median": median,
+            "best": min(times),
+            "amount": case.amount,
+            "unit": case.unit,
+            "throughput": case.amount / median,
+        }
+        print(
+            f"{case.name:<42} {median * 1e3:>10.3f} ms {case.amount / median:>14,.0f} {case.unit}/s",
+            flush=True,
+        )
+    return results
+
+
+def _tolerance(
+    name: str, tolerance: float, tolerances: List[Tuple[str, float]]
+) -> float:
+    """
+    Get the tolerance of a case.
+
+    Args:
+        name (str): name of the case.
+        tolerance (float): default tolerance.
+        tolerances (List[Tuple[str, float]]): tolerances by pattern of names, the last matching pattern being used.
+
+    Returns:
+        float: the tolerated relative slowdown.
+    """
+    for pattern, value in tolerances:
+        if fnmatch.fnmatch(name, pattern):
+            tolerance = value
+    return tolerance
+
+
+def compare(
+    results: Dict[str, Dict],
+    baseline: Dict[str, Dict],
+    tolerance: float,
+    tolerances: List[Tuple[str, float]],
+) -> List[str]:
+    """
+    Compare the results to a baseline and print the comparison.
+
+    Args:
+        results (Dict[str, Dict]): results of the run, by name of case.
+        baseline (Dict[str, Dict]): results of the baseline, by name of case.
+        tolerance (float): default tolerated relative slowdown.
+        tolerances (List[Tuple[str, float]]): tolerances by pattern of names.
+
+    Returns:
+        List[str]: names of the cases that regressed.
+    """
+    regressions = []
+    print(f"\n{'case':<42} {'baseline':>13} {'current':>13} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<42} {'new':>13} {result['median'] * 1e3:>10.3f} ms")
+            continue
+        reference = baseline[name]["median"]
+        change = result["median"] / reference - 1
+        status = ""
+        if change > _tolerance(name, tolerance, tolerances):
+            status = "REGRESSION"
+            regressions.append(name)
+        print(
+            f"{name:<42} {reference * 1e3:>10.3f} ms {result['median'] * 1e3:>10.3f} ms {change:>+8.1%} {status}"
+        )
+    return regressions
+
+
+def _parse_tolerance(value: str) -> Tuple[str, float]:
+    """
+    Parse a PATTERN=TOLERANCE argument.
+
+    Args:
+        value (str): the argument.
+
+    Raises:
+        argparse.ArgumentTypeError: if the argument is malformed.
+
+    Returns:
+        Tuple[str, float]: the pattern and the tolerance.
+    """
+    pattern, _, tolerance = value.rpartition("=")
+    try:
+        if pattern:
+            return pattern, float(tolerance)
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"{value} is not of the form PATTERN=TOLERANCE.")
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    """
+    Create the parser of the benchmark runner.
+
+    Returns:
+        argparse.ArgumentParser: the argument parser.
+    """
+    parser = argparse.ArgumentParser(
+        prog="benchmarks/run.py", description="Run the benchmark suite of qosst-pp."
+    )
+    parser.add_argument(
+        "-k",
+        "--filter",
+        action="append",
+        default=[],
+        help="Only run the cases matching this pattern (e.g. 'ec/*'). Can be repeated.",
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="Only run the cases of small sizes."
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Number of timed runs of each case."
+    )
+    parser.add_argument(
+        "--ir",
+        choices=["auto", "library", "stub"],
+        default="auto",
+        help="information_reconciliation module to use: IR_for_CVQKD, the stub, or IR_for_CVQKD if it is installed.",
+    )
+    parser.add_argument(
+        "-o", "--output", default=None, help="Write the results to this JSON file."
+    )
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        default=None,
+        help="Compare the results to this JSON file, written by a previous run.",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Write the results to the baseline file instead of failing on regressions.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Tolerated relative slowdown with respect to the baseline.",
+    )
+    parser.add_argument(
+        "--tolerance-for",
+        type=_parse_tolerance,
+        action="append",
+        default=[],
+        metavar="PATTERN=TOLERANCE",
+        help="Tolerated relative slowdown for the cases matching the pattern (e.g. 'ec/*=0.5'). Can be repeated, the last matching pattern is used.",
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Entrypoint of the benchmark runner.
+
+    Args:
+        argv (Optional[List[str]], optional): the arguments, or None to use the ones of the command line. Defaults to None.
+
+    Returns:
+        int: 0 on success, 1 if a case regressed.
+    """
+    parser = _create_parser()
+    args = parser.parse_args(argv)
+    if (
+        args.baseline is not None
+        and not args.update_baseline
+        and not os.path.exists(args.baseline)
+    ):
+        parser.error(f"Baseline {args.baseline} does not exist.")
+
+    backend = _select_backend(args.ir)
+    # The cases import the reconciliation, which imports information_reconciliation
+    # pylint: disable=import-outside-toplevel
+    from cases import QUICK_SIZES, SIZES, get_cases
+
+    cases = get_cases(QUICK_SIZES if args.quick else SIZES)
+    if args.filter:
+        cases = [
+            case
+            for case in cases
+            if any(fnmatch.fnmatch(case.name, pattern) for pattern in args.filter)
+        ]
+
+    environment = _environment(backend)
+    print(
+        f"qosst-pp {environment['qosst_pp']}, Python {environment['python']}, NumPy {environment['numpy']}, "
+        f"information_reconciliation: {backend}, cryptomite: {environment['cryptomite']}\n"
+    )
+    output = {"environment": environment, "results": run_cases(cases, args.repeat)}
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(output, file, indent=4)
+
+    regressions = []
+    if args.baseline is not None and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        if (
+            baseline["environment"]["information_reconciliation"] != backend
+            or baseline["environment"]["machine"] != environment["machine"]
+        ):
+            print(
+                "\nWarning: the baseline was recorded with another backend or on another machine."
+            )
+        regressions = compare(
+            output["results"],
+            baseline["results"],
+            args.tolerance,
+            args.tolerance_for,
+        )
+
+    if args.baseline is not None and args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(output, file, indent=4)
+        print(f"\nBaseline {args.baseline} updated.")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
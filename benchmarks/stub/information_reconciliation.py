@@ -0,0 +1,160 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Stub of the information_reconciliation module of IR_for_CVQKD, for the benchmarks.
+
+The stub has the same interface and returns values of the same types as the
+library, with frames of :data:`FRAME_SIZE` symbols, but does not perform any
+error correction: the raw key of Bob is the sign of his symbols, and Alice
+recovers it from the channel message instead of decoding it with her symbols,
+so that all the frames are kept. The syndromes and CRCs are still computed and
+checked.
+
+The benchmarks run with the stub hence measure the cost of qosst-pp around the
+library (encoding of the messages, protocol, splitting and concatenation of the
+frames), not the cost of the LDPC decoding.
+"""
+
+import zlib
+from typing import List, Tuple
+
+import numpy as np
+
+FRAME_SIZE = 4096  #: Number of symbols per frame.
+SYNDROME_SIZE = 512  #: Number of bits of the syndrome of a frame.
+
+
+def _syndromes(frames: np.ndarray) -> np.ndarray:
+    """
+    Compute the syndromes of the frames, as parities of consecutive bits.
+
+    Args:
+        frames (np.ndarray): the frames, as a 2D array of bits.
+
+    Returns:
+        np.ndarray: the syndromes, as a 2D array of bits.
+    """
+    return np.bitwise_xor.reduce(
+        frames.reshape(len(frames), SYNDROME_SIZE, -1), axis=2
+    ).astype(np.uint8)
+
+
+def _crc(frame: np.ndarray) -> int:
+    """
+    Compute the CRC-32 of a frame.
+
+    Args:
+        frame (np.ndarray): the frame, as an array of bits.
+
+    Returns:
+        int: the CRC.
+    """
+    return zlib.crc32(np.packbits(np.asarray(frame, dtype=np.uint8)).tobytes())
+
+
+# pylint: disable=invalid-name
+def reconcile_Bob(
+    bob_states, beta: float, SNR: float, MDR_dim: int
+) -> Tuple[List[float], List[int], List[float], List[List[int]]]:
+    """
+    Encode the frames of Bob.
+
+    Args:
+        bob_states (ArrayLike): symbols of Bob.
+        beta (float): reconciliation efficiency (unused).
+        SNR (float): signal to noise ratio (unused).
+        MDR_dim (int): dimension of the multidimensional reconciliation.
+
+    Returns:
+        Tuple[List[float], List[int], List[float], List[List[int]]]: the channel message, the syndrome, the normalization vector and the raw key of each frame.
+    """
+    del beta, SNR
+    frame_count = len(bob_states) // FRAME_SIZE
+    symbols = np.asarray(bob_states, dtype=np.float64)[: frame_count * FRAME_SIZE]
+    normalization_vector = np.linalg.norm(symbols.reshape(-1, MDR_dim), axis=1)
+    channel_message = symbols / np.repeat(normalization_vector, MDR_dim)
+    frames = (symbols > 0).astype(np.uint8).reshape(frame_count, FRAME_SIZE)
+    return (
+        channel_message.tolist(),
+        _syndromes(frames).ravel().tolist(),
+        normalization_vector.tolist(),
+        frames.tolist(),
+    )
+
+
+# pylint: disable=invalid-name, too-many-arguments, too-many-positional-arguments
+def reconcile_Alice(
+    alice_states,
+    classical_channel_message,
+    syndrome,
+    normalization_vector,
+    SNR: float,
+    MDR_dim: int,
+) -> Tuple[List[int], List[int], List[List[int]]]:
+    """
+    Decode the frames of Alice.
+
+    Args:
+        alice_states (ArrayLike): symbols of Alice (unused).
+        classical_channel_message (ArrayLike): channel message of Bob.
+        syndrome (ArrayLike): syndrome of Bob.
+        normalization_vector (ArrayLike): normalization vector of Bob (unused).
+        SNR (float): signal to noise ratio (unused).
+        MDR_dim (int): dimension of the multidimensional reconciliation (unused).
+
+    Returns:
+        Tuple[List[int], List[int], List[List[int]]]: the CRC, the discard flag and the decoded frame of each frame.
+    """
+    del alice_states, normalization_vector, SNR, MDR_dim
+    channel_message = np.asarray(classical_channel_message, dtype=np.float64)
+    frame_count = len(channel_message) // FRAME_SIZE
+    frames = (channel_message > 0).astype(np.uint8).reshape(frame_count, FRAME_SIZE)
+    discard_flags = np.any(
+        _syndromes(frames)
+        != np.asarray(syndrome, dtype=np.uint8).reshape(frame_count, SYNDROME_SIZE),
+        axis=1,
+    )
+    return (
+        [_crc(frame) for frame in frames],
+        discard_flags.astype(np.uint8).tolist(),
+        frames.tolist(),
+    )
+
+
+# pylint: disable=invalid-name
+def CRC_check_Bob(
+    raw_keys, CRC_Alice, discard_flag
+) -> Tuple[List[int], List[List[int]]]:
+    """
+    Check the CRCs of Alice and keep the frames that were correctly decoded.
+
+    Args:
+        raw_keys (List[List[int]]): raw key of each frame of Bob.
+        CRC_Alice (List[int]): CRC of each frame of Alice.
+        discard_flag (List[int]): discard flag of each frame of Alice.
+
+    Returns:
+        Tuple[List[int], List[List[int]]]: the final discard flags and the kept frames.
+    """
+    final_discard_flags = []
+    kept_frames = []
+    for frame, crc, flag in zip(raw_keys, CRC_Alice, discard_flag):
+        keep = not flag and _crc(frame) == crc
+        final_discard_flags.append(0 if keep else 1)
+        if keep:
+            kept_frames.append(frame)
+    return final_discard_flags, kept_frames
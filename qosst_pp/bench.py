@@ -0,0 +1,394 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Module defining an end-to-end benchmark of the post-processing.
+
+Synthetic correlated symbols are generated at a target signal to noise ratio
+(see :mod:`qosst_pp.synthetic`), and the error reconciliation and the privacy
+amplification of Alice and Bob are run against each other in the same process,
+Alice in a thread, either over QOSST sockets on the loopback interface or over
+the in-process loopback transport (see :mod:`qosst_pp.loopback`).
+"""
+
+import time
+import logging
+import threading
+import socket as pysocket
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+from qosst_core.control_protocol.sockets import QOSSTClient, QOSSTServer
+from qosst_core.control_protocol.codes import QOSSTCodes
+
+from qosst_pp.encoding import LIST_ENCODING
+from qosst_pp.extractors import EXTRACTORS
+from qosst_pp.loopback import LoopbackServer, loopback_pair
+from qosst_pp.privacy_amplification import (
+    privacy_amplification_alice,
+    privacy_amplification_bob,
+)
+from qosst_pp.reconciliation.reconciliation import reconcile_alice, reconcile_bob
+from qosst_pp.seed_pool import SeedPool
+from qosst_pp.synthetic import generate_symbols
+
+logger = logging.getLogger(__name__)
+
+TCP_TRANSPORT = "tcp"  #: QOSST sockets on the loopback interface.
+LOOPBACK_TRANSPORT = "loopback"  #: In-process loopback transport.
+TRANSPORTS = (TCP_TRANSPORT, LOOPBACK_TRANSPORT)  #: Available transports.
+
+CONNECTION_TIMEOUT = 10  #: Time for Bob to connect to Alice, in seconds.
+
+
+def _free_port() -> int:
+    """
+    Pick a free TCP port on the loopback interface.
+
+    Returns:
+        int: the port.
+    """
+    with pysocket.socket(pysocket.AF_INET, pysocket.SOCK_STREAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _connect_bob(port: int) -> QOSSTClient:
+    """
+    Connect Bob to Alice, retrying until Alice waits for the connection.
+
+    Args:
+        port (int): port of Alice.
+
+    Raises:
+        ConnectionError: if Alice did not accept the connection in time.
+
+    Returns:
+        QOSSTClient: the connected socket of Bob.
+    """
+    deadline = time.monotonic() + CONNECTION_TIMEOUT
+    while True:
+        client = QOSSTClient("127.0.0.1", port)
+        client.open()
+        try:
+            client.connect()
+            return client
+        except ConnectionRefusedError:
+            client.close()
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.01)
+
+
+def _stop_listening(server: QOSSTServer):
+    """
+    Stop Alice waiting for the connection of Bob, when Bob could not connect.
+
+    Closing the listening socket does not wake up the thread waiting for the
+    connection, so the socket is shut down instead, which makes the pending
+    accept fail, and Alice then closes her socket. If Alice does not listen
+    yet, the socket is closed so that she fails to listen.
+
+    Args:
+        server (QOSSTServer): opened server socket of Alice.
+    """
+    try:
+        server.host_socket.shutdown(pysocket.SHUT_RDWR)
+    except OSError:
+        server.close()
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+def _run_alice(
+    server: Union[QOSSTServer, LoopbackServer],
+    alice_symbols: np.ndarray,
+    mdr_dimension: int,
+    extractor: str,
+    workers: int,
+    results: Dict,
+):
+    """
+    Run the error reconciliation and privacy amplification of Alice.
+
+    Args:
+        server (Union[QOSSTServer, LoopbackServer]): opened server socket of Alice, closed at the end.
+        alice_symbols (np.ndarray): symbols of Alice.
+        mdr_dimension (int): dimension of the multidimensional reconciliation.
+        extractor (str): name of the extractor, in :data:`qosst_pp.extractors.EXTRACTORS`.
+        workers (int): number of decoding and extraction processes.
+        results (Dict): dict in which the final key of Alice is stored.
+    """
+    try:
+        try:
+            server.connect()
+        except OSError as exc:
+            # The socket was shut down as Bob could not connect
+            logger.error("Bob did not connect (%s).", str(exc))
+            return
+
+        code, data = server.recv()
+        if code != QOSSTCodes.EC_INITIALIZATION:
+            logger.error("Unexpected command %s.", str(code))
+            return
+
+        reconciled_key = reconcile_alice(
+            server, alice_symbols, mdr_dimension, data, workers=workers
+        )
+        if reconciled_key is None:
+            return
+
+        code, data = server.recv()
+        if code == QOSSTCodes.ABORT:
+            logger.error("Bob aborted the privacy amplification.")
+            server.send(QOSSTCodes.ABORT_ACK)
+            return
+        if code != QOSSTCodes.PA_REQUEST:
+            logger.error("Unexpected command %s.", str(code))
+            server.send(QOSSTCodes.UNEXPECTED_COMMAND)
+            return
+
+        results["final_key"] = privacy_amplification_alice(
+            server, reconciled_key, EXTRACTORS[extractor], data, workers=workers
+        )
+    finally:
+        server.close()
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments, too-many-locals, too-many-statements, too-many-branches
+def run_benchmark(
+    num_symbols: int,
+    signal_to_noise_ratio: float,
+    beta: float,
+    mdr_dimension: int,
+    secret_key_ratio: float,
+    extractor: str = "toeplitz",
+    encoding: str = LIST_ENCODING,
+    batch_size: Optional[int] = None,
+    block_size: Optional[int] = None,
+    workers: int = 1,
+    frame_size: Optional[int] = None,
+    seed: Optional[int] = None,
+    transport: str = TCP_TRANSPORT,
+    serialize: bool = True,
+    seed_pool: Optional[int] = None,
+) -> Dict:
+    """
+    Run the post-processing end-to-end on synthetic symbols.
+
+    The reconciliation and the privacy amplification are timed at Bob side,
+    which waits for the answers of Alice. The rates are given with respect to
+    the total time of the post-processing, except the reconciled bits per
+    second that are given with respect to the time of the reconciliation.
+
+    The frame error rate is derived from the length of the reconciled key, each
+    frame giving one bit per symbol. If the frame size is not given, the symbols
+    that do not fill a complete frame are counted as errors.
+
+    If a seed pool size is given, Bob takes the seeds of the privacy
+    amplification from a :class:`qosst_pp.seed_pool.SeedPool` of this
+    capacity, filled during the reconciliation.
+
+    Args:
+        num_symbols (int): number of symbols.
+        signal_to_noise_ratio (float): signal to noise ratio of the generated symbols.
+        beta (float): reconciliation efficiency.
+        mdr_dimension (int): dimension of the multidimensional reconciliation.
+        secret_key_ratio (float): ratio of the final key length to the reconciled key length.
+        extractor (str, optional): name of the extractor, in :data:`qosst_pp.extractors.EXTRACTORS`. Defaults to "toeplitz".
+        encoding (str, optional): encoding of the arrays in the messages. Defaults to LIST_ENCODING.
+        batch_size (Optional[int], optional): number of symbols per batch of the pipelined mode, or None to reconcile all the symbols at once. Defaults to None.
+        block_size (Optional[int], optional): maximal number of bits of a block of the privacy amplification, or None to extract the whole key at once. Defaults to None.
+        workers (int, optional): number of encoding, decoding and extraction processes. Defaults to 1.
+        frame_size (Optional[int], optional): number of symbols per LDPC frame. Defaults to None.
+        seed (Optional[int], optional): seed of the generation of the symbols. Defaults to None.
+        transport (str, optional): transport between Alice and Bob, one of :data:`TRANSPORTS`. Defaults to TCP_TRANSPORT.
+        serialize (bool, optional): if False, the content of the messages is not serialized with the loopback transport. Defaults to True.
+        seed_pool (Optional[int], optional): capacity in bits of the seed pool of Bob, or None to generate the seeds during the extraction. Defaults to None.
+
+    Raises:
+        ValueError: if the number of symbols is not a positive multiple of the MDR dimension.
+
+    Returns:
+        Dict: the parameters, the lengths of the keys, the frame error rate, the rates and the timings (in seconds) of each phase. The lengths, rates and frame error rate are None if the corresponding phase failed.
+    """
+    results: Dict = {
+        "symbols": num_symbols,
+        "signal_to_noise_ratio": signal_to_noise_ratio,
+        "beta": beta,
+        "mdr_dimension": mdr_dimension,
+        "secret_key_ratio": secret_key_ratio,
+        "extractor": extractor,
+        "encoding": encoding,
+        "batch_size": batch_size,
+        "block_size": block_size,
+        "workers": workers,
+        "frame_size": frame_size,
+        "transport": transport,
+        "serialize": serialize,
+        "seed_pool": seed_pool,
+        "reconciled_bits": None,
+        "final_bits": None,
+        "keys_match": False,
+        "frame_error_rate": None,
+        "symbols_per_second": None,
+        "reconciled_bits_per_second": None,
+        "final_bits_per_second": None,
+        "timings": {},
+    }
+    timings = results["timings"]
+
+    start = time.perf_counter()
+    alice_symbols, bob_symbols = generate_symbols(
+        num_symbols, signal_to_noise_ratio, mdr_dimension, seed=seed
+    )
+    timings["generation"] = time.perf_counter() - start
+
+    # The pool is filled during the reconciliation
+    pool = SeedPool(seed_pool) if seed_pool is not None else None
+    if pool is not None:
+        pool.start()
+
+    client = None
+    if transport == LOOPBACK_TRANSPORT:
+        server, client = loopback_pair(serialize=serialize)
+    else:
+        port = _free_port()
+        server = QOSSTServer("127.0.0.1", port)
+        server.open()
+
+    alice_results: Dict = {}
+    alice_thread = threading.Thread(
+        target=_run_alice,
+        args=(server, alice_symbols, mdr_dimension, extractor, workers, alice_results),
+        daemon=True,
+    )
+    alice_thread.start()
+
+    try:
+        if transport == LOOPBACK_TRANSPORT:
+            client.connect()
+        else:
+            # Alice only listens once her thread waits for the connection
+            client = _connect_bob(port)
+
+        start = time.perf_counter()
+        reconciled_key = reconcile_bob(
+            client,
+            bob_symbols,
+            beta,
+            signal_to_noise_ratio,
+            mdr_dimension,
+            encoding=encoding,
+            batch_size=batch_size,
+            workers=workers,
+            frame_size=frame_size,
+        )
+        timings["reconciliation"] = time.perf_counter() - start
+        if reconciled_key is None:
+            logger.error("The reconciliation failed.")
+            return results
+
+        start = time.perf_counter()
+        final_key = privacy_amplification_bob(
+            client,
+            reconciled_key,
+            secret_key_ratio,
+            EXTRACTORS[extractor],
+            encoding=encoding,
+            seed_pool=pool,
+            block_size=block_size,
+            workers=workers,
+        )
+        timings["privacy_amplification"] = time.perf_counter() - start
+    finally:
+        if pool is not None:
+            pool.stop()
+        if client is not None:
+            client.close()
+        else:
+            _stop_listening(server)
+        alice_thread.join(timeout=10)
+        if alice_thread.is_alive():
+            logger.error("Alice did not stop, closing her socket.")
+            server.close()
+
+    frame_bits = num_symbols
+    if frame_size:
+        frame_bits -= num_symbols % frame_size
+    results["reconciled_bits"] = len(reconciled_key)
+    results["frame_error_rate"] = (
+        1 - len(reconciled_key) / frame_bits if frame_bits else None
+    )
+    results["symbols_per_second"] = num_symbols / timings["reconciliation"]
+    results["reconciled_bits_per_second"] = (
+        len(reconciled_key) / timings["reconciliation"]
+    )
+    if final_key is None:
+        logger.error("The privacy amplification failed.")
+        return results
+
+    timings["total"] = timings["reconciliation"] + timings["privacy_amplification"]
+    results["final_bits"] = len(final_key)
+    results["keys_match"] = alice_results.get(
+        "final_key"
+    ) is not None and np.array_equal(alice_results["final_key"], final_key)
+    results["symbols_per_second"] = num_symbols / timings["total"]
+    results["final_bits_per_second"] = len(final_key) / timings["total"]
+    return results
+
+
+def format_benchmark(results: Dict) -> str:
+    """
+    Format the results of :func:`run_benchmark` for humans.
+
+    Args:
+        results (Dict): the results of the benchmark.
+
+    Returns:
+        str: the formatted results.
+    """
+
+    def _value(value, unit: str = "") -> str:
+        if value is None:
+            return "n/a"
+        if isinstance(value, float):
+            return f"{value:,.4g}{unit}"
+        return f"{value:,}{unit}"
+
+    lines = [
+        f"Symbols: {_value(results['symbols'])} at SNR {_value(results['signal_to_noise_ratio'])}"
+        f" (beta {_value(results['beta'])}, MDR dimension {results['mdr_dimension']})",
+        f"Extractor: {results['extractor']} (secret key ratio {_value(results['secret_key_ratio'])})",
+        f"Workers: {results['workers']}, encoding: {results['encoding']}, transport: {results['transport']}"
+        f"{'' if results['serialize'] else ' (without serialization)'}",
+        "",
+        f"Reconciled key: {_value(results['reconciled_bits'], ' bits')}",
+        f"Final key: {_value(results['final_bits'], ' bits')}"
+        f" ({'keys match' if results['keys_match'] else 'keys DO NOT match'})",
+        f"Frame error rate: {_value(results['frame_error_rate'])}",
+        "",
+        f"Symbols: {_value(results['symbols_per_second'], ' symbols/s')}",
+        f"Reconciled bits: {_value(results['reconciled_bits_per_second'], ' bits/s')}",
+        f"Final bits: {_value(results['final_bits_per_second'], ' bits/s')}",
+        "",
+        "Timings:",
+    ]
+    for phase in ("generation", "reconciliation", "privacy_amplification", "total"):
+        lines.append(
+            f"  {phase.replace('_', ' ')}: {_value(results['timings'].get(phase), ' s')}"
+        )
+    return "\n".join(lines)
@@ -19,12 +19,16 @@ This file will contain the code for script interactions.
 
 It will call commands for the submodules.
 """
+import json
 import logging
 import argparse
 
 from qosst_core.logging import create_loggers
 
 from qosst_pp import __version__
+from qosst_pp.bench import TCP_TRANSPORT, TRANSPORTS, format_benchmark, run_benchmark
+from qosst_pp.encoding import ENCODINGS, LIST_ENCODING
+from qosst_pp.extractors import EXTRACTORS
 from qosst_pp.install import (
     install_ir_for_cvqkd,
     install_cryptomite,
@@ -41,6 +45,8 @@ def _create_main_parser() -> argparse.ArgumentParser:
 
     Commands:
         install
+        uninstall
+        bench
 
     Returns:
         argparse.ArgumentParser: the main parser.
@@ -78,6 +84,92 @@ def _create_main_parser() -> argparse.ArgumentParser:
         help="Name of the package to uninstall",
     )
 
+    bench_parser = subparsers.add_parser(
+        "bench",
+        help="Benchmark the post-processing end-to-end on synthetic symbols",
+    )
+    bench_parser.set_defaults(func=bench)
+    bench_parser.add_argument(
+        "--symbols", type=int, default=1_000_000, help="Number of symbols."
+    )
+    bench_parser.add_argument(
+        "--snr", type=float, default=1.0, help="Signal to noise ratio of the symbols."
+    )
+    bench_parser.add_argument(
+        "--beta", type=float, default=0.95, help="Reconciliation efficiency."
+    )
+    bench_parser.add_argument(
+        "--mdr-dimension",
+        type=int,
+        default=8,
+        help="Dimension of the multidimensional reconciliation.",
+    )
+    bench_parser.add_argument(
+        "--secret-key-ratio",
+        type=float,
+        default=0.1,
+        help="Ratio of the final key length to the reconciled key length.",
+    )
+    bench_parser.add_argument(
+        "--extractor",
+        choices=EXTRACTORS,
+        default="toeplitz",
+        help="Extractor of the privacy amplification.",
+    )
+    bench_parser.add_argument(
+        "--encoding",
+        choices=ENCODINGS,
+        default=LIST_ENCODING,
+        help="Encoding of the arrays in the messages.",
+    )
+    bench_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Number of symbols per batch, to use the pipelined reconciliation.",
+    )
+    bench_parser.add_argument(
+        "--block-size",
+        type=int,
+        default=None,
+        help="Maximal number of bits of a block of the privacy amplification.",
+    )
+    bench_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of encoding, decoding and extraction processes.",
+    )
+    bench_parser.add_argument(
+        "--frame-size",
+        type=int,
+        default=None,
+        help="Number of symbols per LDPC frame, required to encode in parallel and for an exact frame error rate.",
+    )
+    bench_parser.add_argument(
+        "--transport",
+        choices=TRANSPORTS,
+        default=TCP_TRANSPORT,
+        help="Transport between Alice and Bob: QOSST sockets on the loopback interface or in-process queues.",
+    )
+    bench_parser.add_argument(
+        "--no-serialization",
+        action="store_true",
+        help="Do not serialize the content of the messages with the loopback transport.",
+    )
+    bench_parser.add_argument(
+        "--seed", type=int, default=None, help="Seed of the generation of the symbols."
+    )
+    bench_parser.add_argument(
+        "--seed-pool",
+        type=int,
+        default=None,
+        help="Take the seeds of the extractor from a pool of random bits of this capacity, filled in the background.",
+    )
+    bench_parser.add_argument(
+        "--json", action="store_true", help="Print the results as JSON."
+    )
+
     return parser
 
 
@@ -134,5 +226,43 @@ def uninstall(args: argparse.Namespace) -> bool:
     return False
 
 
+def bench(args: argparse.Namespace) -> bool:
+    """
+    Bench command.
+
+    Args:
+        args (argparse.Namespace): the args passed to the command line.
+
+    Returns:
+        bool: True if Alice and Bob obtained the same final key, False otherwise.
+    """
+    try:
+        results = run_benchmark(
+            args.symbols,
+            args.snr,
+            args.beta,
+            args.mdr_dimension,
+            args.secret_key_ratio,
+            extractor=args.extractor,
+            encoding=args.encoding,
+            batch_size=args.batch_size,
+            block_size=args.block_size,
+            workers=args.workers,
+            frame_size=args.frame_size,
+            seed=args.seed,
+            transport=args.transport,
+            serialize=not args.no_serialization,
+            seed_pool=args.seed_pool,
+        )
+    except ValueError as exc:
+        print(f"Invalid benchmark parameters: {exc}")
+        return False
+    if args.json:
+        print(json.dumps(results, indent=4))
+    else:
+        print(format_benchmark(results))
+    return results["keys_match"]
+
+
 if __name__ == "__main__":
     main()
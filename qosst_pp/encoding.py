@@ -0,0 +1,220 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Module defining the encodings of the arrays sent in the content of QOSST messages.
+
+Two encodings are available:
+
+* the list encoding, where arrays are sent as lists of numbers. This is the
+  historical format and it is used when no encoding is specified in the message;
+* the binary encoding, where arrays are sent as the base64 representation of
+  their raw buffer, tagged with their dtype and shape. Bit arrays (such as
+  syndromes or discard flags) are additionally packed 8 bits per byte.
+
+The encoding is negotiated with the ``encoding`` field of the content: the
+party initiating the exchange chooses it and the other party answers with the
+same encoding.
+"""
+
+import base64
+from typing import Dict, Iterable, Union
+
+import numpy as np
+from numpy.typing import ArrayLike, DTypeLike
+
+LIST_ENCODING = "list"  #: Arrays are sent as lists of numbers.
+BINARY_ENCODING = "binary"  #: Arrays are sent as base64 buffers.
+ENCODINGS = (LIST_ENCODING, BINARY_ENCODING)  #: Available encodings.
+
+
+def encode_array(array: ArrayLike, dtype: DTypeLike = None) -> Dict:
+    """
+    Encode an array into a dict of its dtype, shape and base64 raw buffer.
+
+    Args:
+        array (ArrayLike): the array to encode.
+        dtype (DTypeLike, optional): dtype to cast the array into before encoding. Defaults to None.
+
+    Returns:
+        Dict: the encoded array.
+    """
+    array = np.ascontiguousarray(array, dtype=dtype)
+    return {
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+        "data": base64.b64encode(array).decode("ascii"),
+    }
+
+
+def decode_array(payload: Dict) -> np.ndarray:
+    """
+    Decode an array encoded with :func:`encode_array`.
+
+    Args:
+        payload (Dict): the encoded array.
+
+    Raises:
+        ValueError: if the payload is malformed.
+
+    Returns:
+        np.ndarray: the decoded array.
+    """
+    try:
+        dtype = np.dtype(payload["dtype"])
+        buffer = base64.b64decode(payload["data"], validate=True)
+        return np.frombuffer(buffer, dtype=dtype).reshape(payload["shape"])
+    except (KeyError, TypeError) as exc:
+        raise ValueError(f"Malformed array payload ({exc}).") from exc
+
+
+def encode_bits(bits: ArrayLike) -> Dict:
+    """
+    Encode an array of bits into a dict of its length and base64 packed buffer.
+
+    Args:
+        bits (ArrayLike): the array of bits (0 or 1) to encode.
+
+    Returns:
+        Dict: the encoded bits.
+    """
+    bits = np.asarray(bits, dtype=np.uint8).ravel()
+    return {
+        "length": int(bits.size),
+        "data": base64.b64encode(np.packbits(bits)).decode("ascii"),
+    }
+
+
+def decode_bits(payload: Dict) -> np.ndarray:
+    """
+    Decode an array of bits encoded with :func:`encode_bits`.
+
+    Args:
+        payload (Dict): the encoded bits.
+
+    Raises:
+        ValueError: if the payload is malformed.
+
+    Returns:
+        np.ndarray: the decoded bits, as an array of uint8.
+    """
+    try:
+        buffer = base64.b64decode(payload["data"], validate=True)
+        length = int(payload["length"])
+    except (KeyError, TypeError) as exc:
+        raise ValueError(f"Malformed bits payload ({exc}).") from exc
+    if length > 8 * len(buffer):
+        raise ValueError(
+            f"Bits payload is too short ({8 * len(buffer)} < {length} bits)."
+        )
+    return np.unpackbits(np.frombuffer(buffer, dtype=np.uint8), count=length)
+
+
+def encode_fields(
+    data: Dict,
+    encoding: str,
+    arrays: Union[Dict[str, DTypeLike], Iterable[str]] = (),
+    bits: Iterable[str] = (),
+) -> Dict:
+    """
+    Encode the array fields of the content of a message.
+
+    With the list encoding, the content is returned with the arrays converted to
+    lists and without the ``encoding`` field, so it stays readable by peers that
+    do not know about encodings.
+
+    Args:
+        data (Dict): content of the message.
+        encoding (str): encoding to use, one of :data:`ENCODINGS`.
+        arrays (Union[Dict[str, DTypeLike], Iterable[str]], optional): names of the fields containing arrays of numbers, optionally mapped to the dtype to use on the wire. Defaults to ().
+        bits (Iterable[str], optional): names of the fields containing arrays of bits. Defaults to ().
+
+    Raises:
+        ValueError: if the encoding is unknown.
+
+    Returns:
+        Dict: the encoded content.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding {encoding}.")
+    if not isinstance(arrays, dict):
+        arrays = {name: None for name in arrays}
+
+    encoded = dict(data)
+    if encoding == LIST_ENCODING:
+        for name in list(arrays) + list(bits):
+            if isinstance(encoded[name], np.ndarray):
+                encoded[name] = encoded[name].tolist()
+        return encoded
+
+    encoded["encoding"] = encoding
+    for name, dtype in arrays.items():
+        encoded[name] = encode_array(encoded[name], dtype=dtype)
+    for name in bits:
+        encoded[name] = encode_bits(encoded[name])
+    return encoded
+
+
+def decode_fields(
+    data: Dict, arrays: Iterable[str] = (), bits: Iterable[str] = ()
+) -> Dict:
+    """
+    Decode the array fields of the content of a message.
+
+    The encoding is read from the ``encoding`` field of the content, and the list
+    encoding is assumed if it is not present. With the list encoding, the content
+    is returned as is.
+
+    Args:
+        data (Dict): content of the message.
+        arrays (Iterable[str], optional): names of the fields containing arrays of numbers. Defaults to ().
+        bits (Iterable[str], optional): names of the fields containing arrays of bits. Defaults to ().
+
+    Raises:
+        ValueError: if the encoding is unknown or if one of the fields is malformed.
+
+    Returns:
+        Dict: the decoded content.
+    """
+    encoding = get_encoding(data)
+    if encoding == LIST_ENCODING:
+        return data
+
+    decoded = dict(data)
+    for name in arrays:
+        decoded[name] = decode_array(decoded[name])
+    for name in bits:
+        decoded[name] = decode_bits(decoded[name])
+    return decoded
+
+
+def get_encoding(data: Dict) -> str:
+    """
+    Get the encoding of the content of a message.
+
+    Args:
+        data (Dict): content of the message.
+
+    Raises:
+        ValueError: if the encoding is unknown.
+
+    Returns:
+        str: the encoding of the content.
+    """
+    encoding = data.get("encoding", LIST_ENCODING)
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding {encoding}.")
+    return encoding
@@ -0,0 +1,47 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Module managing the process pools used to parallelize the post-processing.
+"""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+#: Process pools, by number of workers.
+_executors: Dict[int, ProcessPoolExecutor] = {}
+
+
+def get_executor(workers: int) -> ProcessPoolExecutor:
+    """
+    Get the process pool with the given number of workers, creating it if needed.
+
+    The pool is kept for the next calls, so that the worker processes are only
+    started once.
+
+    Args:
+        workers (int): number of worker processes.
+
+    Returns:
+        ProcessPoolExecutor: the process pool.
+    """
+    if not workers in _executors:
+        logger.info("Starting a pool of %i processes.", workers)
+        _executors[workers] = ProcessPoolExecutor(max_workers=workers)
+    return _executors[workers]
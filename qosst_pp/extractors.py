@@ -16,23 +16,207 @@
 
 """
 Module defining randomness extactors for privacy amplification.
+
+The Toeplitz hashes are computed with cryptomite if it is installed, and
+with a NumPy FFT implementation, giving the same output, otherwise.
 """
 
 import logging
-from typing import List, Optional, Tuple
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Type
 
-from cryptomite.toeplitz import Toeplitz
+import numpy as np
+from numpy.typing import ArrayLike
 
 from qosst_core.extractors import RandomnessExtractor
 
 logger = logging.getLogger(__name__)
 
+try:
+    from cryptomite.circulant import Circulant
+    from cryptomite.toeplitz import Toeplitz
+    from cryptomite.utils import next_na_set
+
+    HAS_CRYPTOMITE = True  #: True if cryptomite is installed.
+except ModuleNotFoundError:
+    logger.warning(
+        "cryptomite module is not present. Toeplitz hashes will be computed with NumPy and the circulant extractor cannot be used."
+    )
+    HAS_CRYPTOMITE = False
+
+
+def _fft_size(key_size: int, final_key_size: int) -> int:
+    """
+    Size of the FFT used to compute a (n,m) Toeplitz hash, that is the
+    smallest power of 2 larger than or equal to n+m-1.
+
+    Args:
+        key_size (int): the size n of the key.
+        final_key_size (int): the size m of the output.
+
+    Returns:
+        int: the size of the FFT.
+    """
+    return 1 << max(key_size + final_key_size - 2, 0).bit_length()
+
+
+def toeplitz_hash(
+    key: ArrayLike,
+    seed: ArrayLike,
+    final_key_size: int,
+    fft_size: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Hash a key with the (n,m) Toeplitz matrix defined by the seed, using NumPy.
+
+    The output is the same as the one of the Toeplitz extractor of cryptomite:
+    the m first bits of the seed are the first column of the matrix, and the
+    n-1 last bits are the first row, without its first element, in reverse
+    order. The matrix-vector product is computed as a linear convolution
+    with a real FFT, which takes O((n+m)log(n+m)) time.
+
+    Args:
+        key (ArrayLike): the key of n bits.
+        seed (ArrayLike): the seed of n+m-1 bits.
+        final_key_size (int): the size m of the output.
+        fft_size (Optional[int], optional): size of the FFT, at least n+m-1, or None to compute it. Defaults to None.
+
+    Raises:
+        ValueError: if the seed does not have n+m-1 bits.
+
+    Returns:
+        np.ndarray: the output of m bits, as an array of uint8.
+    """
+    key = np.asarray(key, dtype=np.uint8)
+    seed = np.asarray(seed, dtype=np.uint8)
+    key_size = len(key)
+    if len(seed) != key_size + final_key_size - 1:
+        raise ValueError(
+            f"Seed of a ({key_size},{final_key_size}) Toeplitz hash must have {key_size + final_key_size - 1} bits (got {len(seed)})."
+        )
+    if final_key_size <= 0:
+        return np.zeros(0, dtype=np.uint8)
+
+    # Diagonals of the matrix, from the top-right corner to the bottom-left one
+    diagonals = np.concatenate((seed[final_key_size:], seed[:final_key_size]))
+    if fft_size is None:
+        fft_size = _fft_size(key_size, final_key_size)
+    convolution = np.fft.irfft(
+        np.fft.rfft(key, fft_size) * np.fft.rfft(diagonals, fft_size), fft_size
+    )[key_size - 1 : key_size - 1 + final_key_size]
+    # The coefficients are integers at most n, which are exact after rounding
+    return (np.rint(convolution).astype(np.int64) & 1).astype(np.uint8)
+
+
+# pylint: disable=too-few-public-methods
+class _ToeplitzHash:
+    """
+    Prepared (n,m) Toeplitz hash.
+
+    The hash is computed with the Toeplitz extractor of cryptomite if possible,
+    and with :func:`toeplitz_hash` otherwise.
+    """
+
+    def __init__(self, key_size: int, final_key_size: int, use_cryptomite: bool = True):
+        """
+        Args:
+            key_size (int): the size n of the key.
+            final_key_size (int): the size m of the output.
+            use_cryptomite (bool, optional): if False, always use NumPy. Defaults to True.
+        """
+        self.final_key_size = final_key_size
+        self.fft_size = _fft_size(key_size, final_key_size)
+        self.extractor = None
+        if use_cryptomite and HAS_CRYPTOMITE and 0 < final_key_size <= key_size:
+            self.extractor = Toeplitz(key_size, final_key_size)
+
+    def __call__(self, key: np.ndarray, seed: np.ndarray) -> np.ndarray:
+        """
+        Hash a key.
+
+        Args:
+            key (np.ndarray): the key of n bits.
+            seed (np.ndarray): the seed of n+m-1 bits.
+
+        Returns:
+            np.ndarray: the output of m bits, as an array of uint8.
+        """
+        if self.extractor is None:
+            return toeplitz_hash(key, seed, self.final_key_size, self.fft_size)
+        # cryptomite works on lists of Python integers
+        return np.asarray(
+            self.extractor.extract(key.tolist(), seed.tolist()), dtype=np.uint8
+        )
+
+
+def segment_sizes(
+    reconciled_key_size: int, final_key_size: int, block_size: int
+) -> List[Tuple[int, int]]:
+    """
+    Split a (n,m) extraction into blocks of at most block_size input bits.
+
+    The output bits are distributed proportionally to the size of the blocks,
+    so that the sum of the output sizes is exactly m and each block has the
+    same ratio m/n, up to rounding.
+
+    Args:
+        reconciled_key_size (int): the size n of the reconciled key.
+        final_key_size (int): the size m of the final key.
+        block_size (int): the maximal number of input bits of a block.
+
+    Raises:
+        ValueError: if the block size is not positive.
+
+    Returns:
+        List[Tuple[int, int]]: the input and output sizes of the blocks.
+    """
+    if block_size <= 0:
+        raise ValueError(f"Block size must be positive (got {block_size}).")
+    sizes = []
+    for start in range(0, reconciled_key_size, block_size):
+        end = min(start + block_size, reconciled_key_size)
+        sizes.append(
+            (
+                end - start,
+                final_key_size * end // reconciled_key_size
+                - final_key_size * start // reconciled_key_size,
+            )
+        )
+    return sizes
+
 
 class ToeplitzExtractor(RandomnessExtractor):
     """
     Randomness extractor using the Toeplitz extractor from cryptomite.
+
+    If cryptomite is not installed, the hash is computed with NumPy
+    (see :class:`NumpyToeplitzExtractor`), which gives the same output.
+
+    The reconciled key and the seed can be given as lists or arrays of bits,
+    and the final key and the seed are returned as arrays of uint8 bits.
     """
 
+    use_cryptomite: bool = True  #: If False, always compute the hash with NumPy.
+
+    def __init__(self, reconciled_key_size: int, final_key_size: int):
+        """
+        Args:
+            reconciled_key_size (int): the size of the reconciled key.
+            final_key_size (int): the size of the final key.
+
+        Raises:
+            ValueError: if the reconciled key is empty.
+        """
+        if reconciled_key_size <= 0:
+            raise ValueError(
+                "The Toeplitz extractor requires a non-empty reconciled key."
+            )
+        super().__init__(reconciled_key_size, final_key_size)
+        self._hash = _ToeplitzHash(
+            reconciled_key_size, final_key_size, self.use_cryptomite
+        )
+
     @property
     def seed_size(self) -> int:
         """
@@ -45,12 +229,379 @@ class ToeplitzExtractor(RandomnessExtractor):
         return self.reconciled_key_size + self.final_key_size - 1
 
     def _extract(
-        self, reconciled_key: List[int], seed: List[int]
-    ) -> Tuple[Optional[List[int]], Optional[List[int]]]:
+        self, reconciled_key: ArrayLike, seed: ArrayLike
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
         logger.info(
             "Extracting key with Toeplitz extractor. Reconciled key length %i and final key length %i.",
             self.reconciled_key_size,
             self.final_key_size,
         )
-        extractor = Toeplitz(self.reconciled_key_size, self.final_key_size)
-        return extractor.extract(reconciled_key, seed), seed
+        reconciled_key = np.asarray(reconciled_key, dtype=np.uint8)
+        seed = np.asarray(seed, dtype=np.uint8)
+        return self._hash(reconciled_key, seed), seed
+
+
+class NumpyToeplitzExtractor(ToeplitzExtractor):
+    """
+    Randomness extractor computing the Toeplitz hash with NumPy.
+
+    The seed and output are the same as the ones of :class:`ToeplitzExtractor`,
+    so that Alice and Bob can use either of them, but cryptomite is not needed.
+    """
+
+    use_cryptomite = False
+
+
+class CirculantExtractor(RandomnessExtractor):
+    """
+    Randomness extractor using the circulant extractor from cryptomite.
+
+    This extractor requires cryptomite.
+
+    The circulant extractor of cryptomite requires n+1 to be a prime with
+    primitive root 2. The reconciled key is hence padded with zeros up to
+    p-1 bits, where p is the smallest such prime larger than n+1, and the
+    seed has p bits, that is only slightly more than n+1 bits, instead of
+    the n+m-1 bits of the Toeplitz extractor.
+
+    The reconciled key and the seed can be given as lists or arrays of bits,
+    and the final key and the seed are returned as arrays of uint8 bits.
+    """
+
+    def __init__(self, reconciled_key_size: int, final_key_size: int):
+        """
+        Args:
+            reconciled_key_size (int): the size of the reconciled key.
+            final_key_size (int): the size of the final key.
+
+        Raises:
+            ModuleNotFoundError: if cryptomite is not installed.
+            ValueError: if the reconciled key is empty or shorter than the final key.
+        """
+        if not HAS_CRYPTOMITE:
+            raise ModuleNotFoundError(
+                "cryptomite is required for the circulant extractor."
+            )
+        if reconciled_key_size <= 0:
+            raise ValueError(
+                "The circulant extractor requires a non-empty reconciled key."
+            )
+        if final_key_size > reconciled_key_size:
+            raise ValueError(
+                f"The final key ({final_key_size} bits) of the circulant extractor cannot be longer than the reconciled key ({reconciled_key_size} bits)."
+            )
+        super().__init__(reconciled_key_size, final_key_size)
+        self.prime = next_na_set(reconciled_key_size + 1)
+        self._extractor = Circulant(self.prime - 1, final_key_size)
+
+    @property
+    def seed_size(self) -> int:
+        """
+        Seed size for (n,m) circulant extractor is p, the smallest
+        prime with primitive root 2 larger than n+1.
+
+        Returns:
+            int: the seed size
+        """
+        return self.prime
+
+    def _extract(
+        self, reconciled_key: ArrayLike, seed: ArrayLike
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        logger.info(
+            "Extracting key with circulant extractor. Reconciled key length %i (padded to %i) and final key length %i.",
+            self.reconciled_key_size,
+            self.prime - 1,
+            self.final_key_size,
+        )
+        padded_key = np.zeros(self.prime - 1, dtype=np.uint8)
+        padded_key[: self.reconciled_key_size] = reconciled_key
+        seed = np.asarray(seed, dtype=np.uint8)
+        # cryptomite works on lists of Python integers
+        final_key = self._extractor.extract(padded_key.tolist(), seed.tolist())
+        return np.asarray(final_key, dtype=np.uint8), seed
+
+
+class ModifiedToeplitzExtractor(RandomnessExtractor):
+    """
+    Randomness extractor using the modified Toeplitz construction.
+
+    The final key is (I | T).k, where I is the identity matrix of size m and T
+    is a m x (n-m) Toeplitz matrix, that is the m first bits of the key xored
+    with the Toeplitz hash of the n-m last bits. The seed only has n-1 bits.
+
+    When m = n, the matrix is the identity, and the seed is not used.
+
+    The reconciled key and the seed can be given as lists or arrays of bits,
+    and the final key and the seed are returned as arrays of uint8 bits.
+    """
+
+    def __init__(self, reconciled_key_size: int, final_key_size: int):
+        """
+        Args:
+            reconciled_key_size (int): the size of the reconciled key.
+            final_key_size (int): the size of the final key.
+
+        Raises:
+            ValueError: if the reconciled key is empty or shorter than the final key.
+        """
+        if reconciled_key_size <= 0:
+            raise ValueError(
+                "The modified Toeplitz extractor requires a non-empty reconciled key."
+            )
+        if final_key_size > reconciled_key_size:
+            raise ValueError(
+                f"The final key ({final_key_size} bits) of the modified Toeplitz extractor cannot be longer than the reconciled key ({reconciled_key_size} bits)."
+            )
+        super().__init__(reconciled_key_size, final_key_size)
+        self._hash = None
+        if final_key_size < reconciled_key_size:
+            self._hash = _ToeplitzHash(
+                reconciled_key_size - final_key_size, final_key_size
+            )
+
+    @property
+    def seed_size(self) -> int:
+        """
+        Seed size for (n,m) modified Toeplitz extractor is
+        n-1.
+
+        Returns:
+            int: the seed size
+        """
+        return self.reconciled_key_size - 1
+
+    def _extract(
+        self, reconciled_key: ArrayLike, seed: ArrayLike
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        logger.info(
+            "Extracting key with modified Toeplitz extractor. Reconciled key length %i and final key length %i.",
+            self.reconciled_key_size,
+            self.final_key_size,
+        )
+        reconciled_key = np.asarray(reconciled_key, dtype=np.uint8)
+        seed = np.asarray(seed, dtype=np.uint8)
+        if self._hash is None:
+            return reconciled_key.copy(), seed
+        final_key = self._hash(reconciled_key[self.final_key_size :], seed)
+        return final_key ^ reconciled_key[: self.final_key_size], seed
+
+
+class SegmentedToeplitzExtractor(RandomnessExtractor):
+    """
+    Randomness extractor applying independent Toeplitz extractors to blocks of the key.
+
+    The reconciled key is split in blocks of at most block_size bits, and each
+    block is hashed with its own Toeplitz extractor. The output sizes of the blocks
+    are given by :func:`segment_sizes` and the final key is the concatenation of
+    the outputs. The memory and time needed to extract are hence bounded by the
+    block size, whatever the length of the key.
+
+    Two seed policies are available:
+
+    * per-block seeds (default): each block uses its own part of the seed, of
+      n_i+m_i-1 bits. The blocks are hashed with independent 2-universal
+      functions, and the seed size is n+m-k for k blocks;
+    * shared seed: all the blocks use the same seed, of the size of the largest
+      block. The seed is much shorter, but the blocks are not hashed independently:
+      the collision probability is only bounded by the one of a single block
+      (2^-m_i instead of 2^-m), which must be taken into account in the security
+      parameters.
+
+    The block size and the seed policy can be given to the constructor, or set as
+    class attributes in a subclass to be usable where only the extractor class
+    is given (e.g. :func:`qosst_pp.privacy_amplification.privacy_amplification_bob`).
+    Alice and Bob must of course use the same block size and seed policy.
+    """
+
+    block_size: int = 1 << 20  #: Default maximal number of input bits of a block.
+    shared_seed: bool = False  #: Default seed policy.
+
+    def __init__(
+        self,
+        reconciled_key_size: int,
+        final_key_size: int,
+        block_size: Optional[int] = None,
+        shared_seed: Optional[bool] = None,
+    ):
+        """
+        Args:
+            reconciled_key_size (int): the size of the reconciled key.
+            final_key_size (int): the size of the final key.
+            block_size (Optional[int], optional): maximal number of input bits of a block, or None to use the class attribute. Defaults to None.
+            shared_seed (Optional[bool], optional): if True, use the same seed for all the blocks, or None to use the class attribute. Defaults to None.
+        """
+        super().__init__(reconciled_key_size, final_key_size)
+        if block_size is not None:
+            self.block_size = block_size
+        if shared_seed is not None:
+            self.shared_seed = shared_seed
+        self.segments = segment_sizes(
+            reconciled_key_size, final_key_size, self.block_size
+        )
+        # Blocks with the same sizes share the same prepared hash
+        self._hashes = {
+            segment: _ToeplitzHash(*segment)
+            for segment in set(self.segments)
+            if segment[1] > 0
+        }
+
+    @staticmethod
+    def _segment_seed_size(segment: Tuple[int, int]) -> int:
+        """
+        Seed size of the Toeplitz extractor of a block.
+
+        Args:
+            segment (Tuple[int, int]): the input and output sizes of the block.
+
+        Returns:
+            int: the seed size of the block, or 0 if the block has no output.
+        """
+        block_input_size, block_output_size = segment
+        if block_output_size == 0:
+            return 0
+        return block_input_size + block_output_size - 1
+
+    @property
+    def seed_size(self) -> int:
+        """
+        Seed size, that is the size of the largest block seed with a shared seed,
+        and the sum of the block seed sizes otherwise.
+
+        Returns:
+            int: the seed size
+        """
+        seed_sizes = [self._segment_seed_size(segment) for segment in self.segments]
+        if self.shared_seed:
+            return max(seed_sizes, default=0)
+        return sum(seed_sizes)
+
+    def _extract(
+        self, reconciled_key: ArrayLike, seed: ArrayLike
+    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        logger.info(
+            "Extracting key with segmented Toeplitz extractor. Reconciled key length %i, final key length %i and %i blocks (%s seed).",
+            self.reconciled_key_size,
+            self.final_key_size,
+            len(self.segments),
+            "shared" if self.shared_seed else "per-block",
+        )
+        reconciled_key = np.asarray(reconciled_key, dtype=np.uint8)
+        seed = np.asarray(seed, dtype=np.uint8)
+
+        final_key = np.empty(self.final_key_size, dtype=np.uint8)
+        key_offset = 0
+        output_offset = 0
+        seed_offset = 0
+        for segment in self.segments:
+            block_input_size, block_output_size = segment
+            block_seed_size = self._segment_seed_size(segment)
+            if block_output_size:
+                final_key[
+                    output_offset : output_offset + block_output_size
+                ] = self._hashes[segment](
+                    reconciled_key[key_offset : key_offset + block_input_size],
+                    seed[seed_offset : seed_offset + block_seed_size],
+                )
+            key_offset += block_input_size
+            output_offset += block_output_size
+            if not self.shared_seed:
+                seed_offset += block_seed_size
+        return final_key, seed
+
+
+#: Extractors by name, e.g. to select them from the command line.
+EXTRACTORS: Dict[str, Type[RandomnessExtractor]] = {
+    "toeplitz": ToeplitzExtractor,
+    "numpy-toeplitz": NumpyToeplitzExtractor,
+    "modified-toeplitz": ModifiedToeplitzExtractor,
+    "segmented-toeplitz": SegmentedToeplitzExtractor,
+    "circulant": CirculantExtractor,
+}
+
+
+class ExtractorCache:
+    """
+    LRU cache of prepared extractors, keyed by extractor class, reconciled key
+    size and final key size.
+
+    The extractors prepare their hash in their constructor, so that repeated
+    extractions with the same sizes can reuse the same extractor and skip the
+    setup. The cache is thread-safe.
+    """
+
+    maxsize: int  #: Maximal number of extractors in the cache.
+    hits: int  #: Number of requests served from the cache.
+    misses: int  #: Number of requests that created a new extractor.
+
+    def __init__(self, maxsize: int = 16):
+        """
+        Args:
+            maxsize (int, optional): maximal number of extractors in the cache. Defaults to 16.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._extractors: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        extractor_class: Type[RandomnessExtractor],
+        reconciled_key_size: int,
+        final_key_size: int,
+    ) -> RandomnessExtractor:
+        """
+        Get an extractor, creating it if it is not in the cache.
+
+        Args:
+            extractor_class (Type[RandomnessExtractor]): the extractor class.
+            reconciled_key_size (int): the size of the reconciled key.
+            final_key_size (int): the size of the final key.
+
+        Returns:
+            RandomnessExtractor: the extractor.
+        """
+        key = (extractor_class, reconciled_key_size, final_key_size)
+        with self._lock:
+            if key in self._extractors:
+                self.hits += 1
+                self._extractors.move_to_end(key)
+                return self._extractors[key]
+            self.misses += 1
+
+        # Create the extractor outside of the lock as it can be long
+        extractor = extractor_class(reconciled_key_size, final_key_size)
+        with self._lock:
+            self._extractors[key] = extractor
+            while len(self._extractors) > self.maxsize:
+                self._extractors.popitem(last=False)
+        return extractor
+
+    def clear(self):
+        """
+        Remove all the extractors from the cache and reset the counters.
+        """
+        with self._lock:
+            self._extractors.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the statistics of the cache.
+
+        Returns:
+            Dict[str, int]: the number of hits, misses, and current and maximal sizes.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._extractors),
+                "maxsize": self.maxsize,
+            }
+
+
+#: Cache used by the privacy amplification functions.
+extractor_cache = ExtractorCache()
@@ -0,0 +1,443 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Key server, delivering the keys of the post-processing to the applications.
+
+The key server accumulates the final keys of successive post-processing
+sessions in a ring buffer, and delivers them to the consumers on request, in
+the order in which they were received. Each party (Alice and Bob) runs its own
+key server: as long as both servers receive the same keys and the consumers
+request the same sizes in the same order, both parties get the same key.
+
+The keys are received on a ZMQ PULL socket (the ingest endpoint), in the
+multipart format of :mod:`qosst_pp.messages` (see :func:`push_key`). The
+reconciliation servers push their final keys to a key server when started with
+the ``--key-server`` and ``--extractor`` options. When the buffer is full, the key server stops
+receiving keys until enough key is consumed, so that the producers are slowed
+down instead of keys being dropped (the bits of the last key that fit in the
+buffer are still added, so that any request up to the capacity of the buffer
+can eventually be served).
+
+The consumers send their requests on a ZMQ ROUTER socket (the consumer
+endpoint), with REQ or DEALER sockets. The requests are JSON objects:
+
+* ``{"command": "get_key", "size": n, "timeout": t}`` requests n bits of key.
+  If the buffer does not contain enough key, the request waits at most t
+  seconds (0 by default) for new keys. The reply is in the multipart format of
+  :mod:`qosst_pp.messages` (see :func:`qosst_pp.messages.recv_key`), the key
+  being None if the request could not be served. The requests are served in
+  order of arrival;
+* ``{"command": "stats"}`` requests the statistics of the server, as a JSON
+  object.
+"""
+
+import json
+import time
+import logging
+import argparse
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+import zmq
+import numpy as np
+
+from qosst_core.logging import create_loggers
+
+from qosst_pp import __version__
+from qosst_pp.messages import key_frames
+
+logger = logging.getLogger(__name__)
+
+
+class KeyBuffer:
+    """
+    First-in first-out ring buffer of key bits.
+    """
+
+    capacity: int  #: Maximal number of bits in the buffer.
+
+    def __init__(self, capacity: int):
+        """
+        Args:
+            capacity (int): maximal number of bits in the buffer.
+        """
+        self.capacity = capacity
+        self._bits = np.zeros(capacity, dtype=np.uint8)
+        self._start = 0
+        self._size = 0
+
+    @property
+    def available(self) -> int:
+        """
+        Number of bits in the buffer.
+
+        Returns:
+            int: the number of bits.
+        """
+        return self._size
+
+    @property
+    def free(self) -> int:
+        """
+        Number of bits that can be added to the buffer.
+
+        Returns:
+            int: the number of bits.
+        """
+        return self.capacity - self._size
+
+    def put(self, key: np.ndarray) -> int:
+        """
+        Add as many bits of a key as possible at the end of the buffer.
+
+        Args:
+            key (np.ndarray): the key, as an array of bits.
+
+        Returns:
+            int: the number of bits added, from the beginning of the key.
+        """
+        size = min(len(key), self.free)
+        end = (self._start + self._size) % self.capacity
+        first = min(size, self.capacity - end)
+        self._bits[end : end + first] = key[:first]
+        self._bits[: size - first] = key[first:size]
+        self._size += size
+        return size
+
+    def get(self, size: int) -> Optional[np.ndarray]:
+        """
+        Take bits from the beginning of the buffer, if there are enough.
+
+        Args:
+            size (int): the number of bits.
+
+        Returns:
+            Optional[np.ndarray]: the bits, or None if the buffer does not contain enough bits.
+        """
+        if size > self._size:
+            return None
+        first = min(size, self.capacity - self._start)
+        key = np.concatenate(
+            [self._bits[self._start : self._start + first], self._bits[: size - first]]
+        )
+        self._start = (self._start + size) % self.capacity
+        self._size -= size
+        return key
+
+
+def push_key(zmq_socket: zmq.Socket, key: Union[List[int], np.ndarray]):
+    """
+    Push a key to a key server.
+
+    Args:
+        zmq_socket (zmq.Socket): ZMQ PUSH socket connected to the ingest endpoint of the key server.
+        key (Union[List[int], np.ndarray]): the key, as an array of bits.
+    """
+    zmq_socket.send_multipart(key_frames(key, True), copy=False)
+
+
+# pylint: disable=too-many-instance-attributes
+class KeyServer:
+    """
+    Key server, delivering the keys received from the post-processing to the consumers.
+    """
+
+    ingest_endpoint: str  #: Endpoint of the PULL socket receiving the keys.
+    consumer_endpoint: str  #: Endpoint of the ROUTER socket receiving the requests.
+    buffer: KeyBuffer  #: Buffer of the keys.
+
+    def __init__(
+        self,
+        ingest_endpoint: str,
+        consumer_endpoint: str,
+        capacity: int = 1 << 24,
+    ):
+        """
+        Args:
+            ingest_endpoint (str): endpoint to bind the PULL socket receiving the keys to.
+            consumer_endpoint (str): endpoint to bind the ROUTER socket receiving the requests to.
+            capacity (int, optional): capacity of the buffer, in bits. Defaults to 1 << 24.
+        """
+        self.ingest_endpoint = ingest_endpoint
+        self.consumer_endpoint = consumer_endpoint
+        self.buffer = KeyBuffer(capacity)
+
+        #: Key received while the buffer was full.
+        self._pending_key: Optional[np.ndarray] = None
+        #: Requests waiting for key, with their envelope, size, arrival time and deadline.
+        self._requests: Deque[Tuple[List[bytes], int, float, float]] = deque()
+        self._stats: Dict[str, Union[int, float]] = {
+            "received_keys": 0,
+            "received_bits": 0,
+            "delivered_bits": 0,
+            "served_requests": 0,
+            "refused_requests": 0,
+            "buffer_full": 0,
+            "max_latency": 0.0,
+            "total_latency": 0.0,
+        }
+
+    def stats(self) -> Dict:
+        """
+        Get the statistics of the server.
+
+        The latencies are measured between the arrival of the requests and their
+        reply, in seconds. ``buffer_full`` counts the keys that could not be
+        entirely added to the buffer when received, i.e. the number of times the
+        producers were slowed down.
+
+        Returns:
+            Dict: the statistics.
+        """
+        served = self._stats["served_requests"]
+        return {
+            "capacity_bits": self.buffer.capacity,
+            "available_bits": self.buffer.available,
+            "pending_requests": len(self._requests),
+            "ingest_paused": self._pending_key is not None,
+            "received_keys": self._stats["received_keys"],
+            "received_bits": self._stats["received_bits"],
+            "delivered_bits": self._stats["delivered_bits"],
+            "served_requests": served,
+            "refused_requests": self._stats["refused_requests"],
+            "buffer_full": self._stats["buffer_full"],
+            "mean_latency": self._stats["total_latency"] / served if served else 0.0,
+            "max_latency": self._stats["max_latency"],
+        }
+
+    def _receive_key(self, zmq_socket: zmq.Socket):
+        """
+        Receive a key from the ingest socket and add it to the buffer.
+
+        Args:
+            zmq_socket (zmq.Socket): the PULL socket.
+        """
+        frames = zmq_socket.recv_multipart(copy=False)
+        try:
+            header = json.loads(frames[0].bytes)
+            length = header["key_length"]
+            if length is None:
+                return
+            key = np.unpackbits(
+                np.frombuffer(frames[1].buffer, dtype=np.uint8), count=length
+            )
+        except (json.JSONDecodeError, IndexError, KeyError, TypeError, ValueError):
+            logger.error("Invalid key received, ignoring it.")
+            return
+
+        self._stats["received_keys"] += 1
+        self._stats["received_bits"] += len(key)
+        self._store(key)
+
+    def _store(self, key: np.ndarray):
+        """
+        Add a key to the buffer, keeping the bits that do not fit for later.
+
+        Args:
+            key (np.ndarray): the key, as an array of bits.
+        """
+        added = self.buffer.put(key)
+        if added < len(key):
+            if self._pending_key is None:
+                logger.warning("Key buffer is full, pausing the reception of keys.")
+                self._stats["buffer_full"] += 1
+            self._pending_key = key[added:]
+        elif self._pending_key is not None:
+            logger.info("Key buffer has space again, resuming the reception.")
+            self._pending_key = None
+
+    def _reply(self, zmq_socket: zmq.Socket, envelope: List[bytes], frames: List):
+        """
+        Send a reply to a consumer.
+
+        Args:
+            zmq_socket (zmq.Socket): the ROUTER socket.
+            envelope (List[bytes]): the routing envelope of the request.
+            frames (List): the frames of the reply.
+        """
+        zmq_socket.send_multipart(envelope + frames, copy=False)
+
+    def _receive_request(self, zmq_socket: zmq.Socket):
+        """
+        Receive a request from a consumer.
+
+        Args:
+            zmq_socket (zmq.Socket): the ROUTER socket.
+        """
+        now = time.monotonic()
+        frames = zmq_socket.recv_multipart()
+        # The envelope contains the identity and, with REQ sockets, an empty delimiter
+        envelope_size = 2 if len(frames) > 1 and not frames[1] else 1
+        envelope, frames = frames[:envelope_size], frames[envelope_size:]
+
+        try:
+            request = json.loads(frames[0]) if frames else None
+            if not isinstance(request, dict):
+                raise ValueError("The request must be a JSON object.")
+            command = request.get("command")
+            if command == "stats":
+                self._reply(
+                    zmq_socket, envelope, [json.dumps(self.stats()).encode("utf-8")]
+                )
+                return
+            if command != "get_key":
+                raise ValueError(f"Unknown command {command}.")
+            size = request.get("size")
+            if not isinstance(size, int) or not 0 < size <= self.buffer.capacity:
+                raise ValueError(
+                    f"size must be an integer between 1 and {self.buffer.capacity}."
+                )
+            timeout = float(request.get("timeout", 0))
+        except (json.JSONDecodeError, TypeError, ValueError) as exc:
+            logger.error("Invalid request (%s).", str(exc))
+            self._reply(
+                zmq_socket, envelope, key_frames(None, True, error_message=str(exc))
+            )
+            return
+
+        self._requests.append((envelope, size, now, now + timeout))
+
+    def _serve_requests(self, zmq_socket: zmq.Socket):
+        """
+        Serve the waiting requests in order, and refuse the expired ones.
+
+        Args:
+            zmq_socket (zmq.Socket): the ROUTER socket.
+        """
+        while self._requests:
+            envelope, size, arrival, _ = self._requests[0]
+            key = self.buffer.get(size)
+            if key is None:
+                break
+            self._requests.popleft()
+            if self._pending_key is not None:
+                self._store(self._pending_key)
+            self._reply(zmq_socket, envelope, key_frames(key, True))
+            latency = time.monotonic() - arrival
+            self._stats["served_requests"] += 1
+            self._stats["delivered_bits"] += size
+            self._stats["total_latency"] += latency
+            self._stats["max_latency"] = max(self._stats["max_latency"], latency)
+
+        now = time.monotonic()
+        expired = [request for request in self._requests if request[3] <= now]
+        for request in expired:
+            self._requests.remove(request)
+            self._stats["refused_requests"] += 1
+            self._reply(
+                zmq_socket,
+                request[0],
+                key_frames(
+                    None,
+                    True,
+                    error_message=f"Not enough key available ({self.buffer.available} bits).",
+                ),
+            )
+
+    def serve(self, context: Optional[zmq.Context] = None):
+        """
+        Serve the producers and the consumers until interrupted.
+
+        Args:
+            context (Optional[zmq.Context], optional): ZMQ context, or None to use the global instance. Defaults to None.
+        """
+        context = context if context is not None else zmq.Context.instance()
+        logger.info("Starting key server.")
+        logger.info("Receiving keys at %s", self.ingest_endpoint)
+        ingest_socket = context.socket(zmq.PULL)
+        ingest_socket.bind(self.ingest_endpoint)
+        logger.info("Serving consumers at %s", self.consumer_endpoint)
+        consumer_socket = context.socket(zmq.ROUTER)
+        consumer_socket.bind(self.consumer_endpoint)
+
+        try:
+            while True:
+                poller = zmq.Poller()
+                poller.register(consumer_socket, zmq.POLLIN)
+                if self._pending_key is None:
+                    poller.register(ingest_socket, zmq.POLLIN)
+
+                timeout = None
+                if self._requests:
+                    deadline = min(request[3] for request in self._requests)
+                    timeout = int(max(deadline - time.monotonic(), 0) * 1000) + 1
+
+                events = dict(poller.poll(timeout))
+                if events.get(ingest_socket):
+                    self._receive_key(ingest_socket)
+                if events.get(consumer_socket):
+                    self._receive_request(consumer_socket)
+                self._serve_requests(consumer_socket)
+        except KeyboardInterrupt:
+            logger.info("Stopping key server.")
+        finally:
+            ingest_socket.close(linger=0)
+            consumer_socket.close(linger=0)
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    """Create the parser for qosst-pp-keyserver.
+
+    Returns:
+        argparse.ArgumentParser: the argument parser.
+    """
+    parser = argparse.ArgumentParser(prog="qosst-pp-keyserver")
+
+    parser.add_argument("--version", action="version", version=__version__)
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="Level of verbosity. If none, only critical errors will be prompted. -v will add warnings and errors, -vv will add info and -vvv will print all debug logs.",
+    )
+
+    parser.add_argument(
+        "ingest_endpoint",
+        help="Endpoint to bind to for receiving the keys of the reconciliation servers.",
+    )
+    parser.add_argument(
+        "consumer_endpoint",
+        help="Endpoint to bind to for receiving the requests of the consumers.",
+    )
+    parser.add_argument(
+        "--capacity",
+        type=int,
+        default=1 << 24,
+        help="Capacity of the key buffer, in bits.",
+    )
+
+    return parser
+
+
+def main():
+    """
+    Main entrypoint of qosst-pp-keyserver.
+    """
+    parser = _create_parser()
+
+    args = parser.parse_args()
+
+    create_loggers(args.verbose, None)
+
+    KeyServer(
+        args.ingest_endpoint, args.consumer_endpoint, capacity=args.capacity
+    ).serve()
+
+
+if __name__ == "__main__":
+    main()
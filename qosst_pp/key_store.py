@@ -0,0 +1,333 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Module defining an append-only store of keys on disk.
+
+The keys are appended as blocks to a data file, packed 8 bits per byte, each
+block starting on a new byte. An index file, next to the data file (with the
+``.index`` suffix), contains one fixed-size record per block with the session
+id, the block id, the length of the block in bits and its offset in bytes in
+the data file.
+
+The data file is memory-mapped for reading, so that the packed blocks are read
+without any copy. The store can be opened read-only by other processes, that
+call :meth:`KeyStore.refresh` to see the blocks appended since they opened it.
+
+The data of a block is written before its record in the index, so that a block
+is only visible once complete. When the store is opened for writing, the data
+that was written after the last record (for instance because of a crash) is
+discarded.
+"""
+
+import os
+import logging
+import threading
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+#: Record of a block in the index file.
+INDEX_DTYPE = np.dtype(
+    [
+        ("session_id", "S64"),
+        ("block_id", "<i8"),
+        ("length", "<i8"),
+        ("offset", "<i8"),
+    ]
+)
+
+
+# pylint: disable=too-many-instance-attributes
+class KeyStore:
+    """
+    Append-only store of key blocks, memory-mapped for reading.
+
+    The store is thread-safe, and can be used as a context manager.
+    """
+
+    path: str  #: Path of the data file.
+    index_path: str  #: Path of the index file.
+    readonly: bool  #: If True, the store can only be read.
+    sync: bool  #: If True, the files are synchronized to the disk after each block.
+
+    def __init__(self, path: str, readonly: bool = False, sync: bool = False):
+        """
+        Args:
+            path (str): path of the data file. The index file is the same path with the ``.index`` suffix.
+            readonly (bool, optional): if True, open the store for reading only. Defaults to False.
+            sync (bool, optional): if True, synchronize the files to the disk after each block. Defaults to False.
+
+        Raises:
+            FileNotFoundError: if the store is opened read-only and does not exist.
+        """
+        self.path = path
+        self.index_path = path + ".index"
+        self.readonly = readonly
+        self.sync = sync
+        self._lock = threading.Lock()
+        # The index is over-allocated to append the records in amortized constant time
+        self._records = np.zeros(0, dtype=INDEX_DTYPE)
+        self._count = 0
+        self._session_blocks: Dict[bytes, int] = {}
+        self._map: Optional[np.memmap] = None
+
+        if readonly:
+            if not os.path.exists(self.path) or not os.path.exists(self.index_path):
+                raise FileNotFoundError(f"Key store {self.path} does not exist.")
+            self._data_file = None
+            self._index_file = None
+            self.refresh()
+            return
+
+        self._data_file = open(self.path, "ab")  # pylint: disable=consider-using-with
+        self._index_file = open(  # pylint: disable=consider-using-with
+            self.index_path, "ab"
+        )
+        self.refresh()
+
+        # Discard an incomplete record and the data after the last block
+        self._index_file.truncate(self._count * INDEX_DTYPE.itemsize)
+        self._data_file.truncate(self._end)
+        logger.info("Key store %s opened with %i blocks.", self.path, len(self))
+
+    @property
+    def _index(self) -> np.ndarray:
+        """
+        Records of the blocks, without copy.
+
+        Returns:
+            np.ndarray: the records.
+        """
+        return self._records[: self._count]
+
+    def _extend(self, records: np.ndarray):
+        """
+        Add records to the index in memory.
+
+        Args:
+            records (np.ndarray): the records.
+        """
+        count = self._count + len(records)
+        if count > len(self._records):
+            grown = np.zeros(max(count, 2 * len(self._records), 1024), INDEX_DTYPE)
+            grown[: self._count] = self._index
+            self._records = grown
+        self._records[self._count : count] = records
+        self._count = count
+        for session_id in records["session_id"]:
+            self._session_blocks[session_id] = (
+                self._session_blocks.get(session_id, 0) + 1
+            )
+
+    @property
+    def _end(self) -> int:
+        """
+        Offset of the end of the last block in the data file.
+
+        Returns:
+            int: the offset, in bytes.
+        """
+        if self._count == 0:
+            return 0
+        last = self._records[self._count - 1]
+        return int(last["offset"]) + (int(last["length"]) + 7) // 8
+
+    def refresh(self):
+        """
+        Load the records appended to the index since the store was opened.
+        """
+        with self._lock:
+            count = os.path.getsize(self.index_path) // INDEX_DTYPE.itemsize
+            if count > self._count:
+                self._extend(
+                    np.fromfile(
+                        self.index_path,
+                        dtype=INDEX_DTYPE,
+                        count=count - self._count,
+                        offset=self._count * INDEX_DTYPE.itemsize,
+                    )
+                )
+
+    def append(
+        self,
+        key: Union[List[int], np.ndarray],
+        session_id: str = "",
+        block_id: Optional[int] = None,
+    ) -> int:
+        """
+        Append a key block to the store.
+
+        Args:
+            key (Union[List[int], np.ndarray]): the key, as an array of bits.
+            session_id (str, optional): id of the session of the key (at most 64 bytes once encoded in UTF-8). Defaults to "".
+            block_id (Optional[int], optional): id of the block in the session, or None to use the number of blocks already stored for this session. Defaults to None.
+
+        Raises:
+            ValueError: if the store is read-only or if the session id is too long.
+
+        Returns:
+            int: the position of the block in the store.
+        """
+        if self.readonly:
+            raise ValueError(f"Key store {self.path} is read-only.")
+        encoded_session_id = session_id.encode("utf-8")
+        if len(encoded_session_id) > INDEX_DTYPE["session_id"].itemsize:
+            raise ValueError(f"Session id {session_id} is too long.")
+
+        key = np.asarray(key, dtype=np.uint8)
+        with self._lock:
+            if block_id is None:
+                block_id = self._session_blocks.get(encoded_session_id, 0)
+            record = np.array(
+                [(encoded_session_id, block_id, len(key), self._end)],
+                dtype=INDEX_DTYPE,
+            )
+
+            self._data_file.write(np.packbits(key).tobytes())
+            self._data_file.flush()
+            if self.sync:
+                os.fsync(self._data_file.fileno())
+            self._index_file.write(record.tobytes())
+            self._index_file.flush()
+            if self.sync:
+                os.fsync(self._index_file.fileno())
+
+            self._extend(record)
+            position = self._count - 1
+        logger.debug(
+            "Block %i of session %s (%i bits) stored at position %i.",
+            block_id,
+            session_id,
+            len(key),
+            position,
+        )
+        return position
+
+    @property
+    def index(self) -> np.ndarray:
+        """
+        Records of the blocks, with the fields of :data:`INDEX_DTYPE`.
+
+        Returns:
+            np.ndarray: a copy of the index.
+        """
+        with self._lock:
+            return self._index.copy()
+
+    def find(self, session_id: str, block_id: Optional[int] = None) -> List[int]:
+        """
+        Find the positions of the blocks of a session.
+
+        Args:
+            session_id (str): id of the session.
+            block_id (Optional[int], optional): id of the block, or None to find all the blocks of the session. Defaults to None.
+
+        Returns:
+            List[int]: the positions of the blocks, in the order of the store.
+        """
+        with self._lock:
+            mask = self._index["session_id"] == session_id.encode("utf-8")
+            if block_id is not None:
+                mask &= self._index["block_id"] == block_id
+            return np.flatnonzero(mask).tolist()
+
+    def _mapped(self, end: int) -> np.memmap:
+        """
+        Get the memory map of the data file, covering at least the given offset.
+
+        Args:
+            end (int): the offset that must be mapped, in bytes.
+
+        Returns:
+            np.memmap: the memory map, read-only.
+        """
+        if self._map is None or len(self._map) < end:
+            # The previous map stays valid for the arrays still referencing it
+            self._map = np.memmap(self.path, dtype=np.uint8, mode="r")
+        return self._map
+
+    def read_packed(self, start: int, stop: Optional[int] = None) -> np.ndarray:
+        """
+        Read consecutive blocks, packed 8 bits per byte, without copy.
+
+        Each block starts on a new byte, so the last byte of a block can contain
+        padding bits. The lengths of the blocks are given by the index.
+
+        Args:
+            start (int): position of the first block.
+            stop (Optional[int], optional): position after the last block, or None to read a single block. Defaults to None.
+
+        Raises:
+            IndexError: if the positions are out of the store.
+
+        Returns:
+            np.ndarray: the packed blocks, as a read-only array of bytes.
+        """
+        stop = start + 1 if stop is None else stop
+        with self._lock:
+            if not 0 <= start < stop <= len(self._index):
+                raise IndexError(
+                    f"Blocks {start} to {stop} are out of the store ({len(self._index)} blocks)."
+                )
+            first, last = self._index[start], self._index[stop - 1]
+            begin = int(first["offset"])
+            end = int(last["offset"]) + (int(last["length"]) + 7) // 8
+            if begin == end:
+                return np.zeros(0, dtype=np.uint8)
+            return self._mapped(end)[begin:end]
+
+    def read(self, position: int) -> np.ndarray:
+        """
+        Read a block.
+
+        Args:
+            position (int): position of the block.
+
+        Raises:
+            IndexError: if the position is out of the store.
+
+        Returns:
+            np.ndarray: the key of the block, as an array of bits.
+        """
+        packed = self.read_packed(position)
+        with self._lock:
+            length = int(self._index[position]["length"])
+        return np.unpackbits(packed, count=length)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self):
+        """
+        Close the store.
+        """
+        with self._lock:
+            if self._data_file is not None:
+                self._data_file.close()
+                self._data_file = None
+            if self._index_file is not None:
+                self._index_file.close()
+                self._index_file = None
+            self._map = None
+
+    def __enter__(self) -> "KeyStore":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
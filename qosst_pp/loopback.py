@@ -0,0 +1,196 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Module defining an in-process loopback transport.
+
+The loopback sockets have the same ``send``/``recv``/``request`` surface as the
+QOSST server and client, and can be given instead of them to the error
+reconciliation and privacy amplification functions, so that Alice and Bob can
+run in two threads or two processes of the same machine without TCP sockets.
+
+The messages are exchanged over a pair of queues. By default, the content of
+the messages is serialized to JSON as by the QOSST sockets, so that the
+receiver gets the same objects as over the network. The serialization can be
+skipped, in which case the receiver gets the objects given to ``send`` (or a
+pickled copy of them between processes): the sender must then not modify them
+after sending.
+
+The messages are neither authenticated nor framed, the loopback transport being
+only meant for co-located simulation and benchmarking.
+"""
+
+import json
+import queue
+import logging
+import multiprocessing
+from typing import Dict, Optional, Tuple, Union
+
+from qosst_core.control_protocol.codes import QOSSTCodes, QOSSTErrorCodes
+
+logger = logging.getLogger(__name__)
+
+#: Message put in the queue when a socket is closed.
+_CLOSED = None
+
+
+class LoopbackSocket:
+    """
+    End of a loopback connection.
+
+    The sockets are created in pairs by :func:`loopback_pair`. They are already
+    connected, :meth:`open` and :meth:`connect` being only kept for compatibility
+    with the QOSST sockets.
+    """
+
+    serialize: bool  #: If True, the content of the messages is serialized to JSON.
+
+    def __init__(
+        self,
+        inbox: Union[queue.Queue, "multiprocessing.queues.Queue"],
+        outbox: Union[queue.Queue, "multiprocessing.queues.Queue"],
+        serialize: bool = True,
+    ):
+        """
+        Args:
+            inbox (Union[queue.Queue, multiprocessing.queues.Queue]): queue of the received messages.
+            outbox (Union[queue.Queue, multiprocessing.queues.Queue]): queue of the sent messages, which is the inbox of the other end.
+            serialize (bool, optional): if True, serialize the content of the messages to JSON. Defaults to True.
+        """
+        self.serialize = serialize
+        self._inbox = inbox
+        self._outbox = outbox
+        self._closed = False
+        self._peer_closed = False
+
+    def open(self):
+        """
+        Open socket. This has no effect.
+        """
+
+    def connect(self):
+        """
+        Connect socket. This has no effect.
+        """
+
+    def send(self, code: QOSSTCodes, data: Optional[Dict] = None):
+        """
+        Send a message with code and data.
+
+        Args:
+            code (QOSSTCodes): the code of the message to send.
+            data (Dict, optional): content of the message. Defaults to None.
+
+        Raises:
+            OSError: if the socket is closed.
+        """
+        if self._closed:
+            raise OSError("Socket is closed. Impossible to send data.")
+        content = data or None
+        if content is not None and self.serialize:
+            content = json.dumps(content)
+        logger.debug("Sending loopback message with code %s (%i)", str(code), code)
+        self._outbox.put((int(code), content))
+
+    def recv(self) -> Tuple[Union[QOSSTCodes, QOSSTErrorCodes], Optional[Dict]]:
+        """
+        Receive a message and return code and data.
+
+        Raises:
+            OSError: if the socket is closed.
+
+        Returns:
+            Tuple[Union[QOSSTCodes, QOSSTErrorCodes], Optional[Dict]]: the code of the message (or the error code) and the optional content of the message.
+        """
+        if self._closed:
+            raise OSError("Socket is closed. Impossible to receive data.")
+        if self._peer_closed:
+            return QOSSTErrorCodes.SOCKET_DISCONNECTION, None
+
+        message = self._inbox.get()
+        if message is _CLOSED:
+            logger.warning("Loopback socket disconnected.")
+            self._peer_closed = True
+            return QOSSTErrorCodes.SOCKET_DISCONNECTION, None
+
+        code, content = message
+        try:
+            code = QOSSTCodes(code)
+        except ValueError as exc:
+            logger.error("%s is not a valid code (%s)", str(code), str(exc))
+            return QOSSTErrorCodes.UNKOWN_CODE, None
+        if content is not None and self.serialize:
+            content = json.loads(content)
+        logger.debug("Loopback message received with code %s (%i)", str(code), code)
+        return code, content
+
+    def close(self):
+        """
+        Close socket. The other end receives a disconnection.
+        """
+        if not self._closed:
+            self._closed = True
+            self._outbox.put(_CLOSED)
+
+
+class LoopbackServer(LoopbackSocket):
+    """
+    Loopback end of Alice, used instead of a QOSST server.
+    """
+
+
+class LoopbackClient(LoopbackSocket):
+    """
+    Loopback end of Bob, used instead of a QOSST client.
+    """
+
+    def request(
+        self, code: QOSSTCodes, data: Optional[Dict] = None
+    ) -> Tuple[Union[QOSSTCodes, QOSSTErrorCodes], Optional[Dict]]:
+        """Send a message to the server and wait for a response.
+
+        Args:
+            code (QOSSTCodes): the code of the message to send.
+            data (Dict, optional): the content of the message to send. Defaults to None.
+
+        Returns:
+            Tuple[Union[QOSSTCodes, QOSSTErrorCodes], Optional[Dict]]: the code and the content of the received message.
+        """
+        self.send(code, data)
+        return self.recv()
+
+
+def loopback_pair(
+    serialize: bool = True, processes: bool = False
+) -> Tuple[LoopbackServer, LoopbackClient]:
+    """
+    Create a connected pair of loopback sockets.
+
+    Args:
+        serialize (bool, optional): if True, serialize the content of the messages to JSON. Defaults to True.
+        processes (bool, optional): if True, the sockets use queues of multiprocessing so that they can be given to two processes, otherwise they can only be used by two threads. Defaults to False.
+
+    Returns:
+        Tuple[LoopbackServer, LoopbackClient]: the server end, for Alice, and the client end, for Bob.
+    """
+    if processes:
+        to_server, to_client = multiprocessing.Queue(), multiprocessing.Queue()
+    else:
+        to_server, to_client = queue.Queue(), queue.Queue()
+    return (
+        LoopbackServer(to_server, to_client, serialize=serialize),
+        LoopbackClient(to_client, to_server, serialize=serialize),
+    )
@@ -0,0 +1,389 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Module defining the ZMQ messages exchanged between the application and the servers.
+
+Three formats are supported for the requests:
+
+* the JSON format, where the request is a single JSON frame containing the
+  parameters and the symbols as a list (for instance ``alice_symbols``);
+* the multipart format, where the first frame is a small JSON header containing
+  the parameters and the ``dtype`` and ``shape`` of the symbols, and the second
+  frame is the raw buffer of the symbols. The symbols are then decoded with
+  ``np.frombuffer`` without any copy;
+* the shared format, for an application on the same host, where the request is
+  a single JSON frame containing the parameters and the location of the symbols:
+  either the name of a shared memory segment (``shared_memory``) or the path of
+  a file (``symbols_file``), the ``dtype`` and ``shape`` of the symbols and
+  their ``offset`` in bytes (0 by default). For ``.npy`` files, the ``dtype``
+  and ``shape`` default to the ones of the file and the offset is relative to
+  the beginning of the data. The symbols are mapped read-only without any copy,
+  and must not be modified by the application until the reply is received.
+  The shared memory segments are attached for each request and detached by
+  the servers once the reply is sent (see :func:`release_symbols`), so that the
+  application can unlink or replace them between requests.
+
+The server answers in the same format as the request, the shared format being
+answered as the multipart format. In the JSON format, the reply is
+``{"key": key}``. In the multipart format, the first frame is a JSON header
+containing ``key_length`` and the second frame is the key, packed 8 bits per
+byte.
+"""
+
+import sys
+import json
+import threading
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Optional, Tuple, List, Union
+
+import zmq
+import numpy as np
+
+#: Shared memory segments attached for the requests being processed, by name, with their number of requests and number of references to their mapping when attached.
+_shared_memories: Dict[str, List] = {}
+#: Detached shared memory segments whose symbols might still be in use, with the number of references to their mapping when attached.
+_released_shared_memories: List[Tuple[SharedMemory, int]] = []
+_shared_memories_lock = threading.Lock()
+
+
+def _array_from_frame(header: Dict, frame: zmq.Frame) -> np.ndarray:
+    """
+    Get a read-only array from a ZMQ frame, without copy.
+
+    Args:
+        header (Dict): header containing the dtype and shape of the array.
+        frame (zmq.Frame): frame containing the raw buffer of the array.
+
+    Raises:
+        ValueError: if the dtype or shape are missing or do not match the buffer.
+
+    Returns:
+        np.ndarray: the array.
+    """
+    if not "dtype" in header or not "shape" in header:
+        raise ValueError("dtype or shape is missing from the header.")
+    try:
+        dtype = np.dtype(header["dtype"])
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"Invalid dtype {header['dtype']} ({exc}).") from exc
+    try:
+        return np.frombuffer(frame.buffer, dtype=dtype).reshape(header["shape"])
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"Invalid shape {header['shape']} ({exc}).") from exc
+
+
+def _mapping_references(shared_memory: SharedMemory) -> int:
+    """
+    Count the references to the mapping of a shared memory segment.
+
+    The arrays created on the segment refer to its mapping, without preventing
+    it from being closed, so the references are used to know whether arrays
+    are still alive.
+
+    Args:
+        shared_memory (SharedMemory): the shared memory segment.
+
+    Returns:
+        int: the number of references.
+    """
+    return sys.getrefcount(shared_memory.buf.obj)
+
+
+def _close_released_shared_memories():
+    """
+    Close the detached shared memory segments whose arrays have been freed.
+
+    The lock must be held by the caller.
+    """
+    for released in list(_released_shared_memories):
+        shared_memory, references = released
+        if _mapping_references(shared_memory) > references:
+            continue
+        shared_memory.close()
+        _released_shared_memories.remove(released)
+
+
+def _attach_shared_memory(name: str) -> SharedMemory:
+    """
+    Attach to a shared memory segment created by the application.
+
+    The segment is attached once for the requests processed at the same time,
+    and must be detached with :func:`_detach_shared_memory` for each of them.
+    It is not tracked, so that it is not destroyed when the server stops.
+
+    Args:
+        name (str): name of the shared memory segment.
+
+    Raises:
+        ValueError: if the segment does not exist.
+
+    Returns:
+        SharedMemory: the shared memory segment.
+    """
+    with _shared_memories_lock:
+        _close_released_shared_memories()
+        if name in _shared_memories:
+            _shared_memories[name][1] += 1
+            return _shared_memories[name][0]
+        try:
+            try:
+                # pylint: disable=unexpected-keyword-arg
+                shared_memory = SharedMemory(name, track=False)
+            except TypeError:
+                # Python < 3.13 always registers the segment in the resource tracker
+                shared_memory = SharedMemory(name)
+                # pylint: disable=protected-access
+                resource_tracker.unregister(shared_memory._name, "shared_memory")
+        except FileNotFoundError as exc:
+            raise ValueError(f"Shared memory {name} does not exist.") from exc
+        _shared_memories[name] = [
+            shared_memory,
+            1,
+            _mapping_references(shared_memory),
+        ]
+        return shared_memory
+
+
+def _detach_shared_memory(name: str):
+    """
+    Detach from a shared memory segment once a request is processed.
+
+    The segment is closed when no other request uses it and no array refers
+    to it anymore, possibly at a later request.
+
+    Args:
+        name (str): name of the shared memory segment.
+    """
+    with _shared_memories_lock:
+        if not name in _shared_memories:
+            return
+        _shared_memories[name][1] -= 1
+        if _shared_memories[name][1]:
+            return
+        shared_memory, _, references = _shared_memories.pop(name)
+        _released_shared_memories.append((shared_memory, references))
+        _close_released_shared_memories()
+
+
+def _shared_array(header: Dict) -> np.ndarray:
+    """
+    Map read-only the symbols located in a shared memory segment or a file.
+
+    Args:
+        header (Dict): request containing the location, dtype, shape and offset of the symbols.
+
+    Raises:
+        ValueError: if the location is invalid or the symbols do not fit in it.
+
+    Returns:
+        np.ndarray: the symbols, as a read-only array.
+    """
+    offset = header.get("offset", 0)
+    if "shared_memory" in header:
+        if not "dtype" in header or not "shape" in header:
+            raise ValueError("dtype or shape is missing from the request.")
+        if not isinstance(header["shared_memory"], str):
+            raise ValueError("The name of the shared memory must be a string.")
+        shared_memory = _attach_shared_memory(header["shared_memory"])
+        try:
+            array = np.ndarray(
+                header["shape"],
+                dtype=np.dtype(header["dtype"]),
+                buffer=shared_memory.buf,
+                offset=offset,
+            )
+        except (TypeError, ValueError) as exc:
+            _detach_shared_memory(header["shared_memory"])
+            raise ValueError(f"Invalid symbols location ({exc}).") from exc
+        array.flags.writeable = False
+        return array
+
+    path = header["symbols_file"]
+    if not isinstance(path, str):
+        raise ValueError("The path of the symbols file must be a string.")
+    try:
+        if path.endswith(".npy"):
+            array = np.load(path, mmap_mode="r")
+            if not offset and not "dtype" in header and not "shape" in header:
+                return array
+            offset += array.offset
+            header.setdefault("dtype", array.dtype.str)
+            header.setdefault("shape", list(array.shape))
+        if not "dtype" in header or not "shape" in header:
+            raise ValueError("dtype or shape is missing from the request.")
+        return np.memmap(
+            path,
+            dtype=np.dtype(header["dtype"]),
+            mode="r",
+            offset=offset,
+            shape=tuple(header["shape"]),
+        )
+    except (OSError, TypeError, ValueError) as exc:
+        raise ValueError(f"Invalid symbols location ({exc}).") from exc
+
+
+def parse_symbols(frames: List[zmq.Frame], field: str) -> Tuple[Dict, np.ndarray, bool]:
+    """
+    Parse the frames of a reconciliation request from the application.
+
+    Args:
+        frames (List[zmq.Frame]): the frames of the request, without the routing envelope.
+        field (str): name of the field containing the symbols in the JSON format.
+
+    Raises:
+        ValueError: if the request is malformed.
+
+    Returns:
+        Tuple[Dict, np.ndarray, bool]: the parameters of the request, the symbols and True if the request was in the multipart format.
+    """
+    if not frames:
+        raise ValueError("The request is empty.")
+    try:
+        header = json.loads(frames[0].bytes)
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"Invalid JSON header ({exc}).") from exc
+    if not isinstance(header, dict):
+        raise ValueError("The JSON header must be an object.")
+
+    if field in header:
+        try:
+            return header, np.array(header.pop(field)), False
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"Invalid symbols ({exc}).") from exc
+
+    if "shared_memory" in header or "symbols_file" in header:
+        return header, _shared_array(header), True
+
+    if len(frames) < 2:
+        raise ValueError("The frame containing the symbols is missing.")
+    return header, _array_from_frame(header, frames[1]), True
+
+
+def release_symbols(header: Dict):
+    """
+    Release the symbols of a request once the reply has been sent.
+
+    For the requests in the shared format, the shared memory segment is
+    detached, and the symbols must not be used anymore. Nothing is done for the
+    other formats.
+
+    Args:
+        header (Dict): the parameters of the request, as returned by :func:`parse_symbols`.
+    """
+    if "shared_memory" in header:
+        _detach_shared_memory(header["shared_memory"])
+
+
+def recv_symbols(zmq_socket: zmq.Socket, field: str) -> Tuple[Dict, np.ndarray, bool]:
+    """
+    Receive a reconciliation request from the application.
+
+    Args:
+        zmq_socket (zmq.Socket): the ZMQ socket to receive from.
+        field (str): name of the field containing the symbols in the JSON format.
+
+    Raises:
+        ValueError: if the request is malformed.
+
+    Returns:
+        Tuple[Dict, np.ndarray, bool]: the parameters of the request, the symbols and True if the request was in the multipart format.
+    """
+    return parse_symbols(zmq_socket.recv_multipart(copy=False), field)
+
+
+def key_frames(
+    key: Optional[Union[List[int], np.ndarray]], multipart: bool, **parameters
+) -> List[Union[bytes, np.ndarray]]:
+    """
+    Get the frames of the reply containing the key.
+
+    Args:
+        key (Optional[Union[List[int], np.ndarray]]): the key, or None if the reconciliation failed.
+        multipart (bool): if True, use the multipart format, otherwise use the JSON format.
+        **parameters: additional parameters to add to the reply.
+
+    Returns:
+        List[Union[bytes, np.ndarray]]: the frames of the reply.
+    """
+    if not multipart:
+        if isinstance(key, np.ndarray):
+            key = key.tolist()
+        return [json.dumps({"key": key, **parameters}).encode("utf-8")]
+
+    if key is None:
+        return [json.dumps({"key_length": None, **parameters}).encode("utf-8")]
+
+    header = {"key_length": len(key), **parameters}
+    return [
+        json.dumps(header).encode("utf-8"),
+        np.packbits(np.asarray(key, dtype=np.uint8)),
+    ]
+
+
+def send_key(
+    zmq_socket: zmq.Socket,
+    key: Optional[Union[List[int], np.ndarray]],
+    multipart: bool,
+    **parameters,
+):
+    """
+    Send the key back to the application.
+
+    Args:
+        zmq_socket (zmq.Socket): the ZMQ socket to send to.
+        key (Optional[Union[List[int], np.ndarray]]): the key, or None if the reconciliation failed.
+        multipart (bool): if True, use the multipart format, otherwise use the JSON format.
+        **parameters: additional parameters to add to the reply.
+    """
+    zmq_socket.send_multipart(key_frames(key, multipart, **parameters), copy=False)
+
+
+def send_symbols(zmq_socket: zmq.Socket, symbols: np.ndarray, **parameters):
+    """
+    Send a reconciliation request to a server, in the multipart format.
+
+    This function is intended to be used by the application.
+
+    Args:
+        zmq_socket (zmq.Socket): the ZMQ socket connected to the server.
+        symbols (np.ndarray): the symbols, as an array of real numbers.
+        **parameters: the parameters of the request (e.g. mdr_dimension).
+    """
+    symbols = np.ascontiguousarray(symbols)
+    header = {"dtype": symbols.dtype.str, "shape": list(symbols.shape), **parameters}
+    zmq_socket.send_multipart([json.dumps(header).encode("utf-8"), symbols], copy=False)
+
+
+def recv_key(zmq_socket: zmq.Socket) -> Tuple[Optional[np.ndarray], Dict]:
+    """
+    Receive the key from a server, in the multipart format.
+
+    This function is intended to be used by the application.
+
+    Args:
+        zmq_socket (zmq.Socket): the ZMQ socket connected to the server.
+
+    Returns:
+        Tuple[Optional[np.ndarray], Dict]: the key as an array of bits (or None if the reconciliation failed) and the header of the reply.
+    """
+    frames = zmq_socket.recv_multipart(copy=False)
+    header = json.loads(frames[0].bytes)
+    if header.get("key_length") is None or len(frames) < 2:
+        return None, header
+    packed = np.frombuffer(frames[1].buffer, dtype=np.uint8)
+    return np.unpackbits(packed, count=header["key_length"]), header
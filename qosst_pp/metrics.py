@@ -0,0 +1,334 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Module defining the timing instrumentation of the post-processing.
+
+The error reconciliation and the privacy amplification time each of their
+phases and record them in :data:`phase_metrics`, with the number of frames,
+symbols, bits or bytes processed by the phase. The phases are:
+
+* ``ec_bob_encode``: computation of the syndromes and channel messages by Bob;
+* ``ec_bob_wait_verification``: wait of Bob for the EC_VERIFICATION message (network and decoding of Alice);
+* ``ec_bob_crc_check``: check of the CRCs of Alice by Bob;
+* ``ec_bob_wait_finished``: wait of Bob for the acknowledgment of the final discard flags;
+* ``ec_alice_decode``: decoding of the frames by Alice;
+* ``ec_alice_wait_discard_flags``: wait of Alice for the next message of Bob (network and encoding of Bob);
+* ``pa_bob_extract`` and ``pa_alice_extract``: extraction of the final key;
+* ``pa_bob_wait_success``: wait of Bob for the answer of Alice to the PA_REQUEST message.
+
+In pipelined mode, the phases are recorded for each batch. The phases producing
+the content of a message (the encoding, decoding and CRC check, and the
+extraction of Bob) also record its payload (``payload_bytes``): the size of its
+arrays, with 64-bit numbers, 32-bit CRCs and packed bits, independently of the
+encoding.
+
+The metrics can be exported as Prometheus text, either with :meth:`PhaseMetrics.render`
+or with the HTTP endpoint of :func:`start_metrics_server`, and callbacks can be
+registered to be called after each phase, for instance to log slow blocks.
+"""
+
+import time
+import bisect
+import logging
+import threading
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+#: Upper bounds of the buckets of the histograms of the durations, in seconds.
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+#: Callback called after each phase, with the phase, its duration in seconds and its counts.
+PhaseCallback = Callable[[str, float, Dict[str, int]], None]
+
+
+def _escape(value: str) -> str:
+    """
+    Escape a label value of the Prometheus text format.
+
+    Args:
+        value (str): the value.
+
+    Returns:
+        str: the escaped value.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class PhaseMetrics:
+    """
+    Thread-safe registry of the durations and counts of the phases.
+    """
+
+    buckets: Tuple[float, ...]  #: Upper bounds of the buckets of the histograms.
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Args:
+            buckets (Sequence[float], optional): upper bounds of the buckets of the histograms of the durations, in seconds. Defaults to DEFAULT_BUCKETS.
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._phases: Dict[str, Dict] = {}
+        self._callbacks: List[PhaseCallback] = []
+
+    def add_callback(self, callback: PhaseCallback):
+        """
+        Register a callback, called after each phase.
+
+        The callback is called in the thread that executed the phase, and its
+        exceptions are logged and ignored.
+
+        Args:
+            callback (PhaseCallback): the callback, taking the phase, its duration in seconds and its counts.
+        """
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def remove_callback(self, callback: PhaseCallback):
+        """
+        Unregister a callback.
+
+        Args:
+            callback (PhaseCallback): the callback.
+        """
+        with self._lock:
+            self._callbacks.remove(callback)
+
+    def record(self, phase: str, duration: float, **counts: int):
+        """
+        Record the execution of a phase.
+
+        Args:
+            phase (str): name of the phase.
+            duration (float): duration of the phase, in seconds.
+            **counts (int): numbers of items processed by the phase (e.g. frames, symbols, bits or payload_bytes).
+        """
+        with self._lock:
+            stats = self._phases.get(phase)
+            if stats is None:
+                stats = {
+                    "count": 0,
+                    "sum": 0.0,
+                    "last": 0.0,
+                    "buckets": [0] * len(self.buckets),
+                    "counts": {},
+                }
+                self._phases[phase] = stats
+            stats["count"] += 1
+            stats["sum"] += duration
+            stats["last"] = duration
+            index = bisect.bisect_left(self.buckets, duration)
+            if index < len(self.buckets):
+                stats["buckets"][index] += 1
+            for name, value in counts.items():
+                stats["counts"][name] = stats["counts"].get(name, 0) + value
+            callbacks = list(self._callbacks)
+
+        for callback in callbacks:
+            try:
+                callback(phase, duration, counts)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Metrics callback %s failed.", str(callback))
+
+    @contextlib.contextmanager
+    def timer(self, phase: str, **counts: int) -> Iterator[Dict[str, int]]:
+        """
+        Time a phase and record it when the block exits, even on error.
+
+        Args:
+            phase (str): name of the phase.
+            **counts (int): numbers of items processed by the phase, known before the phase.
+
+        Yields:
+            Dict[str, int]: the counts of the phase, that can be completed in the block.
+        """
+        start = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            self.record(phase, time.perf_counter() - start, **counts)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Get the metrics of the phases.
+
+        Returns:
+            Dict[str, Dict]: for each phase, the number of executions (count), the total and last durations in seconds (sum and last), and the total counts.
+        """
+        with self._lock:
+            return {
+                phase: {
+                    "count": stats["count"],
+                    "sum": stats["sum"],
+                    "last": stats["last"],
+                    **stats["counts"],
+                }
+                for phase, stats in self._phases.items()
+            }
+
+    def reset(self):
+        """
+        Forget the recorded phases. The callbacks are kept.
+        """
+        with self._lock:
+            self._phases.clear()
+
+    def render(self) -> str:
+        """
+        Render the metrics in the Prometheus text format.
+
+        Returns:
+            str: the metrics.
+        """
+        with self._lock:
+            phases = sorted(
+                (
+                    phase,
+                    {
+                        **stats,
+                        "buckets": list(stats["buckets"]),
+                        "counts": dict(stats["counts"]),
+                    },
+                )
+                for phase, stats in self._phases.items()
+            )
+
+        lines = [
+            "# HELP qosst_pp_phase_duration_seconds Duration of the phases of the post-processing.",
+            "# TYPE qosst_pp_phase_duration_seconds histogram",
+        ]
+        for phase, stats in phases:
+            label = f'phase="{_escape(phase)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, stats["buckets"]):
+                cumulative += count
+                lines.append(
+                    f'qosst_pp_phase_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f'qosst_pp_phase_duration_seconds_bucket{{{label},le="+Inf"}} {stats["count"]}'
+            )
+            lines.append(
+                f"qosst_pp_phase_duration_seconds_sum{{{label}}} {stats['sum']}"
+            )
+            lines.append(
+                f"qosst_pp_phase_duration_seconds_count{{{label}}} {stats['count']}"
+            )
+
+        lines.extend(
+            [
+                "# HELP qosst_pp_phase_last_duration_seconds Duration of the last execution of the phases.",
+                "# TYPE qosst_pp_phase_last_duration_seconds gauge",
+            ]
+        )
+        for phase, stats in phases:
+            lines.append(
+                f'qosst_pp_phase_last_duration_seconds{{phase="{_escape(phase)}"}} {stats["last"]}'
+            )
+
+        names = sorted({name for _, stats in phases for name in stats["counts"]})
+        for name in names:
+            metric = f"qosst_pp_phase_{name}_total"
+            lines.extend(
+                [
+                    f"# HELP {metric} Number of {name.replace('_', ' ')} processed by the phases.",
+                    f"# TYPE {metric} counter",
+                ]
+            )
+            for phase, stats in phases:
+                if name in stats["counts"]:
+                    lines.append(
+                        f'{metric}{{phase="{_escape(phase)}"}} {stats["counts"][name]}'
+                    )
+        return "\n".join(lines) + "\n"
+
+
+#: Metrics of the phases of the post-processing, shared by the whole process.
+phase_metrics = PhaseMetrics()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Handler serving the metrics in the Prometheus text format.
+    """
+
+    metrics: PhaseMetrics = phase_metrics  #: Metrics to serve.
+
+    # pylint: disable=invalid-name
+    def do_GET(self):
+        """
+        Serve the metrics on /metrics (and /).
+        """
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # pylint: disable=redefined-builtin
+    def log_message(self, format, *args):
+        logger.debug("Metrics request: " + format, *args)
+
+
+def start_metrics_server(
+    port: int, host: str = "127.0.0.1", metrics: PhaseMetrics = phase_metrics
+) -> ThreadingHTTPServer:
+    """
+    Serve the metrics over HTTP, in a daemon thread.
+
+    Args:
+        port (int): port to listen to.
+        host (str, optional): address to bind to, or "" for all the interfaces. Defaults to "127.0.0.1", so that the metrics are only served locally.
+        metrics (PhaseMetrics, optional): the metrics to serve. Defaults to phase_metrics.
+
+    Returns:
+        ThreadingHTTPServer: the HTTP server, that can be stopped with its shutdown method.
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"metrics": metrics})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logger.info(
+        "Serving the metrics at http://%s:%i/metrics",
+        host or "0.0.0.0",
+        server.server_address[1],
+    )
+    return server
@@ -19,39 +19,159 @@ Module defining privacy amplification functions for Alice and Bob.
 """
 
 import logging
-from typing import List, Type, Optional, Dict
+from typing import Type, Optional, Dict, List, Tuple
+
+import numpy as np
+from numpy.typing import ArrayLike
 
 from qosst_core.control_protocol.sockets import QOSSTClient, QOSSTServer
 from qosst_core.control_protocol.codes import QOSSTCodes
 from qosst_core.extractors import RandomnessExtractor
 
+from qosst_pp.encoding import LIST_ENCODING, encode_fields, decode_fields
+from qosst_pp.executors import get_executor
+from qosst_pp.extractors import extractor_cache, segment_sizes
+from qosst_pp.metrics import phase_metrics
+from qosst_pp.seed_pool import SeedPool
+
 logger = logging.getLogger(__name__)
 
 
+def _extract_block(block: Tuple) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    Extract the final key of a block (executed in a worker process if parallel).
+
+    Args:
+        block (Tuple): extractor class, reconciled key of the block, final key size of the block and seed of the block (or None to generate it).
+
+    Returns:
+        Tuple[Optional[np.ndarray], Optional[np.ndarray]]: the final key and the seed of the block.
+    """
+    extractor_class, reconciled_key, final_key_size, seed = block
+    extractor = extractor_cache.get(
+        extractor_class, len(reconciled_key), final_key_size
+    )
+    return extractor.extract(reconciled_key, seed)
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments, too-many-locals
+def _extract_blocks(
+    extractor_class: Type[RandomnessExtractor],
+    reconciled_key: np.ndarray,
+    final_key_size: int,
+    block_size: int,
+    seed: Optional[np.ndarray] = None,
+    seed_pool: Optional[SeedPool] = None,
+    workers: int = 1,
+) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    Extract the final key block by block.
+
+    The reconciled key is split in blocks as given by
+    :func:`qosst_pp.extractors.segment_sizes`, each block is extracted with its
+    own extractor and its own slice of the seed, and the final keys of the
+    blocks are concatenated in order. The seed is the concatenation of the
+    seeds of the blocks. Blocks without output do not use any seed.
+
+    Args:
+        extractor_class (Type[RandomnessExtractor]): the extractor class.
+        reconciled_key (np.ndarray): the reconciled key, as an array of bits.
+        final_key_size (int): the size of the final key.
+        block_size (int): maximal number of bits of a block.
+        seed (Optional[np.ndarray], optional): the concatenated seeds of the blocks, or None to generate them. Defaults to None.
+        seed_pool (Optional[SeedPool], optional): pool to take the seeds from if the seed is not given. Defaults to None.
+        workers (int, optional): number of extraction processes. Defaults to 1.
+
+    Raises:
+        ValueError: if the block size is not positive or if the seed does not have the expected size.
+
+    Returns:
+        Tuple[Optional[np.ndarray], Optional[np.ndarray]]: the final key and the seed.
+    """
+    blocks: List[Tuple] = []
+    key_offset = 0
+    seed_offset = 0
+    for block_input_size, block_output_size in segment_sizes(
+        len(reconciled_key), final_key_size, block_size
+    ):
+        block_key = reconciled_key[key_offset : key_offset + block_input_size]
+        key_offset += block_input_size
+        if block_output_size == 0:
+            continue
+        block_seed = None
+        if seed is not None or seed_pool is not None:
+            block_seed_size = extractor_cache.get(
+                extractor_class, block_input_size, block_output_size
+            ).seed_size
+            if seed is not None:
+                block_seed = seed[seed_offset : seed_offset + block_seed_size]
+            else:
+                block_seed = seed_pool.get(block_seed_size)
+            seed_offset += block_seed_size
+        blocks.append((extractor_class, block_key, block_output_size, block_seed))
+
+    if seed is not None and seed_offset != len(seed):
+        raise ValueError(
+            f"Seed has {len(seed)} bits but the blocks require {seed_offset} bits."
+        )
+
+    logger.info(
+        "Extracting %i blocks of at most %i bits with %i processes.",
+        len(blocks),
+        block_size,
+        workers,
+    )
+    if workers > 1:
+        outputs = list(get_executor(workers).map(_extract_block, blocks))
+    else:
+        outputs = [_extract_block(block) for block in blocks]
+
+    if any(block_final_key is None for block_final_key, _ in outputs):
+        return None, None
+    final_keys = [block_final_key for block_final_key, _ in outputs]
+    seeds = [np.asarray(block_seed, dtype=np.uint8) for _, block_seed in outputs]
+    return (
+        np.concatenate(final_keys or [np.zeros(0, dtype=np.uint8)]),
+        np.concatenate(seeds or [np.zeros(0, dtype=np.uint8)]),
+    )
+
+
 def privacy_amplification_alice(
     socket: QOSSTServer,
-    reconciled_key: List[int],
+    reconciled_key: ArrayLike,
     extractor_class: Type[RandomnessExtractor],
     data: Optional[Dict],
-) -> Optional[List[int]]:
+    workers: int = 1,
+) -> Optional[np.ndarray]:
     """
     Perform Alice privacy amplification.
 
     Function called after a PA request. Get seed from PA request
     and used the selected extractor to get the final key.
 
-    Errors happen if the seed is not of the appropriate length or if
-    the seed is not in the data of the message.
+    Errors happen if the seed is not of the appropriate length, if
+    the seed is not in the data of the message or if Bob used another
+    extractor.
+
+    The seed is decoded with the encoding chosen by Bob (see :mod:`qosst_pp.encoding`).
+
+    The extractor is taken from :data:`qosst_pp.extractors.extractor_cache`, so
+    that it is only prepared once for repeated key sizes.
+
+    If Bob sent a block size, the key is extracted block by block with the
+    slices of the seed, in parallel if more than one worker is given
+    (see :func:`privacy_amplification_bob`).
 
     Args:
         socket (QOSSTServer): the server socket of Alice.
-        reconciled_key (List[int]): the reconciled key.
+        reconciled_key (ArrayLike): the reconciled key, as an array of bits.
         secret_key_ratio (float): the secret key ratio in bits/symbol.
         extractor_class (Type[RandomnessExtractor]): the extractor class to use.
         data (Optional[Dict]): data of the received message of PA request.
+        workers (int, optional): number of extraction processes in block mode. Defaults to 1.
 
     Returns:
-        Optional[List[int]]: the final key of length int(len(reconciled_key)*secret_key_ratio)
+        Optional[np.ndarray]: the final key of length int(len(reconciled_key)*secret_key_ratio), as an array of bits.
     """
     if not data or not "seed" in data or not "secret_key_ratio" in data:
         logger.error("seed or secret_key_ratio is missing from PA_REQUEST.")
@@ -63,15 +183,58 @@ def privacy_amplification_alice(
         )
         return None
 
-    seed = data["seed"]
+    try:
+        seed = decode_fields(data, bits=("seed",))["seed"]
+    except ValueError as exc:
+        logger.error("Invalid PA_REQUEST content (%s).", str(exc))
+        socket.send(QOSSTCodes.INVALID_CONTENT, {"error_message": str(exc)})
+        return None
     secret_key_ratio = data["secret_key_ratio"]
+    reconciled_key = np.asarray(reconciled_key, dtype=np.uint8)
+
+    if "extractor" in data and data["extractor"] != extractor_class.__name__:
+        logger.error(
+            "Bob used extractor %s while Alice uses %s.",
+            data["extractor"],
+            extractor_class.__name__,
+        )
+        socket.send(
+            QOSSTCodes.INVALID_CONTENT,
+            {
+                "error_message": f"Alice uses extractor {extractor_class.__name__} and not {data['extractor']}."
+            },
+        )
+        return None
 
     logger.info("Using extractor %s", str(extractor_class))
     final_key_size = int(len(reconciled_key) * secret_key_ratio)
 
-    extractor = extractor_class(len(reconciled_key), final_key_size)
+    with phase_metrics.timer("pa_alice_extract", bits=len(reconciled_key)):
+        if data.get("block_size"):
+            try:
+                final_key, _ = _extract_blocks(
+                    extractor_class,
+                    reconciled_key,
+                    final_key_size,
+                    data["block_size"],
+                    seed=np.asarray(seed, dtype=np.uint8),
+                    workers=workers,
+                )
+            except ValueError as exc:
+                logger.error("Invalid PA_REQUEST content (%s).", str(exc))
+                socket.send(QOSSTCodes.INVALID_CONTENT, {"error_message": str(exc)})
+                return None
+        else:
+            try:
+                extractor = extractor_cache.get(
+                    extractor_class, len(reconciled_key), final_key_size
+                )
 
-    final_key, _ = extractor.extract(reconciled_key, seed)
+                final_key, _ = extractor.extract(reconciled_key, seed)
+            except ValueError as exc:
+                logger.error("Invalid PA_REQUEST content (%s).", str(exc))
+                socket.send(QOSSTCodes.INVALID_CONTENT, {"error_message": str(exc)})
+                return None
 
     if final_key is not None:
         logger.info(
@@ -89,43 +252,113 @@ def privacy_amplification_alice(
     return final_key
 
 
+def _abort_alice(socket: QOSSTClient, error_message: str):
+    """
+    Tell Alice, waiting for the PA_REQUEST, that Bob could not extract the key.
+
+    Args:
+        socket (QOSSTClient): client socket of Bob.
+        error_message (str): reason of the abortion.
+    """
+    code, _ = socket.request(QOSSTCodes.ABORT, {"error_message": error_message})
+    if code != QOSSTCodes.ABORT_ACK:
+        logger.warning("Alice answered %s to the abortion.", str(code))
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments, too-many-locals
 def privacy_amplification_bob(
     socket: QOSSTClient,
-    reconciled_key: List[int],
+    reconciled_key: ArrayLike,
     secret_key_ratio: float,
     extractor_class: Type[RandomnessExtractor],
-) -> Optional[List[int]]:
+    encoding: str = LIST_ENCODING,
+    seed_pool: Optional[SeedPool] = None,
+    block_size: Optional[int] = None,
+    workers: int = 1,
+) -> Optional[np.ndarray]:
     """
     Perform Bob privacy amplification.
 
     Start by extracting a key and getting the seed. Send the
-    seed to Alice.
+    seed to Alice, with the name of the extractor class so that Alice
+    can check that she uses the same extractor.
+
+    The extractor is taken from :data:`qosst_pp.extractors.extractor_cache`, so
+    that it is only prepared once for repeated key sizes.
+
+    If a seed pool is given, the seed is taken from the pool instead of being
+    generated by the extractor.
+
+    If a block size is given, the key is split in independent blocks of at most
+    block_size bits, each block is extracted with its own extractor and its own
+    seed, in parallel if more than one worker is given, and the final keys
+    are concatenated in order. The seeds of the blocks are concatenated in the
+    PA_REQUEST message, together with the block size.
+
+    If the extraction fails, for instance for an empty key, an ABORT message is
+    sent instead of the PA_REQUEST so that Alice does not keep waiting.
 
     Args:
         socket (QOSSTClient): client socket of Bob.
-        reconciled_key (List[int]): reconciled key.
+        reconciled_key (ArrayLike): reconciled key, as an array of bits.
         secret_key_ratio (float): secret key ratio in bits/symbol.
         extractor_class (Type[RandomnessExtractor]): the extractor to use.
+        encoding (str, optional): encoding of the seed in the PA_REQUEST message. Defaults to LIST_ENCODING.
+        seed_pool (Optional[SeedPool], optional): pool to take the seed from. Defaults to None.
+        block_size (Optional[int], optional): maximal number of bits of a block, or None to extract the whole key at once. Defaults to None.
+        workers (int, optional): number of extraction processes in block mode. Defaults to 1.
 
     Returns:
-        Optional[List[int]]: the final key of length int(len(reconciled_key)*secret_key_ratio).
+        Optional[np.ndarray]: the final key of length int(len(reconciled_key)*secret_key_ratio), as an array of bits.
     """
     logger.info("Starting Bob privacy amplfication.")
 
     logger.info("Using extractor %s", str(extractor_class))
 
+    reconciled_key = np.asarray(reconciled_key, dtype=np.uint8)
     final_key_size = int(secret_key_ratio * len(reconciled_key))
-    extractor = extractor_class(len(reconciled_key), final_key_size)
 
-    final_key, seed = extractor.extract(reconciled_key)
+    content: Dict = {
+        "secret_key_ratio": secret_key_ratio,
+        "extractor": extractor_class.__name__,
+    }
+    with phase_metrics.timer("pa_bob_extract", bits=len(reconciled_key)) as counts:
+        try:
+            if block_size is not None:
+                final_key, seed = _extract_blocks(
+                    extractor_class,
+                    reconciled_key,
+                    final_key_size,
+                    block_size,
+                    seed_pool=seed_pool,
+                    workers=workers,
+                )
+                content["block_size"] = block_size
+            else:
+                extractor = extractor_cache.get(
+                    extractor_class, len(reconciled_key), final_key_size
+                )
+
+                seed = None
+                if seed_pool is not None:
+                    seed = seed_pool.get(extractor.seed_size)
+
+                final_key, seed = extractor.extract(reconciled_key, seed)
+        except ValueError as exc:
+            logger.error("Extraction failed (%s).", str(exc))
+            _abort_alice(socket, str(exc))
+            return None
+        if seed is not None:
+            counts["payload_bytes"] = (len(seed) + 7) // 8
 
     if final_key is None:
         logger.error("An error happened during extraction.")
+        _abort_alice(socket, "An error happened during extraction.")
         return None
 
-    code, _ = socket.request(
-        QOSSTCodes.PA_REQUEST, {"seed": seed, "secret_key_ratio": secret_key_ratio}
-    )
+    request = encode_fields({"seed": seed, **content}, encoding, bits=("seed",))
+    with phase_metrics.timer("pa_bob_wait_success"):
+        code, _ = socket.request(QOSSTCodes.PA_REQUEST, request)
 
     if code == QOSSTCodes.PA_SUCCESS:
         logger.info(
@@ -0,0 +1,412 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Module defining the distributed decoding of the frames of Alice.
+
+The decoding of the frames is the most expensive step of the reconciliation.
+To scale it over several machines, Alice can dispatch shards of frames to
+decoding workers (started with ``qosst-pp-worker``) over ZMQ:
+
+* Alice binds a PUSH socket on the task endpoint and a PULL socket on the
+  result endpoint;
+* each worker connects a PULL socket to the task endpoint and a PUSH socket to
+  the result endpoint, decodes the shards it receives and pushes the results.
+
+A task is made of a JSON header, containing the job identifier, the index of
+the shard, the SNR, the MDR dimension and the dtype and shape of the arrays,
+followed by the raw buffers of the symbols, the channel message, the syndrome
+and the normalization vector. A result is made of a JSON header, containing
+the job identifier, the index of the shard, the CRCs, the discard flags and
+the lengths of the decoded frames, followed by the decoded frames packed 8
+bits per byte.
+
+Workers can be added or removed at any time. The shards that were not decoded
+by the workers before the timeout are decoded locally by Alice.
+"""
+
+import json
+import time
+import uuid
+import logging
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+import zmq
+import numpy as np
+
+from qosst_core.logging import create_loggers
+
+from qosst_pp import __version__
+from qosst_pp.reconciliation.reconciliation import decode_shard
+
+logger = logging.getLogger(__name__)
+
+
+def _task_frames(job: str, index: int, shard: Tuple) -> List:
+    """
+    Get the frames of the task to decode a shard.
+
+    Args:
+        job (str): identifier of the job.
+        index (int): index of the shard in the job.
+        shard (Tuple): symbols, channel message, syndrome, normalization vector, SNR and MDR dimension of the shard.
+
+    Returns:
+        List: the frames of the task.
+    """
+    *arrays, snr, mdr_dimension = shard
+    arrays = [np.ascontiguousarray(array) for array in arrays]
+    header = {
+        "job": job,
+        "index": index,
+        "signal_to_noise_ratio": snr,
+        "mdr_dimension": mdr_dimension,
+        "arrays": [
+            {"dtype": array.dtype.str, "shape": list(array.shape)} for array in arrays
+        ],
+    }
+    return [json.dumps(header).encode("utf-8"), *arrays]
+
+
+def _parse_task(frames: List[zmq.Frame]) -> Tuple[Dict, Tuple]:
+    """
+    Parse the frames of a task.
+
+    Args:
+        frames (List[zmq.Frame]): the frames of the task.
+
+    Raises:
+        ValueError: if the task is malformed.
+
+    Returns:
+        Tuple[Dict, Tuple]: the header and the shard of the task.
+    """
+    try:
+        header = json.loads(frames[0].bytes)
+        arrays = [
+            np.frombuffer(frame.buffer, dtype=np.dtype(description["dtype"])).reshape(
+                description["shape"]
+            )
+            for frame, description in zip(frames[1:], header["arrays"])
+        ]
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as exc:
+        raise ValueError(f"Invalid task ({exc}).") from exc
+    if len(arrays) != 4:
+        raise ValueError(f"Invalid task (expected 4 arrays, got {len(arrays)}).")
+    return header, (*arrays, header["signal_to_noise_ratio"], header["mdr_dimension"])
+
+
+def _result_frames(header: Dict, result: Tuple) -> List:
+    """
+    Get the frames of the result of a shard.
+
+    Args:
+        header (Dict): header of the task.
+        result (Tuple): the CRCs, the discard flags and the decoded frames of the shard.
+
+    Returns:
+        List: the frames of the result.
+    """
+    crc_alice, discard_flags, decoded_frames = result
+    decoded_frames = [
+        np.asarray(frame, dtype=np.uint8).ravel() for frame in decoded_frames
+    ]
+    reply = {
+        "job": header["job"],
+        "index": header["index"],
+        "crc_alice": [int(crc) for crc in crc_alice],
+        "discard_flags": [int(flag) for flag in discard_flags],
+        "frame_lengths": [len(frame) for frame in decoded_frames],
+    }
+    packed = np.packbits(
+        np.concatenate(decoded_frames) if decoded_frames else np.zeros(0, np.uint8)
+    )
+    return [json.dumps(reply).encode("utf-8"), packed]
+
+
+def _parse_result(frames: List[zmq.Frame]) -> Tuple[Dict, Optional[Tuple]]:
+    """
+    Parse the frames of a result.
+
+    Args:
+        frames (List[zmq.Frame]): the frames of the result.
+
+    Raises:
+        ValueError: if the result is malformed.
+
+    Returns:
+        Tuple[Dict, Optional[Tuple]]: the header of the result, and the CRCs, the discard flags and the decoded frames of the shard, or None if the worker failed (the header then contains the error_message).
+    """
+    try:
+        header = json.loads(frames[0].bytes)
+        if "error_message" in header:
+            return header, None
+        lengths = header["frame_lengths"]
+        bits = np.unpackbits(
+            np.frombuffer(frames[1].buffer, dtype=np.uint8), count=sum(lengths)
+        )
+        result = (
+            header["crc_alice"],
+            header["discard_flags"],
+            np.split(bits, np.cumsum(lengths)[:-1]) if lengths else [],
+        )
+    except (json.JSONDecodeError, IndexError, KeyError, TypeError, ValueError) as exc:
+        raise ValueError(f"Invalid result ({exc}).") from exc
+    return header, result
+
+
+class DecodingDispatcher:
+    """
+    Dispatcher of the shards of frames to the decoding workers.
+
+    The dispatcher must be opened before decoding, and can be used as a context
+    manager. It is not thread-safe.
+    """
+
+    task_endpoint: str  #: Endpoint of the PUSH socket sending the tasks.
+    result_endpoint: str  #: Endpoint of the PULL socket receiving the results.
+    shards: int  #: Number of shards in which each batch of frames is split.
+    timeout: float  #: Time to wait for the results, in seconds.
+
+    # pylint: disable=too-many-arguments, too-many-positional-arguments
+    def __init__(
+        self,
+        task_endpoint: str,
+        result_endpoint: str,
+        shards: int = 16,
+        timeout: float = 60.0,
+        context: Optional[zmq.Context] = None,
+    ):
+        """
+        Args:
+            task_endpoint (str): endpoint to bind the PUSH socket sending the tasks to.
+            result_endpoint (str): endpoint to bind the PULL socket receiving the results to.
+            shards (int, optional): number of shards in which each batch of frames is split. Defaults to 16.
+            timeout (float, optional): time to wait for the results, in seconds, before decoding the missing shards locally. Defaults to 60.0.
+            context (Optional[zmq.Context], optional): ZMQ context, or None to use the global instance. Defaults to None.
+        """
+        self.task_endpoint = task_endpoint
+        self.result_endpoint = result_endpoint
+        self.shards = shards
+        self.timeout = timeout
+        self._context = context if context is not None else zmq.Context.instance()
+        self._task_socket: Optional[zmq.Socket] = None
+        self._result_socket: Optional[zmq.Socket] = None
+
+    def open(self):
+        """
+        Bind the sockets of the dispatcher.
+        """
+        logger.info(
+            "Binding decoding dispatcher to %s (tasks) and %s (results).",
+            self.task_endpoint,
+            self.result_endpoint,
+        )
+        self._task_socket = self._context.socket(zmq.PUSH)
+        self._task_socket.bind(self.task_endpoint)
+        self._result_socket = self._context.socket(zmq.PULL)
+        self._result_socket.bind(self.result_endpoint)
+
+    def close(self):
+        """
+        Close the sockets of the dispatcher.
+        """
+        if self._task_socket is not None:
+            self._task_socket.close(linger=0)
+            self._task_socket = None
+        if self._result_socket is not None:
+            self._result_socket.close(linger=0)
+            self._result_socket = None
+
+    def decode(self, shards: List[Tuple]) -> List[Tuple]:
+        """
+        Decode the shards with the workers.
+
+        The shards are pushed to the workers and the results are collected by
+        index. The shards that could not be sent (because no worker is
+        connected) or whose result did not arrive before the timeout are
+        decoded locally, as well as the shards on which a worker failed, as
+        soon as the failure is received.
+
+        Args:
+            shards (List[Tuple]): the shards, as returned by :func:`qosst_pp.reconciliation.reconciliation._split_frames`.
+
+        Raises:
+            RuntimeError: if the dispatcher is not opened.
+
+        Returns:
+            List[Tuple]: the CRCs, the discard flags and the decoded frames of each shard, in order.
+        """
+        if self._task_socket is None or self._result_socket is None:
+            raise RuntimeError("The decoding dispatcher is not opened.")
+
+        job = uuid.uuid4().hex
+        results: Dict[int, Tuple] = {}
+        pending = set()
+        for index, shard in enumerate(shards):
+            try:
+                self._task_socket.send_multipart(
+                    _task_frames(job, index, shard), flags=zmq.NOBLOCK, copy=False
+                )
+                pending.add(index)
+            except zmq.Again:
+                logger.warning("No decoding worker available for shard %i.", index)
+                results[index] = decode_shard(shard)
+
+        logger.info("Dispatched %i shards to the decoding workers.", len(pending))
+        deadline = time.monotonic() + self.timeout
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._result_socket.poll(int(remaining * 1000)):
+                break
+            try:
+                header, result = _parse_result(
+                    self._result_socket.recv_multipart(copy=False)
+                )
+            except ValueError as exc:
+                logger.error("Invalid result from a decoding worker (%s).", str(exc))
+                continue
+            index = header.get("index")
+            if header.get("job") != job or index not in pending:
+                logger.debug("Ignoring stale result of job %s.", header.get("job"))
+                continue
+            pending.remove(index)
+            if "error_message" in header:
+                logger.error(
+                    "Decoding worker failed on shard %i (%s), decoding it locally.",
+                    index,
+                    header["error_message"],
+                )
+                results[index] = decode_shard(shards[index])
+                continue
+            results[index] = result
+
+        if pending:
+            logger.warning(
+                "%i shards were not decoded by the workers, decoding them locally.",
+                len(pending),
+            )
+            for index in pending:
+                results[index] = decode_shard(shards[index])
+        return [results[index] for index in range(len(shards))]
+
+    def __enter__(self) -> "DecodingDispatcher":
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def decoding_worker(
+    task_endpoint: str, result_endpoint: str, context: Optional[zmq.Context] = None
+):
+    """
+    Start a decoding worker.
+
+    The worker connects to the dispatcher of Alice, and decodes the shards it
+    receives until it is interrupted.
+
+    Args:
+        task_endpoint (str): endpoint of the dispatcher sending the tasks.
+        result_endpoint (str): endpoint of the dispatcher receiving the results.
+        context (Optional[zmq.Context], optional): ZMQ context, or None to use the global instance. Defaults to None.
+    """
+    context = context if context is not None else zmq.Context.instance()
+    logger.info(
+        "Connecting decoding worker to %s (tasks) and %s (results).",
+        task_endpoint,
+        result_endpoint,
+    )
+    task_socket = context.socket(zmq.PULL)
+    task_socket.connect(task_endpoint)
+    result_socket = context.socket(zmq.PUSH)
+    result_socket.connect(result_endpoint)
+
+    try:
+        while True:
+            frames = task_socket.recv_multipart(copy=False)
+            try:
+                header, shard = _parse_task(frames)
+            except ValueError as exc:
+                logger.error("%s", str(exc))
+                continue
+
+            logger.info("Decoding shard %i of job %s.", header["index"], header["job"])
+            try:
+                reply = _result_frames(header, decode_shard(shard))
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                logger.error("Error while decoding the shard (%s).", str(exc))
+                reply = [
+                    json.dumps(
+                        {
+                            "job": header["job"],
+                            "index": header["index"],
+                            "error_message": str(exc),
+                        }
+                    ).encode("utf-8")
+                ]
+            result_socket.send_multipart(reply, copy=False)
+    except KeyboardInterrupt:
+        logger.info("Stopping decoding worker.")
+    finally:
+        task_socket.close(linger=0)
+        result_socket.close()
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    """Create the parser for qosst-pp-worker.
+
+    Returns:
+        argparse.ArgumentParser: the argument parser.
+    """
+    parser = argparse.ArgumentParser(prog="qosst-pp-worker")
+
+    parser.add_argument("--version", action="version", version=__version__)
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="Level of verbosity. If none, only critical errors will be prompted. -v will add warnings and errors, -vv will add info and -vvv will print all debug logs.",
+    )
+
+    parser.add_argument(
+        "task_endpoint", help="Endpoint of the dispatcher sending the tasks."
+    )
+    parser.add_argument(
+        "result_endpoint", help="Endpoint of the dispatcher receiving the results."
+    )
+
+    return parser
+
+
+def main():
+    """
+    Main entrypoint of qosst-pp-worker.
+    """
+    parser = _create_parser()
+
+    args = parser.parse_args()
+
+    create_loggers(args.verbose, None)
+
+    decoding_worker(args.task_endpoint, args.result_endpoint)
+
+
+if __name__ == "__main__":
+    main()
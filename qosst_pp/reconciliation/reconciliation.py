@@ -17,14 +17,37 @@
 """
 Module defining error reconciliation functions for Alice and Bob.
 """
+# pylint: disable=too-many-lines
 import logging
-from typing import Optional, List, Dict
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    List,
+    Dict,
+    Union,
+    Tuple,
+)
 
 import numpy as np
 
 from qosst_core.control_protocol.sockets import QOSSTClient, QOSSTServer
 from qosst_core.control_protocol.codes import QOSSTCodes
 
+from qosst_pp.encoding import (
+    LIST_ENCODING,
+    encode_fields,
+    decode_fields,
+    get_encoding,
+)
+from qosst_pp.executors import get_executor
+from qosst_pp.metrics import phase_metrics
+
+if TYPE_CHECKING:
+    from qosst_pp.reconciliation.decoding_workers import DecodingDispatcher
+
 logger = logging.getLogger(__name__)
 
 try:
@@ -35,12 +58,347 @@ except ModuleNotFoundError:
     )
 
 
+#: Fields of the EC_INITIALIZATION message containing arrays of numbers, with their dtype.
+_INITIALIZATION_ARRAYS = {
+    "channel_message": np.float64,
+    "normalization_vector": np.float64,
+}
+#: Fields of the EC_INITIALIZATION message containing arrays of bits.
+_INITIALIZATION_BITS = ("syndrome",)
+
+
+def _with_request_id(content: Dict, request_id: Optional[Union[int, str]]) -> Dict:
+    """
+    Add the request id to the content of a message, if it is not None.
+
+    Args:
+        content (Dict): content of the message.
+        request_id (Optional[Union[int, str]]): id of the request.
+
+    Returns:
+        Dict: the content with the request id.
+    """
+    if request_id is not None:
+        content["request_id"] = request_id
+    return content
+
+
+def _parse_initialization(
+    data: Optional[Dict], request_id: Optional[Union[int, str]]
+) -> Dict:
+    """
+    Check and decode the content of an EC_INITIALIZATION message.
+
+    Args:
+        data (Optional[Dict]): content of the EC_INITIALIZATION message.
+        request_id (Optional[Union[int, str]]): expected request id, or None to accept any.
+
+    Raises:
+        ValueError: if the content is invalid.
+
+    Returns:
+        Dict: the decoded content.
+    """
+    if (
+        not data
+        or not "channel_message" in data
+        or not "syndrome" in data
+        or not "normalization_vector" in data
+        or not "signal_to_noise_ratio" in data
+    ):
+        raise ValueError(
+            "channel_message or syndrome or normalization_vector or signal_to_noise_ratio parameter was not present in the content."
+        )
+
+    if request_id is not None and data.get("request_id") != request_id:
+        raise ValueError(
+            f"Request id {data.get('request_id')} does not match expected request id {request_id}."
+        )
+
+    return decode_fields(data, arrays=_INITIALIZATION_ARRAYS, bits=_INITIALIZATION_BITS)
+
+
+def _parse_discard_flags(
+    data: Optional[Dict], request_id: Optional[Union[int, str]]
+) -> List[int]:
+    """
+    Check and decode the content of an EC_DISCARD_FLAGS message.
+
+    Args:
+        data (Optional[Dict]): content of the EC_DISCARD_FLAGS message.
+        request_id (Optional[Union[int, str]]): request id of the EC_INITIALIZATION message.
+
+    Raises:
+        ValueError: if the content is invalid.
+
+    Returns:
+        List[int]: the final discard flags.
+    """
+    if not data or not "final_discard_flags" in data:
+        raise ValueError(
+            "final_discard_flags parameter was not present in the content."
+        )
+
+    if data.get("request_id") != request_id:
+        raise ValueError(
+            f"Request id {data.get('request_id')} does not match the EC_INITIALIZATION one ({request_id})."
+        )
+
+    return decode_fields(data, bits=("final_discard_flags",))["final_discard_flags"]
+
+
+def _flatten_key(frames: List) -> np.ndarray:
+    """
+    Concatenate the kept frames into the reconciled key.
+
+    Args:
+        frames (List): the kept frames, as sequences of bits.
+
+    Returns:
+        np.ndarray: the reconciled key, as an array of uint8 bits.
+    """
+    if not frames:
+        return np.zeros(0, dtype=np.uint8)
+    return np.concatenate(
+        [np.asarray(frame, dtype=np.uint8).ravel() for frame in frames]
+    )
+
+
+def _initialization_payload(encoded: Tuple) -> int:
+    """
+    Get the size of the arrays of an EC_INITIALIZATION message, for the metrics.
+
+    Args:
+        encoded (Tuple): the channel message, syndrome, normalization vector and raw key.
+
+    Returns:
+        int: the size, in bytes, with 64-bit numbers and packed bits.
+    """
+    channel_message, syndrome, normalization_vector, _ = encoded
+    return (
+        8 * (len(channel_message) + len(normalization_vector))
+        + (len(syndrome) + 7) // 8
+    )
+
+
+def _timed_decode(
+    alice_symbols: np.ndarray,
+    mdr_dimension: int,
+    data: Dict,
+    workers: int,
+    dispatcher: Optional["DecodingDispatcher"],
+) -> Tuple:
+    """
+    Decode the frames of Alice (see :func:`_decode`) and record the phase in the metrics.
+
+    Args:
+        alice_symbols (np.ndarray): symbols of Alice corresponding to the message.
+        mdr_dimension (int): dimension of the multidimensional reconciliation.
+        data (Dict): decoded content of the EC_INITIALIZATION message.
+        workers (int): number of decoding processes.
+        dispatcher (Optional[DecodingDispatcher]): dispatcher to the decoding workers.
+
+    Returns:
+        Tuple: the CRCs, the discard flags and the decoded frames.
+    """
+    with phase_metrics.timer("ec_alice_decode", symbols=len(alice_symbols)) as counts:
+        crc_alice, discard_flags, decoded_frames = _decode(
+            alice_symbols, mdr_dimension, data, workers, dispatcher
+        )
+        counts["frames"] = len(decoded_frames)
+        counts["payload_bytes"] = 4 * len(crc_alice) + (len(discard_flags) + 7) // 8
+    return crc_alice, discard_flags, decoded_frames
+
+
+def decode_shard(shard: Tuple) -> Tuple:
+    """
+    Decode a shard of frames.
+
+    This is executed in the processes of the executor, and in the decoding
+    workers (see :mod:`qosst_pp.reconciliation.decoding_workers`).
+
+    Args:
+        shard (Tuple): symbols, channel message, syndrome, normalization vector, SNR and MDR dimension of the shard.
+
+    Returns:
+        Tuple: the CRCs, the discard flags and the decoded frames of the shard.
+    """
+    symbols, channel_message, syndrome, normalization_vector, snr, mdr_dimension = shard
+    return ir.reconcile_Alice(
+        alice_states=symbols,
+        classical_channel_message=channel_message,
+        syndrome=syndrome,
+        normalization_vector=normalization_vector,
+        SNR=snr,
+        MDR_dim=mdr_dimension,
+    )
+
+
+def _split_frames(
+    alice_symbols: np.ndarray, mdr_dimension: int, data: Dict, num_shards: int
+) -> Optional[List[Tuple]]:
+    """
+    Split the content of an EC_INITIALIZATION message in shards of consecutive frames.
+
+    The number of frames is given by Bob in ``frame_count``. The channel message,
+    syndrome and normalization vector must contain the same number of values for
+    each frame, and the channel message contains one value per symbol.
+
+    Args:
+        alice_symbols (np.ndarray): symbols of Alice corresponding to the message.
+        mdr_dimension (int): dimension of the multidimensional reconciliation.
+        data (Dict): decoded content of the EC_INITIALIZATION message.
+        num_shards (int): number of shards.
+
+    Returns:
+        Optional[List[Tuple]]: the shards, or None if the frames cannot be split.
+    """
+    frame_count = data.get("frame_count")
+    if not frame_count:
+        return None
+
+    channel_message = np.asarray(data["channel_message"])
+    syndrome = np.asarray(data["syndrome"])
+    normalization_vector = np.asarray(data["normalization_vector"])
+    if (
+        len(channel_message) % frame_count
+        or len(syndrome) % frame_count
+        or len(normalization_vector) % frame_count
+        or len(channel_message) > len(alice_symbols)
+    ):
+        logger.warning(
+            "The content of EC_INITIALIZATION cannot be split in %i frames.",
+            frame_count,
+        )
+        return None
+
+    symbols_per_frame = len(channel_message) // frame_count
+    syndrome_per_frame = len(syndrome) // frame_count
+    normalization_per_frame = len(normalization_vector) // frame_count
+
+    shards = []
+    for frames in np.array_split(np.arange(frame_count), min(num_shards, frame_count)):
+        start, end = frames[0], frames[-1] + 1
+        shards.append(
+            (
+                alice_symbols[start * symbols_per_frame : end * symbols_per_frame],
+                channel_message[start * symbols_per_frame : end * symbols_per_frame],
+                syndrome[start * syndrome_per_frame : end * syndrome_per_frame],
+                normalization_vector[
+                    start * normalization_per_frame : end * normalization_per_frame
+                ],
+                data["signal_to_noise_ratio"],
+                mdr_dimension,
+            )
+        )
+    return shards
+
+
+def _decode(
+    alice_symbols: np.ndarray,
+    mdr_dimension: int,
+    data: Dict,
+    workers: int = 1,
+    dispatcher: Optional["DecodingDispatcher"] = None,
+) -> Tuple:
+    """
+    Decode the frames of Alice with the content of an EC_INITIALIZATION message.
+
+    If more than one worker is requested and Bob has given the number of frames,
+    the frames are split in shards of consecutive frames that are decoded in
+    parallel in a pool of processes, and the results are reassembled in order.
+
+    If a dispatcher is given, the shards are instead decoded by the remote
+    decoding workers (see :mod:`qosst_pp.reconciliation.decoding_workers`).
+
+    Args:
+        alice_symbols (np.ndarray): symbols of Alice corresponding to the message.
+        mdr_dimension (int): dimension of the multidimensional reconciliation.
+        data (Dict): decoded content of the EC_INITIALIZATION message.
+        workers (int, optional): number of decoding processes. Defaults to 1.
+        dispatcher (Optional[DecodingDispatcher], optional): dispatcher to the decoding workers. Defaults to None.
+
+    Returns:
+        Tuple: the CRCs, the discard flags and the decoded frames.
+    """
+    shards = None
+    if dispatcher is not None:
+        shards = _split_frames(alice_symbols, mdr_dimension, data, dispatcher.shards)
+    elif workers > 1:
+        shards = _split_frames(alice_symbols, mdr_dimension, data, workers)
+
+    if shards is None:
+        return decode_shard(
+            (
+                alice_symbols,
+                data["channel_message"],
+                data["syndrome"],
+                data["normalization_vector"],
+                data["signal_to_noise_ratio"],
+                mdr_dimension,
+            )
+        )
+
+    if dispatcher is not None:
+        logger.info("Decoding %i shards with the decoding workers.", len(shards))
+        results = dispatcher.decode(shards)
+    else:
+        logger.info("Decoding %i shards with %i processes.", len(shards), workers)
+        results = get_executor(workers).map(decode_shard, shards)
+
+    crc_alice: List[int] = []
+    discard_flags: List[int] = []
+    decoded_frames: List = []
+    for shard_crc, shard_flags, shard_frames in results:
+        if not shard_crc or not shard_flags or not shard_frames:
+            return [], [], []
+        crc_alice.extend(shard_crc)
+        discard_flags.extend(shard_flags)
+        decoded_frames.extend(shard_frames)
+    return crc_alice, discard_flags, decoded_frames
+
+
+def _verification_content(
+    crc_alice: List[int],
+    discard_flags: List[int],
+    encoding: str,
+    request_id: Optional[Union[int, str]],
+    batch_index: Optional[int] = None,
+) -> Dict:
+    """
+    Build the content of an EC_VERIFICATION message.
+
+    Args:
+        crc_alice (List[int]): CRCs of the decoded frames.
+        discard_flags (List[int]): discard flags of Alice.
+        encoding (str): encoding of the arrays.
+        request_id (Optional[Union[int, str]]): id of the request.
+        batch_index (Optional[int], optional): index of the batch, in pipelined mode. Defaults to None.
+
+    Returns:
+        Dict: the content of the message.
+    """
+    content = {"crc_alice": crc_alice, "discard_flags": discard_flags}
+    if batch_index is not None:
+        content["batch_index"] = batch_index
+    return encode_fields(
+        _with_request_id(content, request_id),
+        encoding,
+        arrays={"crc_alice": np.uint32},
+        bits=("discard_flags",),
+    )
+
+
+# pylint: disable=too-many-locals, too-many-arguments, too-many-positional-arguments
 def reconcile_alice(
     socket: QOSSTServer,
     alice_symbols: np.ndarray,
     mdr_dimension: int,
     data: Optional[Dict],
-) -> Optional[List[int]]:
+    request_id: Optional[Union[int, str]] = None,
+    workers: int = 1,
+    dispatcher: Optional["DecodingDispatcher"] = None,
+) -> Optional[np.ndarray]:
     """Perform error reconciliation using IR_FOR_CVQKD.
 
     This function starts after receiving the EC_INITIALIZATION message from Bob.
@@ -50,49 +408,54 @@ def reconcile_alice(
     and a CRC is computed. All the CRC are sent to Bob. Alice receives the final
     discard flags before returning the key.
 
+    If Bob tagged the EC_INITIALIZATION message with a request id, it is sent
+    back in the EC_VERIFICATION message and checked in the EC_DISCARD_FLAGS
+    message. If request_id is given, it must match the one sent by Bob.
+
+    If the EC_INITIALIZATION message contains a batch index, Bob is using the
+    pipelined mode (see :func:`reconcile_bob`) and the symbols are reconciled
+    batch by batch.
+
+    If more than one worker is given, the frames are decoded in parallel in a
+    pool of worker processes. This requires Bob to send the number of frames,
+    otherwise the decoding falls back to a single call. If a dispatcher is given,
+    the frames are instead decoded by remote decoding workers (see
+    :mod:`qosst_pp.reconciliation.decoding_workers`), with the same requirement.
+
     Args:
         socket (QOSSTServer): socket of the server of Alice.
         alice_symbols (np.ndarray): symbols of Alice, as an array of real numbers.
         mdr_dimension (int): dimension of the multidimensional reconciliation.
         data (Optional[Dict]): data of the received EC_INITIALIZATION message.
+        request_id (Optional[Union[int, str]], optional): expected request id. Defaults to None.
+        workers (int, optional): number of decoding processes. Defaults to 1.
+        dispatcher (Optional[DecodingDispatcher], optional): dispatcher to the decoding workers, used instead of the pool of processes. Defaults to None.
 
     Returns:
-        Optional[List[int]]: reconciled key.
+        Optional[np.ndarray]: reconciled key, as an array of bits.
     """
     if alice_symbols[0].imag:
         logger.warning(
             "reconcile_alice takes as input a real array for Alice's symbols and alice_symbols[0] has non-zero imaginary part. This is likely to fail."
         )
-    if (
-        not data
-        or not "channel_message" in data
-        or not "syndrome" in data
-        or not "normalization_vector" in data
-        or not "signal_to_noise_ratio" in data
-    ):
-        logger.error(
-            "channel_message or syndrome or normalization_vector or signal_to_noise_ratio is missing from EC_INITIALIZATION."
-        )
-        socket.send(
-            QOSSTCodes.INVALID_CONTENT,
-            {
-                "error_message": "channel_message or syndrome or normalization_vector or signal_to_noise_ratio parameter was not present in the content."
-            },
-        )
+
+    try:
+        encoding = get_encoding(data) if data else LIST_ENCODING
+        data = _parse_initialization(data, request_id)
+    except ValueError as exc:
+        logger.error("Invalid EC_INITIALIZATION content (%s).", str(exc))
+        socket.send(QOSSTCodes.INVALID_CONTENT, {"error_message": str(exc)})
         return None
 
-    channel_message = data["channel_message"]
-    syndrome = data["syndrome"]
-    normalization_vector = data["normalization_vector"]
-    signal_to_noise_ratio = data["signal_to_noise_ratio"]
+    if "batch_index" in data:
+        return _reconcile_alice_pipelined(
+            socket, alice_symbols, mdr_dimension, data, encoding, workers, dispatcher
+        )
 
-    crc_alice, discard_flags, decoded_frames = ir.reconcile_Alice(
-        alice_states=alice_symbols,
-        classical_channel_message=channel_message,
-        syndrome=syndrome,
-        normalization_vector=normalization_vector,
-        SNR=signal_to_noise_ratio,
-        MDR_dim=mdr_dimension,
+    received_request_id = data.get("request_id")
+
+    crc_alice, discard_flags, decoded_frames = _timed_decode(
+        alice_symbols, mdr_dimension, data, workers, dispatcher
     )
 
     if not crc_alice or not discard_flags or not decoded_frames:
@@ -102,29 +465,26 @@ def reconcile_alice(
 
     socket.send(
         QOSSTCodes.EC_VERIFICATION,
-        {"crc_alice": crc_alice, "discard_flags": discard_flags},
+        _verification_content(crc_alice, discard_flags, encoding, received_request_id),
     )
 
     logger.info("Discard flags : %s", str(discard_flags))
 
-    code, data = socket.recv()
+    with phase_metrics.timer("ec_alice_wait_discard_flags"):
+        code, data = socket.recv()
 
     if code != QOSSTCodes.EC_DISCARD_FLAGS:
         logger.error("Unexpected command %s.", str(code))
-        socket.send(QOSSTCodes.UNEXPECTED_COMMAND)
+        if code != QOSSTCodes.EC_ERROR:
+            socket.send(QOSSTCodes.UNEXPECTED_COMMAND)
         return None
 
-    if not data or not "final_discard_flags" in data:
-        logger.error("final_discard_flagsis missing from EC_INITIALIZATION.")
-        socket.send(
-            QOSSTCodes.INVALID_CONTENT,
-            {
-                "error_message": "final_discard_flags parameter was not present in the content."
-            },
-        )
+    try:
+        final_discard_flags = _parse_discard_flags(data, received_request_id)
+    except ValueError as exc:
+        logger.error("Invalid EC_DISCARD_FLAGS content (%s).", str(exc))
+        socket.send(QOSSTCodes.INVALID_CONTENT, {"error_message": str(exc)})
         return None
-
-    final_discard_flags = data["final_discard_flags"]
     logger.info("Final discard flags : %s", str(final_discard_flags))
 
     alice_final_keys = [
@@ -134,19 +494,542 @@ def reconcile_alice(
     socket.send(QOSSTCodes.EC_FINISHED)
 
     # Make the array flat (instead of list of blocks)
-    reconciled_key = np.ravel(alice_final_keys).tolist()
+    reconciled_key = _flatten_key(alice_final_keys)
     logger.info("Reconciled key has length %i", len(reconciled_key))
     return reconciled_key
 
 
-# pylint: disable=too-many-locals
+def _check_batch(data: Optional[Dict], batch_index: int):
+    """
+    Check the description of the batch in a message of the pipelined reconciliation.
+
+    Args:
+        data (Optional[Dict]): content of the message.
+        batch_index (int): expected index of the batch.
+
+    Raises:
+        ValueError: if the index of the batch is not the expected one or if the description is incomplete.
+    """
+    if not data or data.get("batch_index") != batch_index:
+        raise ValueError(
+            f"Expected batch {batch_index} but received batch {data.get('batch_index') if data else None}."
+        )
+    if (
+        not "symbol_offset" in data
+        or not "symbol_count" in data
+        or not "last_batch" in data
+    ):
+        raise ValueError(
+            "symbol_offset or symbol_count or last_batch parameter was not present in the content."
+        )
+
+
+def _collect_key(key_chunks: Iterator[Optional[np.ndarray]]) -> Optional[np.ndarray]:
+    """
+    Concatenate the key chunks of a batched reconciliation.
+
+    Args:
+        key_chunks (Iterator[Optional[np.ndarray]]): the key chunks, None marking an error.
+
+    Returns:
+        Optional[np.ndarray]: the reconciled key, or None in case of error.
+    """
+    keys = []
+    for key in key_chunks:
+        if key is None:
+            return None
+        keys.append(key)
+    return _flatten_key(keys)
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+def _reconcile_alice_pipelined(
+    socket: QOSSTServer,
+    alice_symbols: np.ndarray,
+    mdr_dimension: int,
+    data: Dict,
+    encoding: str,
+    workers: int,
+    dispatcher: Optional["DecodingDispatcher"],
+) -> Optional[np.ndarray]:
+    """Perform the pipelined error reconciliation at Alice side.
+
+    See :func:`_reconcile_alice_batches` for the order of the messages.
+
+    Args:
+        socket (QOSSTServer): socket of the server of Alice.
+        alice_symbols (np.ndarray): symbols of Alice, as an array of real numbers.
+        mdr_dimension (int): dimension of the multidimensional reconciliation.
+        data (Dict): decoded content of the first EC_INITIALIZATION message.
+        encoding (str): encoding of the arrays.
+        workers (int): number of decoding processes.
+        dispatcher (Optional[DecodingDispatcher]): dispatcher to the decoding workers.
+
+    Returns:
+        Optional[np.ndarray]: reconciled key, as an array of bits.
+    """
+    return _collect_key(
+        _reconcile_alice_batches(
+            socket,
+            lambda offset, count: alice_symbols[offset : offset + count],
+            mdr_dimension,
+            data,
+            encoding,
+            workers,
+            dispatcher,
+        )
+    )
+
+
+# pylint: disable=too-many-locals, too-many-branches, too-many-return-statements, too-many-statements, too-many-arguments, too-many-positional-arguments
+def _reconcile_alice_batches(
+    socket: QOSSTServer,
+    get_symbols: Callable[[int, int], np.ndarray],
+    mdr_dimension: int,
+    data: Dict,
+    encoding: str,
+    workers: int,
+    dispatcher: Optional["DecodingDispatcher"],
+) -> Iterator[Optional[np.ndarray]]:
+    """Perform the pipelined error reconciliation at Alice side, batch by batch.
+
+    Each EC_INITIALIZATION message contains a batch of frames, identified by its
+    index and by the offset and number of the symbols it covers. The messages
+    strictly alternate between Alice and Bob:
+
+    * Bob sends the batch 0. If it is not the last one, Alice answers with
+      EC_READY and starts decoding, while Bob encodes and sends the batch 1;
+    * once the batch k is decoded, Alice receives the next message of Bob and
+      sends the EC_VERIFICATION message of the batch k, then starts decoding the
+      batch k+1;
+    * Bob answers with the EC_DISCARD_FLAGS message of the batch k, which also
+      contains the EC_INITIALIZATION content of the batch k+2 (if any) in
+      ``next_batch``, encoded while Alice decodes the batch k+1;
+    * the EC_DISCARD_FLAGS message of the last batch is answered with EC_FINISHED.
+
+    If one party detects an error, it sends an error code instead of its next
+    message and stops. The other party stops without answering when it receives it.
+
+    The key of each batch is yielded as soon as its final discard flags are
+    received and the next message is sent to Bob.
+
+    Args:
+        socket (QOSSTServer): socket of the server of Alice.
+        get_symbols (Callable[[int, int], np.ndarray]): function returning the symbols of Alice from their offset and count. It can raise a ValueError if the symbols are not available.
+        mdr_dimension (int): dimension of the multidimensional reconciliation.
+        data (Dict): decoded content of the first EC_INITIALIZATION message.
+        encoding (str): encoding of the arrays.
+        workers (int): number of decoding processes.
+        dispatcher (Optional[DecodingDispatcher]): dispatcher to the decoding workers.
+
+    Yields:
+        Optional[np.ndarray]: the reconciled key of each batch, as an array of bits, or None in case of error, after which the generator stops.
+    """
+    request_id = data.get("request_id")
+    previous_frames = None
+    batch_index = 0
+    key_length = 0
+
+    try:
+        _check_batch(data, batch_index)
+    except ValueError as exc:
+        logger.error("Invalid EC_INITIALIZATION content (%s).", str(exc))
+        socket.send(QOSSTCodes.INVALID_CONTENT, {"error_message": str(exc)})
+        yield None
+        return
+
+    if not data["last_batch"]:
+        socket.send(QOSSTCodes.EC_READY)
+
+    while True:
+        last_batch = data["last_batch"]
+        offset = data["symbol_offset"]
+        count = data["symbol_count"]
+
+        logger.info("Decoding batch %i (%i symbols).", batch_index, count)
+        try:
+            crc_alice, discard_flags, decoded_frames = _timed_decode(
+                get_symbols(offset, count),
+                mdr_dimension,
+                data,
+                workers,
+                dispatcher,
+            )
+        except ValueError as exc:
+            logger.error(
+                "Symbols of batch %i are not available (%s).", batch_index, str(exc)
+            )
+            crc_alice, discard_flags, decoded_frames = [], [], []
+
+        # Receive the message of Bob sent while decoding
+        next_data = None
+        previous_key = None
+        if previous_frames is not None or not last_batch:
+            expected_code = (
+                QOSSTCodes.EC_INITIALIZATION
+                if previous_frames is None
+                else QOSSTCodes.EC_DISCARD_FLAGS
+            )
+            with phase_metrics.timer("ec_alice_wait_discard_flags"):
+                code, content = socket.recv()
+            if code != expected_code:
+                logger.error("Unexpected command %s.", str(code))
+                if code != QOSSTCodes.EC_ERROR:
+                    socket.send(QOSSTCodes.UNEXPECTED_COMMAND)
+                yield None
+                return
+
+            try:
+                if previous_frames is not None:
+                    _check_discard_batch(content, batch_index - 1)
+                    final_discard_flags = _parse_discard_flags(content, request_id)
+                    previous_key = _flatten_key(
+                        [
+                            frame
+                            for frame, flag in zip(previous_frames, final_discard_flags)
+                            if flag == 0
+                        ]
+                    )
+                    if not last_batch:
+                        content = content.get("next_batch") if content else None
+                if not last_batch:
+                    next_data = _parse_initialization(content, request_id)
+                    _check_batch(next_data, batch_index + 1)
+            except ValueError as exc:
+                logger.error("Invalid content (%s).", str(exc))
+                socket.send(QOSSTCodes.INVALID_CONTENT, {"error_message": str(exc)})
+                yield None
+                return
+
+        if not crc_alice or not discard_flags or not decoded_frames:
+            logger.error("Error happened on error correction at Alice's side.")
+            socket.send(QOSSTCodes.EC_ERROR)
+            yield None
+            return
+
+        socket.send(
+            QOSSTCodes.EC_VERIFICATION,
+            _verification_content(
+                crc_alice, discard_flags, encoding, request_id, batch_index
+            ),
+        )
+        logger.info("Discard flags of batch %i : %s", batch_index, str(discard_flags))
+
+        if previous_key is not None:
+            key_length += len(previous_key)
+            yield previous_key
+
+        if next_data is not None:
+            previous_frames = decoded_frames
+            data = next_data
+            batch_index += 1
+            continue
+
+        with phase_metrics.timer("ec_alice_wait_discard_flags"):
+            code, content = socket.recv()
+        if code != QOSSTCodes.EC_DISCARD_FLAGS:
+            logger.error("Unexpected command %s.", str(code))
+            if code != QOSSTCodes.EC_ERROR:
+                socket.send(QOSSTCodes.UNEXPECTED_COMMAND)
+            yield None
+            return
+
+        try:
+            _check_discard_batch(content, batch_index)
+            final_discard_flags = _parse_discard_flags(content, request_id)
+        except ValueError as exc:
+            logger.error("Invalid EC_DISCARD_FLAGS content (%s).", str(exc))
+            socket.send(QOSSTCodes.INVALID_CONTENT, {"error_message": str(exc)})
+            yield None
+            return
+
+        socket.send(QOSSTCodes.EC_FINISHED)
+        last_key = _flatten_key(
+            [
+                frame
+                for frame, flag in zip(decoded_frames, final_discard_flags)
+                if flag == 0
+            ]
+        )
+        key_length += len(last_key)
+        logger.info(
+            "Reconciled key has length %i (%i batches)",
+            key_length,
+            batch_index + 1,
+        )
+        yield last_key
+        return
+
+
+def _check_discard_batch(data: Optional[Dict], batch_index: int):
+    """
+    Check the index of the batch of an EC_DISCARD_FLAGS message in pipelined mode.
+
+    Args:
+        data (Optional[Dict]): content of the EC_DISCARD_FLAGS message.
+        batch_index (int): expected index of the batch.
+
+    Raises:
+        ValueError: if the index of the batch is not the expected one.
+    """
+    if not data or data.get("batch_index") != batch_index:
+        raise ValueError(f"Expected discard flags of batch {batch_index}.")
+
+
+def _encode_shard(shard: Tuple) -> Tuple:
+    """
+    Encode a shard of frames (executed in a worker process).
+
+    Args:
+        shard (Tuple): symbols, beta, SNR and MDR dimension of the shard.
+
+    Returns:
+        Tuple: the channel message, syndrome, normalization vector and raw key of the shard.
+    """
+    symbols, beta, snr, mdr_dimension = shard
+    return ir.reconcile_Bob(
+        bob_states=symbols,
+        beta=beta,
+        SNR=snr,
+        MDR_dim=mdr_dimension,
+    )
+
+
+def _split_symbols(
+    bob_symbols: np.ndarray, frame_size: int, num_shards: int
+) -> List[np.ndarray]:
+    """
+    Split the symbols of Bob in shards of consecutive frames.
+
+    The symbols that do not fill a complete frame are added to the last shard.
+
+    Args:
+        bob_symbols (np.ndarray): bob symbols, as an array of real numbers.
+        frame_size (int): number of symbols per frame.
+        num_shards (int): number of shards.
+
+    Returns:
+        List[np.ndarray]: the shards.
+    """
+    frame_count = max(len(bob_symbols) // frame_size, 1)
+    bounds = [
+        int(frames[0]) * frame_size
+        for frames in np.array_split(
+            np.arange(frame_count), min(num_shards, frame_count)
+        )
+    ]
+    bounds.append(len(bob_symbols))
+    return [bob_symbols[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+def _encode(
+    bob_symbols: np.ndarray,
+    beta: float,
+    signal_to_noise_ratio: float,
+    mdr_dimension: int,
+    workers: int = 1,
+    frame_size: Optional[int] = None,
+) -> Optional[Tuple]:
+    """
+    Compute the channel message, syndrome, normalization vector and raw key of Bob.
+
+    If more than one worker is requested and the frame size is given, the symbols
+    are split in shards of consecutive frames that are encoded in parallel in a
+    pool of processes, and the outputs are concatenated in order.
+
+    Args:
+        bob_symbols (np.ndarray): bob symbols, as an array of real numbers.
+        beta (float): reconciliation effiency, from which the rate is derived.
+        signal_to_noise_ratio (float): signal to noise ratio of the quantum data.
+        mdr_dimension (int): dimension of the multi-dimensional scheme.
+        workers (int, optional): number of encoding processes. Defaults to 1.
+        frame_size (Optional[int], optional): number of symbols per LDPC frame, required to encode in parallel. Defaults to None.
+
+    Returns:
+        Optional[Tuple]: the channel message, syndrome, normalization vector and raw key, or None in case of error.
+    """
+    if workers > 1 and (not frame_size or frame_size % mdr_dimension):
+        logger.warning(
+            "Frame size %s is not a positive multiple of the MDR dimension %i. Encoding with a single process.",
+            str(frame_size),
+            mdr_dimension,
+        )
+        workers = 1
+
+    if workers > 1:
+        shards = _split_symbols(bob_symbols, frame_size, workers)
+        logger.info("Encoding %i shards with %i processes.", len(shards), workers)
+        outputs = list(
+            get_executor(workers).map(
+                _encode_shard,
+                [
+                    (shard, beta, signal_to_noise_ratio, mdr_dimension)
+                    for shard in shards
+                ],
+            )
+        )
+    else:
+        outputs = [
+            _encode_shard((bob_symbols, beta, signal_to_noise_ratio, mdr_dimension))
+        ]
+
+    encoded: Tuple[List, List, List, List] = ([], [], [], [])
+    for output in outputs:
+        if not all(output):
+            logger.error("Error happened on error correction at Bob's side.")
+            return None
+        for values, shard_values in zip(encoded, output):
+            values.extend(shard_values)
+    return encoded
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+def _timed_encode(
+    bob_symbols: np.ndarray,
+    beta: float,
+    signal_to_noise_ratio: float,
+    mdr_dimension: int,
+    workers: int,
+    frame_size: Optional[int],
+) -> Optional[Tuple]:
+    """
+    Encode the frames of Bob (see :func:`_encode`) and record the phase in the metrics.
+
+    Args:
+        bob_symbols (np.ndarray): bob symbols, as an array of real numbers.
+        beta (float): reconciliation effiency, from which the rate is derived.
+        signal_to_noise_ratio (float): signal to noise ratio of the quantum data.
+        mdr_dimension (int): dimension of the multi-dimensional scheme.
+        workers (int): number of encoding processes.
+        frame_size (Optional[int]): number of symbols per LDPC frame.
+
+    Returns:
+        Optional[Tuple]: the channel message, syndrome, normalization vector and raw key, or None in case of error.
+    """
+    with phase_metrics.timer("ec_bob_encode", symbols=len(bob_symbols)) as counts:
+        encoded = _encode(
+            bob_symbols,
+            beta,
+            signal_to_noise_ratio,
+            mdr_dimension,
+            workers=workers,
+            frame_size=frame_size,
+        )
+        if encoded is not None:
+            counts["frames"] = len(encoded[3])
+            counts["payload_bytes"] = _initialization_payload(encoded)
+    return encoded
+
+
+def _check_crc(
+    raw_key: List, crc_alice: List[int], discard_flags: List[int]
+) -> Tuple[List[int], List]:
+    """
+    Check the CRCs of Alice and record the phase in the metrics.
+
+    Args:
+        raw_key (List): raw key of each frame of Bob.
+        crc_alice (List[int]): CRC of each frame of Alice.
+        discard_flags (List[int]): discard flags of Alice.
+
+    Returns:
+        Tuple[List[int], List]: the final discard flags and the kept frames.
+    """
+    with phase_metrics.timer("ec_bob_crc_check", frames=len(raw_key)) as counts:
+        final_discard_flags, final_keys = ir.CRC_check_Bob(
+            raw_keys=raw_key, CRC_Alice=crc_alice, discard_flag=discard_flags
+        )
+        counts["payload_bytes"] = (len(final_discard_flags) + 7) // 8
+    return final_discard_flags, final_keys
+
+
+def _initialization_content(
+    encoded: Tuple,
+    signal_to_noise_ratio: float,
+    encoding: str,
+    request_id: Optional[Union[int, str]],
+    batch: Optional[Dict] = None,
+) -> Dict:
+    """
+    Build the content of an EC_INITIALIZATION message.
+
+    Args:
+        encoded (Tuple): the channel message, syndrome, normalization vector and raw key.
+        signal_to_noise_ratio (float): signal to noise ratio of the quantum data.
+        encoding (str): encoding of the arrays.
+        request_id (Optional[Union[int, str]]): id of the request.
+        batch (Optional[Dict], optional): description of the batch, in pipelined mode. Defaults to None.
+
+    Returns:
+        Dict: the content of the message.
+    """
+    channel_message, syndrome, normalization_vector, raw_key = encoded
+    content = {
+        "channel_message": channel_message,
+        "syndrome": syndrome,
+        "normalization_vector": normalization_vector,
+        "signal_to_noise_ratio": signal_to_noise_ratio,
+        "frame_count": len(raw_key),
+    }
+    if batch is not None:
+        content.update(batch)
+    return encode_fields(
+        _with_request_id(content, request_id),
+        encoding,
+        arrays=_INITIALIZATION_ARRAYS,
+        bits=_INITIALIZATION_BITS,
+    )
+
+
+def _parse_verification(
+    data: Optional[Dict],
+    request_id: Optional[Union[int, str]],
+    batch_index: Optional[int] = None,
+) -> Dict:
+    """
+    Check and decode the content of an EC_VERIFICATION message.
+
+    Args:
+        data (Optional[Dict]): content of the EC_VERIFICATION message.
+        request_id (Optional[Union[int, str]]): id of the request, only checked if Alice echoed a request id.
+        batch_index (Optional[int], optional): expected index of the batch, in pipelined mode. Defaults to None.
+
+    Raises:
+        ValueError: if the content is invalid.
+
+    Returns:
+        Dict: the decoded content.
+    """
+    if not data or not "crc_alice" in data or not "discard_flags" in data:
+        raise ValueError("crc_alice or discard_flags is missing from EC_VERIFICATION.")
+
+    if data.get("request_id") is not None and data.get("request_id") != request_id:
+        raise ValueError(
+            f"Request id {data.get('request_id')} of EC_VERIFICATION does not match request id {request_id}."
+        )
+
+    if data.get("batch_index") != batch_index:
+        raise ValueError(
+            f"Batch {data.get('batch_index')} of EC_VERIFICATION does not match batch {batch_index}."
+        )
+
+    return decode_fields(data, arrays=("crc_alice",), bits=("discard_flags",))
+
+
+# pylint: disable=too-many-locals, too-many-arguments, too-many-positional-arguments
 def reconcile_bob(
     socket: QOSSTClient,
     bob_symbols: np.ndarray,
     beta: float,
     signal_to_noise_ratio: float,
     mdr_dimension: int,
-) -> Optional[List[int]]:
+    encoding: str = LIST_ENCODING,
+    request_id: Optional[Union[int, str]] = None,
+    batch_size: Optional[int] = None,
+    workers: int = 1,
+    frame_size: Optional[int] = None,
+) -> Optional[np.ndarray]:
     """Perform the reconciliation at Bob side.
 
     Start by computing channel messages, syndrome, normalization vector
@@ -155,15 +1038,43 @@ def reconcile_bob(
     for the discard flags and CRC from Alice, before discarding and computing
     the CRC and kept frames, to send the final discard flags to Alice.
 
+    The arrays are sent with the given encoding (see :mod:`qosst_pp.encoding`),
+    and Alice answers with the same encoding. The list encoding is the
+    historical format and should be used with peers that do not support
+    the binary encoding.
+
+    If a request id is given, it is sent with the messages of Bob and Alice
+    sends it back, so that both parties are sure to reconcile the same block
+    when the connection is kept open across several reconciliations. A reply
+    without request id is accepted, for Alices that do not support them.
+
+    If a batch size is given, the reconciliation is pipelined: the symbols are
+    split in batches of batch_size symbols, and Bob encodes the batch k+1 while
+    Alice decodes the batch k. The CRC and discard flags are exchanged for each
+    batch. The batch size should be a multiple of the length of the LDPC frames,
+    as the symbols that do not fill a complete frame are not reconciled. The
+    symbols that do not fill a complete batch are added to the last batch.
+
+    If more than one worker is requested, the symbols (or the symbols of each
+    batch in pipelined mode) are split on frame boundaries and the frames are
+    encoded in parallel in a pool of processes. The frame size must then be given
+    and be a multiple of the MDR dimension. The outputs are concatenated in a
+    single EC_INITIALIZATION message, so this is transparent for Alice.
+
     Args:
         socket (QOSSTClient): client socket of Bob.
         bob_symbols (np.ndarray): bob symbols, as an array of real numbers.
         beta (float): reconciliation effiency, from which the rate is derived.
         signal_to_noise_ratio (float): signal to noise ratio of the quantum data.
         mdr_dimension (int): dimension of the multi-dimensional scheme.
+        encoding (str, optional): encoding of the arrays in the messages. Defaults to LIST_ENCODING.
+        request_id (Optional[Union[int, str]], optional): id of the request. Defaults to None.
+        batch_size (Optional[int], optional): number of symbols per batch in pipelined mode, or None to reconcile all the symbols at once. Defaults to None.
+        workers (int, optional): number of encoding processes. Defaults to 1.
+        frame_size (Optional[int], optional): number of symbols per LDPC frame, required to encode in parallel. Defaults to None.
 
     Returns:
-        Optional[List[int]]: reconciled key.
+        Optional[np.ndarray]: reconciled key, as an array of bits.
     """
 
     if bob_symbols[0].imag:
@@ -171,34 +1082,43 @@ def reconcile_bob(
             "reconcile_bob takes as input a real array for Bob's symbols and bob_symbols[0] has non-zero imaginary part. This is likely to fail."
         )
 
-    (channel_message, syndrome, normalization_vector, raw_key) = ir.reconcile_Bob(
-        bob_states=bob_symbols,
-        beta=beta,
-        SNR=signal_to_noise_ratio,
-        MDR_dim=mdr_dimension,
+    if batch_size is not None:
+        return _reconcile_bob_pipelined(
+            socket,
+            bob_symbols,
+            (beta, signal_to_noise_ratio, mdr_dimension, workers, frame_size),
+            encoding,
+            request_id,
+            batch_size,
+        )
+
+    encoded = _timed_encode(
+        bob_symbols, beta, signal_to_noise_ratio, mdr_dimension, workers, frame_size
     )
 
-    if not channel_message or not syndrome or not normalization_vector or not raw_key:
-        logger.error("Error happened on error correction at Bob's side.")
+    if encoded is None:
         return None
 
+    raw_key = encoded[3]
+
     # Sent to Alice and wait for CRC_Alice and discard_flag to Bob
-    code, data = socket.request(
-        QOSSTCodes.EC_INITIALIZATION,
-        {
-            "channel_message": channel_message,
-            "syndrome": syndrome,
-            "normalization_vector": normalization_vector,
-            "signal_to_noise_ratio": signal_to_noise_ratio,
-        },
+    content = _initialization_content(
+        encoded, signal_to_noise_ratio, encoding, request_id
     )
+    with phase_metrics.timer("ec_bob_wait_verification"):
+        code, data = socket.request(QOSSTCodes.EC_INITIALIZATION, content)
 
     if code != QOSSTCodes.EC_VERIFICATION:
+        # Alice answers with an error only when she stops the reconciliation
         logger.error("Error happened during Alice's error reconciliation.")
         return None
 
-    if not data or not "crc_alice" in data or not "discard_flags" in data:
-        logger.error("crc_alice or discard_flags is missing from EC_VERIFICATION.")
+    try:
+        data = _parse_verification(data, request_id)
+    except ValueError as exc:
+        logger.error("Invalid EC_VERIFICATION content (%s).", str(exc))
+        # Alice is waiting for the discard flags
+        socket.send(QOSSTCodes.EC_ERROR)
         return None
 
     crc_alice = data["crc_alice"]
@@ -206,17 +1126,249 @@ def reconcile_bob(
 
     logger.info("Alice discard flags %s", str(alice_discard_flags))
 
-    (final_discard_flags, bob_final_keys) = ir.CRC_check_Bob(
-        raw_keys=raw_key, CRC_Alice=crc_alice, discard_flag=alice_discard_flags
+    (final_discard_flags, bob_final_keys) = _check_crc(
+        raw_key, crc_alice, alice_discard_flags
     )
-    code, data = socket.request(
-        QOSSTCodes.EC_DISCARD_FLAGS, {"final_discard_flags": final_discard_flags}
+    content = encode_fields(
+        _with_request_id({"final_discard_flags": final_discard_flags}, request_id),
+        encoding,
+        bits=("final_discard_flags",),
     )
+    with phase_metrics.timer("ec_bob_wait_finished"):
+        code, data = socket.request(QOSSTCodes.EC_DISCARD_FLAGS, content)
 
     logger.info("Final discard flags %s", str(final_discard_flags))
 
     # Make the array flat (instead of list of blocks)
-    reconciled_key = np.ravel(bob_final_keys).tolist()
+    reconciled_key = _flatten_key(bob_final_keys)
     logger.info("Reconciled key has length %i", len(reconciled_key))
 
     return reconciled_key
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+def _reconcile_bob_pipelined(
+    socket: QOSSTClient,
+    bob_symbols: np.ndarray,
+    parameters: Tuple[float, float, int, int, Optional[int]],
+    encoding: str,
+    request_id: Optional[Union[int, str]],
+    batch_size: int,
+) -> Optional[np.ndarray]:
+    """Perform the pipelined reconciliation at Bob side.
+
+    See :func:`_reconcile_alice_batches` for the order of the messages.
+
+    Args:
+        socket (QOSSTClient): client socket of Bob.
+        bob_symbols (np.ndarray): bob symbols, as an array of real numbers.
+        parameters (Tuple[float, float, int, int, Optional[int]]): beta, signal to noise ratio, dimension of the multi-dimensional scheme, number of encoding processes and frame size.
+        encoding (str): encoding of the arrays in the messages.
+        request_id (Optional[Union[int, str]]): id of the request.
+        batch_size (int): number of symbols per batch.
+
+    Returns:
+        Optional[np.ndarray]: reconciled key, as an array of bits.
+    """
+    mdr_dimension = parameters[2]
+    if batch_size <= 0 or batch_size % mdr_dimension:
+        logger.error(
+            "Batch size %i is not a positive multiple of the MDR dimension %i.",
+            batch_size,
+            mdr_dimension,
+        )
+        return None
+
+    # The last batch also contains the symbols that do not fill a complete batch
+    num_batches = max(len(bob_symbols) // batch_size, 1)
+    logger.info(
+        "Starting pipelined reconciliation with %i batches of %i symbols.",
+        num_batches,
+        batch_size,
+    )
+    bounds = [batch_index * batch_size for batch_index in range(num_batches)]
+    bounds.append(len(bob_symbols))
+    batches = [bob_symbols[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    return _collect_key(
+        _reconcile_bob_batches(socket, batches, parameters, encoding, request_id)
+    )
+
+
+# pylint: disable=too-many-locals, too-many-return-statements, too-many-statements
+def _reconcile_bob_batches(
+    socket: QOSSTClient,
+    batches: Iterable[np.ndarray],
+    parameters: Tuple[float, float, int, int, Optional[int]],
+    encoding: str,
+    request_id: Optional[Union[int, str]],
+) -> Iterator[Optional[np.ndarray]]:
+    """Perform the pipelined reconciliation at Bob side, batch by batch.
+
+    See :func:`_reconcile_alice_batches` for the order of the messages. The
+    batches are read from the iterable one batch in advance, to know if a batch
+    is the last one.
+
+    The key of each batch is yielded as soon as its final discard flags are sent
+    to Alice (and, for the last batch, acknowledged by Alice).
+
+    If reading a batch from the iterable raises a ValueError, the
+    reconciliation is aborted as if the encoding failed, and the error is
+    raised once Alice is notified.
+
+    Args:
+        socket (QOSSTClient): client socket of Bob.
+        batches (Iterable[np.ndarray]): the symbols of Bob, batch by batch.
+        parameters (Tuple[float, float, int, int, Optional[int]]): beta, signal to noise ratio, dimension of the multi-dimensional scheme, number of encoding processes and frame size.
+        encoding (str): encoding of the arrays in the messages.
+        request_id (Optional[Union[int, str]]): id of the request.
+
+    Raises:
+        ValueError: if reading a batch raised a ValueError.
+
+    Yields:
+        Optional[np.ndarray]: the reconciled key of each batch, as an array of bits, or None in case of error, after which the generator stops.
+    """
+    beta, signal_to_noise_ratio, mdr_dimension, workers, frame_size = parameters
+    batches = iter(batches)
+    next_symbols = next(batches, None)
+    if next_symbols is None:
+        logger.error("There is no symbol to reconcile.")
+        yield None
+        return
+
+    offset = 0
+    batch_count = 0
+    key_length = 0
+    # Error raised while reading the batches, raised once Alice is notified
+    read_error = None
+
+    def encode_batch() -> Optional[Tuple[List, Dict, bool]]:
+        nonlocal next_symbols, offset, batch_count, read_error
+        symbols = next_symbols
+        try:
+            next_symbols = next(batches, None)
+        except ValueError as exc:
+            read_error = exc
+            return None
+        last_batch = next_symbols is None
+        encoded = _timed_encode(
+            symbols, beta, signal_to_noise_ratio, mdr_dimension, workers, frame_size
+        )
+        if encoded is None:
+            return None
+        content = _initialization_content(
+            encoded,
+            signal_to_noise_ratio,
+            encoding,
+            request_id,
+            {
+                "batch_index": batch_count,
+                "symbol_offset": offset,
+                "symbol_count": len(symbols),
+                "last_batch": last_batch,
+            },
+        )
+        offset += len(symbols)
+        batch_count += 1
+        return encoded[3], content, last_batch
+
+    # Raw keys of the batches sent to Alice and not yet verified
+    raw_keys = []
+
+    batch = encode_batch()
+    if batch is None:
+        if read_error is not None:
+            raise read_error
+        yield None
+        return
+    raw_keys.append(batch[0])
+    socket.send(QOSSTCodes.EC_INITIALIZATION, batch[1])
+    last_sent = batch[2]
+
+    if not last_sent:
+        batch = encode_batch()
+        code, _ = socket.recv()
+        if code != QOSSTCodes.EC_READY:
+            logger.error("Error happened during Alice's error reconciliation.")
+            yield None
+            return
+        if batch is None:
+            socket.send(QOSSTCodes.EC_ERROR)
+            if read_error is not None:
+                raise read_error
+            yield None
+            return
+        raw_keys.append(batch[0])
+        socket.send(QOSSTCodes.EC_INITIALIZATION, batch[1])
+        last_sent = batch[2]
+
+    batch_index = 0
+    while True:
+        with phase_metrics.timer("ec_bob_wait_verification"):
+            code, data = socket.recv()
+        if code != QOSSTCodes.EC_VERIFICATION:
+            logger.error("Error happened during Alice's error reconciliation.")
+            yield None
+            return
+
+        try:
+            data = _parse_verification(data, request_id, batch_index)
+        except ValueError as exc:
+            logger.error("Invalid EC_VERIFICATION content (%s).", str(exc))
+            socket.send(QOSSTCodes.EC_ERROR)
+            yield None
+            return
+
+        (final_discard_flags, batch_final_keys) = _check_crc(
+            raw_keys.pop(0), data["crc_alice"], data["discard_flags"]
+        )
+        logger.info(
+            "Final discard flags of batch %i %s", batch_index, str(final_discard_flags)
+        )
+        key = _flatten_key(batch_final_keys)
+        key_length += len(key)
+
+        content = encode_fields(
+            _with_request_id(
+                {
+                    "final_discard_flags": final_discard_flags,
+                    "batch_index": batch_index,
+                },
+                request_id,
+            ),
+            encoding,
+            bits=("final_discard_flags",),
+        )
+
+        if last_sent and not raw_keys:
+            with phase_metrics.timer("ec_bob_wait_finished"):
+                code, data = socket.request(QOSSTCodes.EC_DISCARD_FLAGS, content)
+            if code != QOSSTCodes.EC_FINISHED:
+                logger.error(
+                    "Error happened at the end of Alice's error reconciliation."
+                )
+                yield None
+                return
+            logger.info(
+                "Reconciled key has length %i (%i batches)",
+                key_length,
+                batch_index + 1,
+            )
+            yield key
+            return
+
+        # Encode the batch k+2 while Alice decodes the batch k+1
+        if not last_sent:
+            batch = encode_batch()
+            if batch is None:
+                socket.send(QOSSTCodes.EC_ERROR)
+                if read_error is not None:
+                    raise read_error
+                yield None
+                return
+            raw_keys.append(batch[0])
+            content["next_batch"] = batch[1]
+            last_sent = batch[2]
+        socket.send(QOSSTCodes.EC_DISCARD_FLAGS, content)
+        yield key
+        batch_index += 1
@@ -21,72 +21,235 @@ Reconciliation server for Alice.
 
 import logging
 import argparse
+from typing import Optional
 
 import zmq
-import numpy as np
 
 from qosst_core.control_protocol.sockets import QOSSTServer
-from qosst_core.control_protocol.codes import QOSSTCodes
+from qosst_core.control_protocol.codes import QOSSTCodes, QOSSTErrorCodes
 from qosst_core.logging import create_loggers
 
 from qosst_pp import __version__
+from qosst_pp.extractors import EXTRACTORS
+from qosst_pp.key_server import push_key
+from qosst_pp.key_store import KeyStore
+from qosst_pp.messages import recv_symbols, release_symbols, send_key
+from qosst_pp.metrics import start_metrics_server
+from qosst_pp.privacy_amplification import privacy_amplification_alice
 from qosst_pp.reconciliation.reconciliation import reconcile_alice
+from qosst_pp.reconciliation.decoding_workers import DecodingDispatcher
 
 logger = logging.getLogger(__name__)
 
 
+# pylint: disable=too-many-locals, too-many-branches, too-many-statements, too-many-arguments, too-many-positional-arguments
 def reconciliation_server_alice(
-    listening_host: str, listening_port: int, internal_endpoint: str
+    listening_host: str,
+    listening_port: int,
+    internal_endpoint: str,
+    session: bool = False,
+    workers: int = 1,
+    extractor: Optional[str] = None,
+    dispatcher: Optional[DecodingDispatcher] = None,
+    key_store: Optional[KeyStore] = None,
+    key_server: Optional[str] = None,
 ):
     """Start reconciliation server for Alice.
 
+    In session mode, the ZMQ socket and the QOSST connection are kept open
+    across requests: the ZMQ socket is only bound once and Bob's connection
+    is only accepted again if he disconnects. Otherwise, both sockets are
+    re-created for each request.
+
+    If the request of the application contains a ``request_id``, it is checked
+    against the one sent by Bob, so that both parties reconcile the same block.
+
+    If an extractor is given, the privacy amplification is performed with
+    this extractor right after the reconciliation, in the same QOSST session,
+    and only the final key is returned to the application. Bob's server must
+    use the same extractor.
+
+    If a dispatcher is given, the frames are decoded by the remote decoding
+    workers (see :mod:`qosst_pp.reconciliation.decoding_workers`) instead of
+    the pool of processes. The dispatcher is opened and closed by the server.
+
+    If a key store is given, the keys returned to the application are also
+    appended to the store, with the request id as session id (empty if the
+    request has no id), and the position of the block in the store is given in
+    ``key_store_position``.
+
+    If a key server endpoint is given, the final keys returned to the
+    application are also pushed to the key server (see
+    :mod:`qosst_pp.key_server`). This requires an extractor, as the reconciled
+    key is not secret before the privacy amplification.
+
     Args:
         listening_host (str): address to bind to for QOSST socket.
         listening_port (int): port to bind to for QOSST socket.
         internal_endpoint (str): endpoint for the ZMQ socket.
+        session (bool, optional): if True, keep the sockets open across requests. Defaults to False.
+        workers (int, optional): number of decoding and extraction processes. Defaults to 1.
+        extractor (Optional[str], optional): name of the extractor in :data:`qosst_pp.extractors.EXTRACTORS` to perform privacy amplification, or None to only perform reconciliation. Defaults to None.
+        dispatcher (Optional[DecodingDispatcher], optional): dispatcher to the decoding workers. Defaults to None.
+        key_store (Optional[KeyStore], optional): store to append the keys to. Defaults to None.
+        key_server (Optional[str], optional): ingest endpoint of a key server to push the final keys to. Defaults to None.
+
+    Raises:
+        ValueError: if a key server is given without extractor.
     """
+    if key_server is not None and extractor is None:
+        raise ValueError("An extractor is required to push the keys to a key server.")
+    extractor_class = EXTRACTORS[extractor] if extractor is not None else None
+    if dispatcher is not None:
+        dispatcher.open()
     zmq_context = zmq.Context()
+    zmq_socket = None
+    key_server_socket = None
+    if key_server is not None:
+        logger.info("Pushing keys to the key server at %s", key_server)
+        key_server_socket = zmq_context.socket(zmq.PUSH)
+        key_server_socket.connect(key_server)
+    socket = None
     while True:
         try:
-            logger.info("Starting Bob reconciliation server")
+            if zmq_socket is None:
+                logger.info("Starting Alice reconciliation server")
 
-            # Create zmq listener to receive the data
-            logger.info("Creating ZMQ socket at %s", internal_endpoint)
-            zmq_socket = zmq_context.socket(zmq.REP)
-            zmq_socket.bind(internal_endpoint)
+                # Create zmq listener to receive the data
+                logger.info("Creating ZMQ socket at %s", internal_endpoint)
+                zmq_socket = zmq_context.socket(zmq.REP)
+                zmq_socket.bind(internal_endpoint)
 
             # Receive the data from Alice
             logger.info("Waiting for a request from Alice.")
-            data = zmq_socket.recv_json()
+            try:
+                request, alice_symbols, multipart = recv_symbols(
+                    zmq_socket, "alice_symbols"
+                )
+            except ValueError as exc:
+                logger.error("Invalid request (%s).", str(exc))
+                zmq_socket.send_json({"key": None, "error_message": str(exc)})
+                if not session:
+                    zmq_socket.close()
+                    zmq_socket = None
+                continue
 
             logger.info("Request received.")
-            alice_symbols = np.array(data["alice_symbols"])
-            mdr_dimension = data["mdr_dimension"]
+            mdr_dimension = request["mdr_dimension"]
+            request_id = request.get("request_id")
 
-            # Create QOSST socket
-            socket = QOSSTServer(listening_host, listening_port)
+            if socket is None:
+                # Create QOSST socket
+                socket = QOSSTServer(listening_host, listening_port)
 
-            logger.info("Binding to %s:%s", listening_host, listening_port)
-            socket.open()
+                logger.info("Binding to %s:%s", listening_host, listening_port)
+                socket.open()
 
-            logger.info("Waiting for a client to connect.")
-            socket.connect()
+                logger.info("Waiting for a client to connect.")
+                socket.connect()
 
             code, data = socket.recv()
 
-            assert code == QOSSTCodes.EC_INITIALIZATION
-
-            key = reconcile_alice(socket, alice_symbols, mdr_dimension, data)
-
-            logger.info("Reconciliation finished, returning keys.")
+            if code == QOSSTErrorCodes.SOCKET_DISCONNECTION:
+                logger.warning("Bob has disconnected. Waiting for a client to connect.")
+                socket.connect()
+                code, data = socket.recv()
+
+            if code != QOSSTCodes.EC_INITIALIZATION:
+                logger.error("Expected EC_INITIALIZATION and received %s.", str(code))
+                if code == QOSSTErrorCodes.SOCKET_DISCONNECTION:
+                    socket.close()
+                    socket = None
+                elif code != QOSSTCodes.EC_ERROR:
+                    socket.send(QOSSTCodes.UNEXPECTED_COMMAND)
+                send_key(
+                    zmq_socket,
+                    None,
+                    multipart,
+                    request_id=request_id,
+                    error_message=f"Unexpected command {code} received from Bob.",
+                )
+                release_symbols(request)
+                if not session:
+                    if socket is not None:
+                        socket.close()
+                        socket = None
+                    zmq_socket.close()
+                    zmq_socket = None
+                continue
+
+            key = reconcile_alice(
+                socket,
+                alice_symbols,
+                mdr_dimension,
+                data,
+                request_id=request_id,
+                workers=workers,
+                dispatcher=dispatcher,
+            )
+
+            parameters = {"request_id": request_id}
+            if extractor_class is not None and key is not None and len(key) == 0:
+                # Bob has the same empty key and skips the privacy amplification too
+                logger.error("Every frame was discarded, the reconciled key is empty.")
+                parameters["error_message"] = "The reconciled key is empty."
+                key = None
+            if extractor_class is not None and key is not None:
+                logger.info("Reconciliation finished, starting privacy amplification.")
+                parameters["reconciled_key_length"] = len(key)
+                code, data = socket.recv()
+                if code == QOSSTCodes.PA_REQUEST:
+                    try:
+                        key = privacy_amplification_alice(
+                            socket, key, extractor_class, data, workers=workers
+                        )
+                    except ValueError as exc:
+                        logger.error("Privacy amplification failed (%s).", str(exc))
+                        socket.send(QOSSTCodes.PA_ERROR, {"error_message": str(exc)})
+                        key = None
+                elif code == QOSSTCodes.ABORT:
+                    logger.error(
+                        "Bob aborted the privacy amplification (%s).",
+                        (data or {}).get("error_message"),
+                    )
+                    socket.send(QOSSTCodes.ABORT_ACK)
+                    key = None
+                else:
+                    logger.error("Expected PA_REQUEST and received %s.", str(code))
+                    socket.send(QOSSTCodes.UNEXPECTED_COMMAND)
+                    key = None
+                if key is None:
+                    parameters["error_message"] = "Privacy amplification failed."
+
+            if key_store is not None and key is not None:
+                parameters["key_store_position"] = key_store.append(
+                    key, session_id="" if request_id is None else str(request_id)
+                )
+
+            if key_server_socket is not None and key is not None:
+                push_key(key_server_socket, key)
+
+            logger.info("Post-processing finished, returning keys.")
             # Return key to the application
-            zmq_socket.send_json({"key": key})
-
-            logger.info("Closing sockets.")
-            socket.close()
-            zmq_socket.close()
+            send_key(zmq_socket, key, multipart, **parameters)
+            release_symbols(request)
+
+            if not session:
+                logger.info("Closing sockets.")
+                socket.close()
+                zmq_socket.close()
+                socket = None
+                zmq_socket = None
         except KeyboardInterrupt:
             logger.info("Stopping server.")
+            if socket is not None:
+                socket.close()
+            if zmq_socket is not None:
+                zmq_socket.close()
+            if key_server_socket is not None:
+                key_server_socket.close()
+            if dispatcher is not None:
+                dispatcher.close()
             zmq_context.term()
             return
 
@@ -113,6 +276,66 @@ def _create_parser() -> argparse.ArgumentParser:
         "remote_port", help="Port of the remote host to bind to.", type=int
     )
     parser.add_argument("endpoint", help="Endpoint to bind the server to.")
+    parser.add_argument(
+        "--session",
+        action="store_true",
+        help="Keep the ZMQ socket and the QOSST connection open across requests.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to decode the frames and extract the key blocks in parallel.",
+    )
+    parser.add_argument(
+        "--extractor",
+        choices=EXTRACTORS,
+        default=None,
+        help="Perform privacy amplification with this extractor after the reconciliation and only return the final key.",
+    )
+    parser.add_argument(
+        "--task-endpoint",
+        default=None,
+        help="Endpoint to bind to for sending the frames to the decoding workers (qosst-pp-worker). Requires --result-endpoint.",
+    )
+    parser.add_argument(
+        "--result-endpoint",
+        default=None,
+        help="Endpoint to bind to for receiving the decoded frames from the decoding workers. Requires --task-endpoint.",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=16,
+        help="Number of shards in which the frames are split for the decoding workers.",
+    )
+    parser.add_argument(
+        "--worker-timeout",
+        type=float,
+        default=60.0,
+        help="Time to wait for the decoding workers, in seconds, before decoding the missing shards locally.",
+    )
+    parser.add_argument(
+        "--key-store",
+        default=None,
+        help="Path of a key store to append the keys to, in addition to returning them.",
+    )
+    parser.add_argument(
+        "--key-server",
+        default=None,
+        help="Ingest endpoint of a key server (qosst-pp-keyserver) to push the final keys to, in addition to returning them. Requires --extractor.",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve the timings of the phases of the post-processing in the Prometheus text format over HTTP on this port.",
+    )
+    parser.add_argument(
+        "--metrics-host",
+        default="127.0.0.1",
+        help="Address to bind the metrics endpoint to. Use 0.0.0.0 to expose the metrics on the network.",
+    )
 
     return parser
 
@@ -125,9 +348,44 @@ def main():
 
     args = parser.parse_args()
 
+    if args.key_server is not None and args.extractor is None:
+        parser.error(
+            "--key-server requires --extractor, as only the final keys can be pushed to the key server."
+        )
+
+    if (args.task_endpoint is None) != (args.result_endpoint is None):
+        parser.error("--task-endpoint and --result-endpoint must be given together.")
+
     create_loggers(args.verbose, None)
 
-    reconciliation_server_alice(args.remote_host, args.remote_port, args.endpoint)
+    if args.metrics_port is not None:
+        start_metrics_server(args.metrics_port, host=args.metrics_host)
+
+    key_store = KeyStore(args.key_store) if args.key_store is not None else None
+
+    dispatcher = None
+    if args.task_endpoint is not None:
+        dispatcher = DecodingDispatcher(
+            args.task_endpoint,
+            args.result_endpoint,
+            shards=args.shards,
+            timeout=args.worker_timeout,
+        )
+
+    reconciliation_server_alice(
+        args.remote_host,
+        args.remote_port,
+        args.endpoint,
+        session=args.session,
+        workers=args.workers,
+        extractor=args.extractor,
+        dispatcher=dispatcher,
+        key_store=key_store,
+        key_server=args.key_server,
+    )
+
+    if key_store is not None:
+        key_store.close()
 
 
 if __name__ == "__main__":
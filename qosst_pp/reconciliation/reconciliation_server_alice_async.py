@@ -0,0 +1,584 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Asynchronous reconciliation server for Alice, serving several sessions concurrently.
+
+Several Bob servers (or several connections of the same Bob server) can connect
+to the QOSST port, each connection being a session. The requests of the
+applications are received on a ZMQ ROUTER socket, so that several applications
+(or several requests of the same application with a DEALER socket) can wait
+for their key at the same time.
+
+The requests of the applications are matched with the reconciliations started
+by Bob with their ``request_id``, which is hence required. The reconciliations
+are run in a pool of threads, and the decoding itself can be done in a pool of
+processes (see :func:`qosst_pp.reconciliation.reconciliation.reconcile_alice`).
+
+The server does not perform privacy amplification, so its keys cannot be
+pushed to a key server (see :mod:`qosst_pp.key_server`).
+"""
+
+import asyncio
+import logging
+import argparse
+import socket as pysocket
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+import zmq
+import zmq.asyncio
+
+from qosst_core.control_protocol.sockets import QOSSTServer
+from qosst_core.control_protocol.codes import QOSSTCodes, QOSSTErrorCodes
+from qosst_core.logging import create_loggers
+
+from qosst_pp import __version__
+from qosst_pp.key_store import KeyStore
+from qosst_pp.messages import parse_symbols, key_frames, release_symbols
+from qosst_pp.metrics import start_metrics_server
+from qosst_pp.reconciliation.reconciliation import reconcile_alice
+
+logger = logging.getLogger(__name__)
+
+
+class _QOSSTPeer(QOSSTServer):
+    """
+    QOSST server socket wrapping a connection accepted by the asynchronous server.
+
+    QOSSTServer accepts its connection itself, so this class relies on the
+    internals of the sockets of qosst_core, as of qosst-core 0.10
+    (post-processing branch): the ``socket``, ``host_socket`` and
+    ``client_address`` attributes, and the registration of ``socket`` in the
+    ``selector`` by ``QOSSTSocket.connect``. This is the only dependency of the
+    server on these internals.
+    """
+
+    def __init__(self, connection: pysocket.socket, client_address: str):
+        """
+        Args:
+            connection (pysocket.socket): the accepted connection.
+            client_address (str): the address of the client.
+
+        Raises:
+            RuntimeError: if the sockets of qosst_core do not have the expected internals.
+        """
+        super().__init__()
+        if not hasattr(self, "socket") or not hasattr(self, "selector"):
+            raise RuntimeError(
+                "Unsupported version of qosst_core: the QOSST sockets have no socket or selector attribute."
+            )
+        self.host_socket = None
+        self.client_address = client_address
+        self.socket = connection
+        # Register the connection in the selector used by recv
+        # pylint: disable=bad-super-call
+        super(QOSSTServer, self).connect()
+
+    def open(self):
+        """
+        Do nothing, as the connection is already accepted.
+        """
+
+    def connect(self):
+        """
+        Do nothing, as the connection is already accepted.
+        """
+
+    @property
+    def connected(self) -> bool:
+        """
+        bool: whether the connection is still open, as it is closed when Bob disconnects.
+        """
+        return self.socket is not None
+
+
+# pylint: disable=too-many-instance-attributes, too-few-public-methods
+class AsyncReconciliationServerAlice:
+    """
+    Asynchronous reconciliation server for Alice.
+    """
+
+    # pylint: disable=too-many-arguments, too-many-positional-arguments
+    def __init__(
+        self,
+        listening_host: str,
+        listening_port: int,
+        internal_endpoint: str,
+        max_sessions: int = 4,
+        workers: int = 1,
+        request_timeout: float = 60,
+        key_store: Optional[KeyStore] = None,
+    ):
+        """
+        Args:
+            listening_host (str): address to bind to for QOSST socket.
+            listening_port (int): port to bind to for QOSST socket.
+            internal_endpoint (str): endpoint for the ZMQ ROUTER socket.
+            max_sessions (int, optional): maximal number of concurrent reconciliations. Defaults to 4.
+            workers (int, optional): number of decoding processes of each reconciliation. Defaults to 1.
+            request_timeout (float, optional): time to wait for the request of the application after Bob started a reconciliation, and for Bob after a request of the application, in seconds. Defaults to 60.
+            key_store (Optional[KeyStore], optional): store to append the keys to, with the request id as session id. Defaults to None.
+        """
+        self.listening_host = listening_host
+        self.listening_port = listening_port
+        self.internal_endpoint = internal_endpoint
+        self.max_sessions = max_sessions
+        self.workers = workers
+        self.request_timeout = request_timeout
+        self.key_store = key_store
+
+        #: Requests of the applications, by request id.
+        self._requests: Dict[Union[int, str], asyncio.Future] = {}
+        #: Ids of the requests being reconciled.
+        self._running: Set[Union[int, str]] = set()
+        #: Tasks answering the requests that Bob did not reconcile in time.
+        self._expiries: Set[asyncio.Task] = set()
+        self._threads = ThreadPoolExecutor(
+            max_workers=max_sessions, thread_name_prefix="qosst-pp-alice"
+        )
+
+    def _request_future(self, request_id: Union[int, str]) -> asyncio.Future:
+        """
+        Get the future of the request with the given id, creating it if needed.
+
+        Args:
+            request_id (Union[int, str]): the request id.
+
+        Returns:
+            asyncio.Future: the future, resolved with the routing envelope, the parameters, the symbols and the format of the request.
+        """
+        if not request_id in self._requests:
+            self._requests[request_id] = asyncio.get_running_loop().create_future()
+        return self._requests[request_id]
+
+    async def _expire_request(
+        self,
+        zmq_socket: zmq.asyncio.Socket,
+        request_id: Union[int, str],
+        future: asyncio.Future,
+    ):
+        """
+        Answer with an error the request of an application if Bob did not start
+        its reconciliation within the timeout, and release its symbols.
+
+        Args:
+            zmq_socket (zmq.asyncio.Socket): the ZMQ ROUTER socket.
+            request_id (Union[int, str]): the request id.
+            future (asyncio.Future): the future of the request, resolved with the request.
+        """
+        await asyncio.sleep(self.request_timeout)
+        if self._requests.get(request_id) is not future:
+            return
+        del self._requests[request_id]
+        envelope, request, _, multipart = future.result()
+        logger.error("No reconciliation of request %s by Bob.", str(request_id))
+        await zmq_socket.send_multipart(
+            envelope
+            + key_frames(
+                None,
+                multipart,
+                request_id=request_id,
+                error_message=f"No reconciliation of request {request_id} by Bob.",
+            ),
+            copy=False,
+        )
+        release_symbols(request)
+
+    async def _serve_applications(self, zmq_socket: zmq.asyncio.Socket):
+        """
+        Receive the requests of the applications.
+
+        Args:
+            zmq_socket (zmq.asyncio.Socket): the ZMQ ROUTER socket.
+        """
+        while True:
+            frames = await zmq_socket.recv_multipart(copy=False)
+            # The envelope contains the identity and, with REQ sockets, an empty delimiter
+            envelope_size = 2 if len(frames) > 1 and not frames[1].bytes else 1
+            envelope = [frame.bytes for frame in frames[:envelope_size]]
+            frames = frames[envelope_size:]
+
+            data = None
+            try:
+                data, alice_symbols, multipart = parse_symbols(frames, "alice_symbols")
+                if data.get("request_id") is None:
+                    raise ValueError(
+                        "request_id is required by the asynchronous server."
+                    )
+                if not isinstance(data["request_id"], (int, str)):
+                    raise ValueError("request_id must be an integer or a string.")
+                if not "mdr_dimension" in data:
+                    raise ValueError("mdr_dimension is missing from the request.")
+                if data["request_id"] in self._running:
+                    raise ValueError(
+                        f"A request with id {data['request_id']} is being reconciled."
+                    )
+                future = self._request_future(data["request_id"])
+                if future.done():
+                    raise ValueError(
+                        f"A request with id {data['request_id']} is already pending."
+                    )
+            except ValueError as exc:
+                logger.error("Invalid request (%s).", str(exc))
+                await zmq_socket.send_multipart(
+                    envelope + key_frames(None, False, error_message=str(exc))
+                )
+                if data is not None:
+                    release_symbols(data)
+                continue
+
+            logger.info("Request %s received.", str(data["request_id"]))
+            future.set_result((envelope, data, alice_symbols, multipart))
+            expiry = asyncio.create_task(
+                self._expire_request(zmq_socket, data["request_id"], future)
+            )
+            self._expiries.add(expiry)
+            expiry.add_done_callback(self._expiries.discard)
+
+    async def _recv(self, peer: _QOSSTPeer) -> Tuple:
+        """
+        Receive a message from Bob without blocking the event loop.
+
+        Args:
+            peer (_QOSSTPeer): the QOSST socket of the session.
+
+        Returns:
+            Tuple: the code and content of the message.
+        """
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        fileno = peer.socket.fileno()
+        loop.add_reader(fileno, lambda: readable.done() or readable.set_result(None))
+        try:
+            await readable
+        finally:
+            loop.remove_reader(fileno)
+        # The reconciliation threads might all be busy, use the default executor
+        return await loop.run_in_executor(None, peer.recv)
+
+    # pylint: disable=too-many-locals, too-many-statements
+    async def _serve_session(
+        self,
+        peer: _QOSSTPeer,
+        zmq_socket: zmq.asyncio.Socket,
+        semaphore: asyncio.Semaphore,
+    ):
+        """
+        Serve the reconciliations of a session, i.e. of a connection of Bob.
+
+        Args:
+            peer (_QOSSTPeer): the QOSST socket of the session.
+            zmq_socket (zmq.asyncio.Socket): the ZMQ ROUTER socket.
+            semaphore (asyncio.Semaphore): semaphore limiting the concurrent reconciliations.
+        """
+        loop = asyncio.get_running_loop()
+        session_id = f"{peer.client_address[0]}:{peer.client_address[1]}"
+        logger.info("Session %s started.", session_id)
+        while peer.connected:
+            code, data = await self._recv(peer)
+
+            if code == QOSSTErrorCodes.SOCKET_DISCONNECTION:
+                break
+
+            if code != QOSSTCodes.EC_INITIALIZATION:
+                logger.error(
+                    "Session %s: expected EC_INITIALIZATION and received %s.",
+                    session_id,
+                    str(code),
+                )
+                peer.send(QOSSTCodes.UNEXPECTED_COMMAND)
+                continue
+
+            request_id = data.get("request_id") if data else None
+            if request_id is None:
+                logger.error("Session %s: request id is missing.", session_id)
+                peer.send(
+                    QOSSTCodes.INVALID_CONTENT,
+                    {"error_message": "request_id is required by Alice."},
+                )
+                continue
+
+            logger.info(
+                "Session %s: waiting for the request %s of the application.",
+                session_id,
+                str(request_id),
+            )
+            future = self._request_future(request_id)
+            try:
+                envelope, request, alice_symbols, multipart = await asyncio.wait_for(
+                    asyncio.shield(future), self.request_timeout
+                )
+            except asyncio.TimeoutError:
+                if not future.done() and self._requests.get(request_id) is future:
+                    del self._requests[request_id]
+                logger.error(
+                    "Session %s: no request %s from the application.",
+                    session_id,
+                    str(request_id),
+                )
+                peer.send(
+                    QOSSTCodes.INVALID_CONTENT,
+                    {"error_message": f"No request {request_id} on Alice's side."},
+                )
+                continue
+            if self._requests.get(request_id) is not future:
+                # The request expired, and the application was already answered
+                logger.error(
+                    "Session %s: request %s expired.", session_id, str(request_id)
+                )
+                peer.send(
+                    QOSSTCodes.INVALID_CONTENT,
+                    {"error_message": f"Request {request_id} expired on Alice's side."},
+                )
+                continue
+            del self._requests[request_id]
+            self._running.add(request_id)
+
+            async with semaphore:
+                logger.info(
+                    "Session %s: starting reconciliation of request %s.",
+                    session_id,
+                    str(request_id),
+                )
+                try:
+                    key = await loop.run_in_executor(
+                        self._threads,
+                        lambda: reconcile_alice(
+                            peer,
+                            alice_symbols,
+                            request["mdr_dimension"],
+                            data,
+                            request_id=request_id,
+                            workers=self.workers,
+                        ),
+                    )
+                except Exception as exc:  # pylint: disable=broad-exception-caught
+                    logger.exception(
+                        "Session %s: reconciliation of request %s failed.",
+                        session_id,
+                        str(request_id),
+                    )
+                    # Bob is waiting for an answer, unless he disconnected
+                    try:
+                        peer.send(QOSSTCodes.EC_ERROR)
+                    except OSError:
+                        logger.debug("Session %s: Bob cannot be notified.", session_id)
+                    await zmq_socket.send_multipart(
+                        envelope
+                        + key_frames(
+                            None,
+                            multipart,
+                            request_id=request_id,
+                            error_message=f"Reconciliation failed: {exc}",
+                        ),
+                        copy=False,
+                    )
+                    release_symbols(request)
+                    self._running.discard(request_id)
+                    continue
+
+            logger.info(
+                "Session %s: reconciliation of request %s finished, returning keys.",
+                session_id,
+                str(request_id),
+            )
+            parameters = {"request_id": request_id}
+            if self.key_store is not None and key is not None:
+                parameters["key_store_position"] = self.key_store.append(
+                    key, session_id=str(request_id)
+                )
+            await zmq_socket.send_multipart(
+                envelope + key_frames(key, multipart, **parameters),
+                copy=False,
+            )
+            release_symbols(request)
+            self._running.discard(request_id)
+
+        logger.info("Session %s ended.", session_id)
+
+    async def serve(self):
+        """
+        Serve the sessions and the applications until cancelled.
+        """
+        logger.info("Starting asynchronous Alice reconciliation server")
+        zmq_context = zmq.asyncio.Context()
+        logger.info("Creating ZMQ socket at %s", self.internal_endpoint)
+        zmq_socket = zmq_context.socket(zmq.ROUTER)
+        zmq_socket.bind(self.internal_endpoint)
+
+        logger.info("Binding to %s:%s", self.listening_host, self.listening_port)
+        host_socket = pysocket.socket(pysocket.AF_INET, pysocket.SOCK_STREAM)
+        host_socket.setsockopt(pysocket.SOL_SOCKET, pysocket.SO_REUSEADDR, 1)
+        host_socket.bind((self.listening_host, self.listening_port))
+        host_socket.listen()
+        host_socket.setblocking(False)
+
+        semaphore = asyncio.Semaphore(self.max_sessions)
+        loop = asyncio.get_running_loop()
+        tasks: List[asyncio.Task] = [
+            asyncio.create_task(self._serve_applications(zmq_socket))
+        ]
+        try:
+            while True:
+                connection, client_address = await loop.sock_accept(host_socket)
+                logger.info("Client with address %s has connected", client_address)
+                tasks.append(
+                    asyncio.create_task(
+                        self._serve_session(
+                            _QOSSTPeer(connection, client_address),
+                            zmq_socket,
+                            semaphore,
+                        )
+                    )
+                )
+                tasks = [task for task in tasks if not task.done()]
+        finally:
+            for task in tasks + list(self._expiries):
+                task.cancel()
+            host_socket.close()
+            zmq_socket.close()
+            zmq_context.term()
+            self._threads.shutdown(wait=False)
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+def reconciliation_server_alice_async(
+    listening_host: str,
+    listening_port: int,
+    internal_endpoint: str,
+    max_sessions: int = 4,
+    workers: int = 1,
+    request_timeout: float = 60,
+    key_store: Optional[KeyStore] = None,
+):
+    """Start the asynchronous reconciliation server for Alice.
+
+    Args:
+        listening_host (str): address to bind to for QOSST socket.
+        listening_port (int): port to bind to for QOSST socket.
+        internal_endpoint (str): endpoint for the ZMQ ROUTER socket.
+        max_sessions (int, optional): maximal number of concurrent reconciliations. Defaults to 4.
+        workers (int, optional): number of decoding processes of each reconciliation. Defaults to 1.
+        request_timeout (float, optional): time to wait for the request of the application after Bob started a reconciliation, and for Bob after a request of the application, in seconds. Defaults to 60.
+        key_store (Optional[KeyStore], optional): store to append the keys to, with the request id as session id. Defaults to None.
+    """
+    server = AsyncReconciliationServerAlice(
+        listening_host,
+        listening_port,
+        internal_endpoint,
+        max_sessions=max_sessions,
+        workers=workers,
+        request_timeout=request_timeout,
+        key_store=key_store,
+    )
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        logger.info("Stopping server.")
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    """Create the parser for qosst-pp-server-alice-async.
+
+    Returns:
+        argparse.ArgumentParser: the argument parser.
+    """
+    parser = argparse.ArgumentParser(prog="qosst-pp-server-alice-async")
+
+    parser.add_argument("--version", action="version", version=__version__)
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="Level of verbosity. If none, only critical errors will be prompted. -v will add warnings and errors, -vv will add info and -vvv will print all debug logs.",
+    )
+
+    parser.add_argument("remote_host", help="Address of the remote host to bind to.")
+    parser.add_argument(
+        "remote_port", help="Port of the remote host to bind to.", type=int
+    )
+    parser.add_argument("endpoint", help="Endpoint to bind the server to.")
+    parser.add_argument(
+        "--max-sessions",
+        type=int,
+        default=4,
+        help="Maximal number of concurrent reconciliations.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to decode the frames of each reconciliation in parallel.",
+    )
+    parser.add_argument(
+        "--request-timeout",
+        type=float,
+        default=60,
+        help="Time to wait for the request of the application after Bob started a reconciliation, and for Bob after a request of the application, in seconds.",
+    )
+    parser.add_argument(
+        "--key-store",
+        default=None,
+        help="Path of a key store to append the keys to, in addition to returning them.",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve the timings of the phases of the post-processing in the Prometheus text format over HTTP on this port.",
+    )
+    parser.add_argument(
+        "--metrics-host",
+        default="127.0.0.1",
+        help="Address to bind the metrics endpoint to. Use 0.0.0.0 to expose the metrics on the network.",
+    )
+
+    return parser
+
+
+def main():
+    """
+    Main entrypoint of qosst-pp-server-alice-async.
+    """
+    parser = _create_parser()
+
+    args = parser.parse_args()
+
+    create_loggers(args.verbose, None)
+
+    if args.metrics_port is not None:
+        start_metrics_server(args.metrics_port, host=args.metrics_host)
+
+    key_store = KeyStore(args.key_store) if args.key_store is not None else None
+
+    reconciliation_server_alice_async(
+        args.remote_host,
+        args.remote_port,
+        args.endpoint,
+        max_sessions=args.max_sessions,
+        workers=args.workers,
+        request_timeout=args.request_timeout,
+        key_store=key_store,
+    )
+
+    if key_store is not None:
+        key_store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -20,73 +20,280 @@ Reconciliation server for Bob.
 
 import logging
 import argparse
-from typing import List
+from typing import Optional
 
 import zmq
-import numpy as np
 
 from qosst_core.control_protocol.sockets import QOSSTClient
+from qosst_core.control_protocol.codes import QOSSTCodes
 from qosst_core.logging import create_loggers
 
 from qosst_pp import __version__
+from qosst_pp.encoding import ENCODINGS, LIST_ENCODING
+from qosst_pp.extractors import EXTRACTORS
+from qosst_pp.key_server import push_key
+from qosst_pp.key_store import KeyStore
+from qosst_pp.messages import recv_symbols, release_symbols, send_key
+from qosst_pp.metrics import start_metrics_server
+from qosst_pp.privacy_amplification import privacy_amplification_bob
 from qosst_pp.reconciliation.reconciliation import reconcile_bob
+from qosst_pp.seed_pool import SeedPool
 
 logger = logging.getLogger(__name__)
 
 
+def _connect(remote_host: str, remote_port: int) -> QOSSTClient:
+    """
+    Open a QOSST connection to Alice.
+
+    Args:
+        remote_host (str): address to connect to.
+        remote_port (int): port to connect to.
+
+    Raises:
+        OSError: if the connection fails.
+
+    Returns:
+        QOSSTClient: the connected socket.
+    """
+    logger.info("Starting QOSST socket.")
+    socket = QOSSTClient(remote_host, remote_port)
+    socket.open()
+
+    logger.info("Connecting to %s:%s", remote_host, remote_port)
+    try:
+        socket.connect()
+    except OSError:
+        socket.close()
+        raise
+    return socket
+
+
+# pylint: disable=too-many-locals, too-many-branches, too-many-statements, too-many-arguments, too-many-positional-arguments
 def reconciliation_server_bob(
-    remote_host: str, remote_port: int, internal_endpoint: str
+    remote_host: str,
+    remote_port: int,
+    internal_endpoint: str,
+    encoding: str = LIST_ENCODING,
+    session: bool = False,
+    workers: int = 1,
+    extractor: Optional[str] = None,
+    key_store: Optional[KeyStore] = None,
+    key_server: Optional[str] = None,
+    seed_pool: Optional[SeedPool] = None,
 ):
     """Start reconciliation server for Alice.
 
+    In session mode, the ZMQ socket and the QOSST connection are kept open
+    across requests. Otherwise, both sockets are re-created for each request.
+
+    If the request of the application contains a ``batch_size``, the
+    reconciliation is pipelined with batches of batch_size symbols.
+
+    If more than one worker is requested, the frames are encoded in parallel.
+    This requires the request of the application to contain the number of
+    symbols per LDPC frame in ``frame_size``.
+
+    If an extractor is given, the privacy amplification is performed with
+    this extractor right after the reconciliation, in the same QOSST session,
+    and only the final key is returned to the application. The request of the
+    application must then contain the ``secret_key_ratio``, and can contain a
+    ``pa_block_size`` to extract the key by blocks (see
+    :func:`qosst_pp.privacy_amplification.privacy_amplification_bob`).
+    Alice's server must use the same extractor.
+
+    The reconciliation is tagged with a request id, sent to Alice with the
+    messages of the reconciliation, if the request of the application contains
+    a ``request_id`` or in session mode, where it is otherwise a counter of the
+    requests handled by the server. Without request id, the messages are the
+    same as for Alices that do not support them.
+
+    If the connection to Alice is lost, an error is returned to the
+    application and, in session mode, a new connection is opened for the
+    next request.
+
+    If a key store is given, the keys returned to the application are also
+    appended to the store, with the request id as session id, and the position
+    of the block in the store is given in ``key_store_position``.
+
+    If a key server endpoint is given, the final keys returned to the
+    application are also pushed to the key server (see
+    :mod:`qosst_pp.key_server`). This requires an extractor, as the reconciled
+    key is not secret before the privacy amplification.
+
+    If a seed pool is given, the seeds of the privacy amplification are taken
+    from it instead of being generated on the critical path (see
+    :class:`qosst_pp.seed_pool.SeedPool`). The pool must be started, and
+    is stopped by the caller. This also requires an extractor.
+
     Args:
         remote_host (str): address to connect to for QOSST socket.
         remote_port (int): port to connect to for QOSST socket.
         internal_endpoint (str): endpoint for the ZMQ socket.
+        encoding (str, optional): encoding of the arrays sent to Alice. Defaults to LIST_ENCODING.
+        session (bool, optional): if True, keep the sockets open across requests. Defaults to False.
+        workers (int, optional): number of encoding and extraction processes. Defaults to 1.
+        extractor (Optional[str], optional): name of the extractor in :data:`qosst_pp.extractors.EXTRACTORS` to perform privacy amplification, or None to only perform reconciliation. Defaults to None.
+        key_store (Optional[KeyStore], optional): store to append the keys to. Defaults to None.
+        key_server (Optional[str], optional): ingest endpoint of a key server to push the final keys to. Defaults to None.
+        seed_pool (Optional[SeedPool], optional): pool to take the seeds of the privacy amplification from. Defaults to None.
+
+    Raises:
+        ValueError: if a key server or a seed pool is given without extractor.
     """
+    if key_server is not None and extractor is None:
+        raise ValueError("An extractor is required to push the keys to a key server.")
+    if seed_pool is not None and extractor is None:
+        raise ValueError("An extractor is required to use a seed pool.")
+    extractor_class = EXTRACTORS[extractor] if extractor is not None else None
     zmq_context = zmq.Context()
+    zmq_socket = None
+    key_server_socket = None
+    if key_server is not None:
+        logger.info("Pushing keys to the key server at %s", key_server)
+        key_server_socket = zmq_context.socket(zmq.PUSH)
+        key_server_socket.connect(key_server)
+    socket = None
+    request_counter = 0
     while True:
         try:
-            logger.info("Starting Bob reconciliation server")
+            if zmq_socket is None:
+                logger.info("Starting Bob reconciliation server")
 
-            # Create zmq listener to receive the data
-            logger.info("Creating ZMQ socket at %s", internal_endpoint)
-            zmq_socket = zmq_context.socket(zmq.REP)
-            zmq_socket.bind(internal_endpoint)
+                # Create zmq listener to receive the data
+                logger.info("Creating ZMQ socket at %s", internal_endpoint)
+                zmq_socket = zmq_context.socket(zmq.REP)
+                zmq_socket.bind(internal_endpoint)
 
             # Receive the data from Bob
             logger.info("Waiting for a request from Bob.")
-            data = zmq_socket.recv_json()
+            try:
+                data, bob_symbols, multipart = recv_symbols(zmq_socket, "bob_symbols")
+            except ValueError as exc:
+                logger.error("Invalid request (%s).", str(exc))
+                zmq_socket.send_json({"key": None, "error_message": str(exc)})
+                if not session:
+                    zmq_socket.close()
+                    zmq_socket = None
+                continue
 
             logger.info("Request received.")
 
-            bob_symbols = np.array(data["bob_symbols"])
+            if extractor_class is not None and not "secret_key_ratio" in data:
+                logger.error("secret_key_ratio is missing from the request.")
+                send_key(
+                    zmq_socket,
+                    None,
+                    multipart,
+                    error_message="secret_key_ratio is required for privacy amplification.",
+                )
+                release_symbols(data)
+                if not session:
+                    zmq_socket.close()
+                    zmq_socket = None
+                continue
+
             beta = data["beta"]
             signal_to_noise_ratio = data["signal_to_noise_ratio"]
             mdr_dimension = data["mdr_dimension"]
-
-            # Create QOSST socket
-            logger.info("Starting QOSST socket.")
-            socket = QOSSTClient(remote_host, remote_port)
-            socket.open()
-
-            logger.info("Connecting to %s:%s", remote_host, remote_port)
-            socket.connect()
-
-            logger.info("Starting reconciliation.")
-            key = reconcile_bob(
-                socket, bob_symbols, beta, signal_to_noise_ratio, mdr_dimension
-            )
-
-            logger.info("Reconciliation finished, returning keys.")
+            request_id = data.get("request_id")
+            if request_id is None and session:
+                request_id = request_counter
+            request_counter += 1
+
+            parameters = {"request_id": request_id}
+            try:
+                if socket is None:
+                    socket = _connect(remote_host, remote_port)
+
+                logger.info("Starting reconciliation (request id %s).", str(request_id))
+                key = reconcile_bob(
+                    socket,
+                    bob_symbols,
+                    beta,
+                    signal_to_noise_ratio,
+                    mdr_dimension,
+                    encoding=encoding,
+                    request_id=request_id,
+                    batch_size=data.get("batch_size"),
+                    workers=workers,
+                    frame_size=data.get("frame_size"),
+                )
+
+                if extractor_class is not None and key is not None and len(key) == 0:
+                    # Alice has the same empty key and skips the privacy amplification too
+                    logger.error(
+                        "Every frame was discarded, the reconciled key is empty."
+                    )
+                    parameters["error_message"] = "The reconciled key is empty."
+                    key = None
+                if extractor_class is not None and key is not None:
+                    logger.info(
+                        "Reconciliation finished, starting privacy amplification."
+                    )
+                    parameters["reconciled_key_length"] = len(key)
+                    try:
+                        key = privacy_amplification_bob(
+                            socket,
+                            key,
+                            data["secret_key_ratio"],
+                            extractor_class,
+                            encoding=encoding,
+                            seed_pool=seed_pool,
+                            block_size=data.get("pa_block_size"),
+                            workers=workers,
+                        )
+                    except ValueError as exc:
+                        logger.error("Privacy amplification failed (%s).", str(exc))
+                        socket.request(QOSSTCodes.ABORT, {"error_message": str(exc)})
+                        key = None
+                    if key is None:
+                        parameters["error_message"] = "Privacy amplification failed."
+            except OSError as exc:
+                logger.error("Connection to Alice failed (%s).", str(exc))
+                if socket is not None:
+                    socket.close()
+                    socket = None
+                send_key(
+                    zmq_socket,
+                    None,
+                    multipart,
+                    error_message=f"Connection to Alice failed: {exc}",
+                    **parameters,
+                )
+                release_symbols(data)
+                if not session:
+                    zmq_socket.close()
+                    zmq_socket = None
+                continue
+
+            if key_store is not None and key is not None:
+                parameters["key_store_position"] = key_store.append(
+                    key, session_id="" if request_id is None else str(request_id)
+                )
+
+            if key_server_socket is not None and key is not None:
+                push_key(key_server_socket, key)
+
+            logger.info("Post-processing finished, returning keys.")
             # Return key to the application
-            zmq_socket.send_json({"key": key})
-
-            logger.info("Closing sockets.")
-            socket.close()
-            zmq_socket.close()
+            send_key(zmq_socket, key, multipart, **parameters)
+            release_symbols(data)
+
+            if not session:
+                logger.info("Closing sockets.")
+                socket.close()
+                zmq_socket.close()
+                socket = None
+                zmq_socket = None
         except KeyboardInterrupt:
             logger.info("Stopping server.")
+            if socket is not None:
+                socket.close()
+            if zmq_socket is not None:
+                zmq_socket.close()
+            if key_server_socket is not None:
+                key_server_socket.close()
             zmq_context.term()
             return
 
@@ -113,6 +320,56 @@ def _create_parser() -> argparse.ArgumentParser:
         "remote_port", help="Port of the remote host to connect to.", type=int
     )
     parser.add_argument("endpoint", help="Endpoint to bind the server to.")
+    parser.add_argument(
+        "--encoding",
+        choices=ENCODINGS,
+        default=LIST_ENCODING,
+        help="Encoding of the arrays sent to Alice. The binary encoding is more compact but requires a compatible Alice.",
+    )
+    parser.add_argument(
+        "--session",
+        action="store_true",
+        help="Keep the ZMQ socket and the QOSST connection open across requests.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to encode the frames in parallel (the requests must then contain the frame_size) and to extract the key blocks.",
+    )
+    parser.add_argument(
+        "--extractor",
+        choices=EXTRACTORS,
+        default=None,
+        help="Perform privacy amplification with this extractor after the reconciliation and only return the final key. The requests must then contain the secret_key_ratio.",
+    )
+    parser.add_argument(
+        "--key-store",
+        default=None,
+        help="Path of a key store to append the keys to, in addition to returning them.",
+    )
+    parser.add_argument(
+        "--key-server",
+        default=None,
+        help="Ingest endpoint of a key server (qosst-pp-keyserver) to push the final keys to, in addition to returning them. Requires --extractor.",
+    )
+    parser.add_argument(
+        "--seed-pool",
+        type=int,
+        default=None,
+        help="Generate the seeds of the extractor in the background, keeping up to this number of random bits ready. It should be at least the seed size of an extraction. Requires --extractor.",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve the timings of the phases of the post-processing in the Prometheus text format over HTTP on this port.",
+    )
+    parser.add_argument(
+        "--metrics-host",
+        default="127.0.0.1",
+        help="Address to bind the metrics endpoint to. Use 0.0.0.0 to expose the metrics on the network.",
+    )
 
     return parser
 
@@ -125,9 +382,42 @@ def main():
 
     args = parser.parse_args()
 
+    if args.key_server is not None and args.extractor is None:
+        parser.error(
+            "--key-server requires --extractor, as only the final keys can be pushed to the key server."
+        )
+    if args.seed_pool is not None and args.extractor is None:
+        parser.error("--seed-pool requires --extractor.")
+    if args.seed_pool is not None and args.seed_pool <= 0:
+        parser.error("--seed-pool must be positive.")
+
     create_loggers(args.verbose, None)
 
-    reconciliation_server_bob(args.remote_host, args.remote_port, args.endpoint)
+    if args.metrics_port is not None:
+        start_metrics_server(args.metrics_port, host=args.metrics_host)
+
+    key_store = KeyStore(args.key_store) if args.key_store is not None else None
+    seed_pool = SeedPool(args.seed_pool) if args.seed_pool is not None else None
+    if seed_pool is not None:
+        seed_pool.start()
+
+    reconciliation_server_bob(
+        args.remote_host,
+        args.remote_port,
+        args.endpoint,
+        encoding=args.encoding,
+        session=args.session,
+        workers=args.workers,
+        extractor=args.extractor,
+        key_store=key_store,
+        key_server=args.key_server,
+        seed_pool=seed_pool,
+    )
+
+    if seed_pool is not None:
+        seed_pool.stop()
+    if key_store is not None:
+        key_store.close()
 
 
 if __name__ == "__main__":
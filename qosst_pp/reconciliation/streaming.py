@@ -0,0 +1,242 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Module defining the streaming error reconciliation.
+
+The symbols are given as an iterable of chunks (for instance read from a
+memory-mapped file or from the acquisition) instead of a single array, and the
+reconciled key is yielded chunk by chunk, as soon as each chunk is confirmed by
+both parties. Only a few chunks are kept in memory at once, so arbitrarily long
+acquisitions can be reconciled, and the key is available before the end of the
+acquisition.
+
+The streaming reconciliation uses the pipelined protocol (see
+:func:`qosst_pp.reconciliation.reconciliation.reconcile_bob`), each chunk of
+Bob being a batch. It is hence compatible with a non-streaming Alice.
+"""
+
+import logging
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+from qosst_core.control_protocol.sockets import QOSSTClient, QOSSTServer
+from qosst_core.control_protocol.codes import QOSSTCodes
+
+from qosst_pp.encoding import LIST_ENCODING, get_encoding
+from qosst_pp.reconciliation.reconciliation import (
+    _parse_initialization,
+    _reconcile_alice_batches,
+    _reconcile_bob_batches,
+)
+
+if TYPE_CHECKING:
+    from qosst_pp.reconciliation.decoding_workers import DecodingDispatcher
+
+logger = logging.getLogger(__name__)
+
+
+# pylint: disable=too-few-public-methods
+class _SymbolStream:
+    """
+    Buffer of the symbols read from an iterable of chunks.
+
+    The symbols are requested by increasing offsets, and the symbols before the
+    last requested ones are dropped.
+    """
+
+    def __init__(self, chunks: Iterable[np.ndarray]):
+        """
+        Args:
+            chunks (Iterable[np.ndarray]): the chunks of symbols.
+        """
+        self._chunks = iter(chunks)
+        self._buffer: Optional[np.ndarray] = None
+        self._start = 0
+
+    def get(self, offset: int, count: int) -> np.ndarray:
+        """
+        Get symbols from the stream.
+
+        Args:
+            offset (int): offset of the first symbol.
+            count (int): number of symbols.
+
+        Raises:
+            ValueError: if the symbols were already dropped or if the stream ends before them.
+
+        Returns:
+            np.ndarray: the symbols.
+        """
+        if offset < self._start:
+            raise ValueError(
+                f"Symbols before offset {self._start} were already dropped."
+            )
+        end = offset + count
+        parts = [] if self._buffer is None else [self._buffer]
+        available = self._start + sum(len(part) for part in parts)
+        while available < end:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                raise ValueError(
+                    f"The stream ended after {available} symbols, {end} were expected."
+                )
+            parts.append(np.asarray(chunk))
+            available += len(parts[-1])
+
+        buffer = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        symbols = buffer[offset - self._start : end - self._start]
+        self._buffer = buffer[end - self._start :]
+        self._start = end
+        return symbols
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+def reconcile_alice_stream(
+    socket: QOSSTServer,
+    symbol_chunks: Iterable[np.ndarray],
+    mdr_dimension: int,
+    data: Optional[Dict],
+    request_id: Optional[Union[int, str]] = None,
+    workers: int = 1,
+    dispatcher: Optional["DecodingDispatcher"] = None,
+) -> Iterator[Optional[np.ndarray]]:
+    """Perform the streaming error reconciliation at Alice side.
+
+    This function starts after receiving the first EC_INITIALIZATION message
+    from Bob, who must use the pipelined mode (for instance with
+    :func:`reconcile_bob_stream`). The symbols of Alice are read from the chunks
+    when the batches of Bob are decoded, the chunks of Alice and the batches of
+    Bob not having to be aligned.
+
+    The reconciliation is performed while iterating over the returned generator.
+
+    Args:
+        socket (QOSSTServer): socket of the server of Alice.
+        symbol_chunks (Iterable[np.ndarray]): symbols of Alice, as chunks of real numbers.
+        mdr_dimension (int): dimension of the multidimensional reconciliation.
+        data (Optional[Dict]): data of the received EC_INITIALIZATION message.
+        request_id (Optional[Union[int, str]], optional): expected request id. Defaults to None.
+        workers (int, optional): number of decoding processes. Defaults to 1.
+        dispatcher (Optional[DecodingDispatcher], optional): dispatcher to the decoding workers, used instead of the pool of processes. Defaults to None.
+
+    Yields:
+        Optional[np.ndarray]: the reconciled key of each batch of Bob, as an array of bits, or None in case of error, after which the generator stops.
+    """
+    try:
+        encoding = get_encoding(data) if data else LIST_ENCODING
+        data = _parse_initialization(data, request_id)
+    except ValueError as exc:
+        logger.error("Invalid EC_INITIALIZATION content (%s).", str(exc))
+        socket.send(QOSSTCodes.INVALID_CONTENT, {"error_message": str(exc)})
+        yield None
+        return
+
+    if "batch_index" not in data:
+        message = "Streaming reconciliation requires Bob to use the pipelined mode."
+        logger.error(message)
+        socket.send(QOSSTCodes.INVALID_CONTENT, {"error_message": message})
+        yield None
+        return
+
+    yield from _reconcile_alice_batches(
+        socket,
+        _SymbolStream(symbol_chunks).get,
+        mdr_dimension,
+        data,
+        encoding,
+        workers,
+        dispatcher,
+    )
+
+
+def _aligned_chunks(
+    symbol_chunks: Iterable[np.ndarray], mdr_dimension: int, frame_size: Optional[int]
+) -> Iterator[np.ndarray]:
+    """
+    Check that the chunks of Bob contain complete frames.
+
+    Args:
+        symbol_chunks (Iterable[np.ndarray]): bob symbols, as chunks of real numbers.
+        mdr_dimension (int): dimension of the multi-dimensional scheme.
+        frame_size (Optional[int]): number of symbols per LDPC frame, if known.
+
+    Raises:
+        ValueError: if the length of a chunk is not a multiple of the MDR dimension, or of the frame size if it is known.
+
+    Yields:
+        np.ndarray: the chunks.
+    """
+    for index, chunk in enumerate(symbol_chunks):
+        if len(chunk) % mdr_dimension:
+            raise ValueError(
+                f"Chunk {index} has {len(chunk)} symbols, which is not a multiple of the MDR dimension ({mdr_dimension})."
+            )
+        if frame_size and len(chunk) % frame_size:
+            raise ValueError(
+                f"Chunk {index} has {len(chunk)} symbols, which is not a multiple of the frame size ({frame_size})."
+            )
+        yield chunk
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+def reconcile_bob_stream(
+    socket: QOSSTClient,
+    symbol_chunks: Iterable[np.ndarray],
+    beta: float,
+    signal_to_noise_ratio: float,
+    mdr_dimension: int,
+    encoding: str = LIST_ENCODING,
+    request_id: Optional[Union[int, str]] = None,
+    workers: int = 1,
+    frame_size: Optional[int] = None,
+) -> Iterator[Optional[np.ndarray]]:
+    """Perform the streaming error reconciliation at Bob side.
+
+    Each chunk of symbols is reconciled as a batch of the pipelined mode (see
+    :func:`qosst_pp.reconciliation.reconciliation.reconcile_bob`): the chunks
+    must contain a multiple of the length of the LDPC frames, as the symbols
+    that do not fill a complete frame are not reconciled. This is checked for
+    the MDR dimension, and for the frame size if it is given. The chunks are
+    read one chunk in advance, to know which one is the last.
+
+    The reconciliation is performed while iterating over the returned generator.
+
+    Args:
+        socket (QOSSTClient): client socket of Bob.
+        symbol_chunks (Iterable[np.ndarray]): bob symbols, as chunks of real numbers.
+        beta (float): reconciliation effiency, from which the rate is derived.
+        signal_to_noise_ratio (float): signal to noise ratio of the quantum data.
+        mdr_dimension (int): dimension of the multi-dimensional scheme.
+        encoding (str, optional): encoding of the arrays in the messages. Defaults to LIST_ENCODING.
+        request_id (Optional[Union[int, str]], optional): id of the request. Defaults to None.
+        workers (int, optional): number of encoding processes. Defaults to 1.
+        frame_size (Optional[int], optional): number of symbols per LDPC frame, required to encode in parallel. Defaults to None.
+
+    Raises:
+        ValueError: if a chunk does not contain a multiple of the MDR dimension (or of the frame size) symbols. Alice is notified before the error is raised.
+
+    Yields:
+        Optional[np.ndarray]: the reconciled key of each chunk, as an array of bits, or None in case of error, after which the generator stops.
+    """
+    yield from _reconcile_bob_batches(
+        socket,
+        _aligned_chunks(symbol_chunks, mdr_dimension, frame_size),
+        (beta, signal_to_noise_ratio, mdr_dimension, workers, frame_size),
+        encoding,
+        request_id,
+    )
@@ -0,0 +1,183 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Module defining a pool of random seeds generated in the background.
+
+The seed of the extractor used for privacy amplification is as long as the
+reconciled key (or longer), and generating it is on the critical path of Bob.
+The pool generates random bytes in a background thread, from a configurable
+randomness source, so that the seeds can be taken from the pool when needed.
+"""
+
+import logging
+import secrets
+import threading
+from collections import deque
+from typing import Callable, Deque, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# pylint: disable=too-many-instance-attributes
+class SeedPool:
+    """
+    Pool of random bits filled in a background thread.
+
+    The pool holds up to capacity bits, that should be set to the seed size of
+    the expected extractions (e.g. n+m-1 bits for a (n,m) Toeplitz extractor),
+    or a multiple of it. The random bits are never given twice.
+
+    If the pool does not contain enough bits when a seed is requested, the
+    missing bits are generated directly from the source, so that a seed is
+    always returned.
+
+    The pool can be used as a context manager, which starts and stops the
+    background thread.
+    """
+
+    capacity: int  #: Maximal number of bits in the pool.
+    chunk_size: int  #: Number of bytes generated at once by the background thread.
+
+    def __init__(
+        self,
+        capacity: int,
+        source: Callable[[int], bytes] = secrets.token_bytes,
+        chunk_size: int = 1 << 16,
+    ):
+        """
+        Args:
+            capacity (int): maximal number of bits in the pool.
+            source (Callable[[int], bytes], optional): randomness source, returning the given number of random bytes. Defaults to secrets.token_bytes.
+            chunk_size (int, optional): number of bytes generated at once by the background thread. Defaults to 1 << 16.
+        """
+        self.capacity = capacity
+        self.chunk_size = chunk_size
+        self._source = source
+        self._chunks: Deque[bytes] = deque()
+        self._available = 0
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    @property
+    def available(self) -> int:
+        """
+        Number of bits currently in the pool.
+
+        Returns:
+            int: the number of bits in the pool.
+        """
+        with self._condition:
+            return 8 * self._available
+
+    def start(self):
+        """
+        Start the background thread filling the pool.
+        """
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        logger.info("Starting seed pool with a capacity of %i bits.", self.capacity)
+        self._thread = threading.Thread(
+            target=self._fill, name="qosst-pp-seed-pool", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread filling the pool.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        logger.info("Seed pool stopped.")
+
+    def _fill(self):
+        """
+        Fill the pool until it is stopped (executed in the background thread).
+        """
+        capacity = -(-self.capacity // 8)
+        while True:
+            with self._condition:
+                while self._running and self._available >= capacity:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                size = min(self.chunk_size, capacity - self._available)
+
+            # Generate outside of the lock, as it can be long
+            chunk = self._source(size)
+
+            with self._condition:
+                self._chunks.append(chunk)
+                self._available += len(chunk)
+
+    def _take(self, num_bytes: int) -> bytes:
+        """
+        Take bytes from the pool, and generate the missing ones from the source.
+
+        Args:
+            num_bytes (int): number of bytes.
+
+        Returns:
+            bytes: the random bytes.
+        """
+        parts = []
+        missing = num_bytes
+        with self._condition:
+            while missing and self._chunks:
+                chunk = self._chunks.popleft()
+                if len(chunk) > missing:
+                    self._chunks.appendleft(chunk[missing:])
+                    chunk = chunk[:missing]
+                parts.append(chunk)
+                missing -= len(chunk)
+                self._available -= len(chunk)
+            self._condition.notify_all()
+
+        if missing:
+            logger.debug(
+                "Seed pool is missing %i bytes, generating them directly.", missing
+            )
+            parts.append(self._source(missing))
+        return b"".join(parts)
+
+    def get(self, num_bits: int) -> np.ndarray:
+        """
+        Get random bits from the pool.
+
+        Args:
+            num_bits (int): number of bits.
+
+        Returns:
+            np.ndarray: the random bits, as an array of uint8.
+        """
+        buffer = self._take(-(-num_bits // 8))
+        return np.unpackbits(np.frombuffer(buffer, dtype=np.uint8), count=num_bits)
+
+    def __enter__(self) -> "SeedPool":
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
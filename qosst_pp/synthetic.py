@@ -0,0 +1,234 @@
+# qosst-pp - Post processing module of the Quantum Open Software for Secure Transmissions.
+# Copyright (C) 2021-2025 Yoann Piétri
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Module defining a generator of synthetic CV-QKD data, e.g. for load testing.
+
+The symbols of Alice are Gaussian with a variance equal to the signal to noise
+ratio, and the symbols of Bob are the symbols of Alice with an additive
+Gaussian noise of unit variance, so that the signal to noise ratio of the
+channel is the requested one. The symbols are real-valued, as expected by
+:func:`qosst_pp.reconciliation.reconciliation.reconcile_alice` and
+:func:`qosst_pp.reconciliation.reconciliation.reconcile_bob`, and their number
+is a multiple of the dimension of the multidimensional reconciliation.
+
+The symbols are generated chunk by chunk, directly in the output arrays, which
+can be memory-mapped ``.npy`` files for acquisitions larger than the memory.
+The symbols of Alice and the noise are drawn from two independent generators
+derived from the seed, so that the same seed gives the same symbols whatever
+the size of the chunks.
+"""
+
+import logging
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from numpy.typing import DTypeLike
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1 << 20  #: Default number of symbols generated at once.
+
+
+def _generators(
+    seed: Optional[int],
+) -> Tuple[np.random.Generator, np.random.Generator]:
+    """
+    Create the generators of the symbols of Alice and of the noise.
+
+    Args:
+        seed (Optional[int]): seed of the generation, or None for a random seed.
+
+    Returns:
+        Tuple[np.random.Generator, np.random.Generator]: the generators of the symbols of Alice and of the noise.
+    """
+    alice_seed, noise_seed = np.random.SeedSequence(seed).spawn(2)
+    return np.random.default_rng(alice_seed), np.random.default_rng(noise_seed)
+
+
+def _check_sizes(num_symbols: int, mdr_dimension: int, chunk_size: int) -> int:
+    """
+    Check the number of symbols and align the size of the chunks.
+
+    Args:
+        num_symbols (int): number of symbols.
+        mdr_dimension (int): dimension of the multidimensional reconciliation.
+        chunk_size (int): requested number of symbols per chunk.
+
+    Raises:
+        ValueError: if the number of symbols is not a positive multiple of the dimension.
+
+    Returns:
+        int: the number of symbols per chunk, rounded down to a multiple of the dimension.
+    """
+    if mdr_dimension < 1 or num_symbols < 1 or num_symbols % mdr_dimension:
+        raise ValueError(
+            f"The number of symbols ({num_symbols}) must be a positive multiple of the MDR dimension ({mdr_dimension})."
+        )
+    return max(chunk_size - chunk_size % mdr_dimension, mdr_dimension)
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+def _fill(
+    alice_symbols: np.ndarray,
+    bob_symbols: np.ndarray,
+    signal_to_noise_ratio: float,
+    chunk_size: int,
+    seed: Optional[int],
+):
+    """
+    Generate the symbols of Alice and Bob in place, chunk by chunk.
+
+    Args:
+        alice_symbols (np.ndarray): array of the symbols of Alice.
+        bob_symbols (np.ndarray): array of the symbols of Bob.
+        signal_to_noise_ratio (float): signal to noise ratio of the channel.
+        chunk_size (int): number of symbols generated at once.
+        seed (Optional[int]): seed of the generation.
+    """
+    alice_rng, noise_rng = _generators(seed)
+    scale = np.sqrt(signal_to_noise_ratio)
+    for start in range(0, len(alice_symbols), chunk_size):
+        alice = alice_symbols[start : start + chunk_size]
+        bob = bob_symbols[start : start + chunk_size]
+        alice_rng.standard_normal(out=alice, dtype=alice.dtype)
+        alice *= scale
+        noise_rng.standard_normal(out=bob, dtype=bob.dtype)
+        bob += alice
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+def generate_symbols(
+    num_symbols: int,
+    signal_to_noise_ratio: float,
+    mdr_dimension: int,
+    seed: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dtype: DTypeLike = np.float64,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Generate correlated symbols for Alice and Bob in memory.
+
+    Args:
+        num_symbols (int): number of symbols, multiple of the MDR dimension.
+        signal_to_noise_ratio (float): signal to noise ratio of the channel.
+        mdr_dimension (int): dimension of the multidimensional reconciliation.
+        seed (Optional[int], optional): seed of the generation, or None for a random seed. Defaults to None.
+        chunk_size (int, optional): number of symbols generated at once. Defaults to DEFAULT_CHUNK_SIZE.
+        dtype (DTypeLike, optional): type of the symbols, np.float64 or np.float32. Defaults to np.float64.
+
+    Raises:
+        ValueError: if the number of symbols is not a positive multiple of the MDR dimension.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the symbols of Alice and Bob.
+    """
+    chunk_size = _check_sizes(num_symbols, mdr_dimension, chunk_size)
+    alice_symbols = np.empty(num_symbols, dtype=dtype)
+    bob_symbols = np.empty(num_symbols, dtype=dtype)
+    _fill(alice_symbols, bob_symbols, signal_to_noise_ratio, chunk_size, seed)
+    return alice_symbols, bob_symbols
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+def generate_symbol_chunks(
+    num_symbols: int,
+    signal_to_noise_ratio: float,
+    mdr_dimension: int,
+    seed: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dtype: DTypeLike = np.float64,
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Generate correlated symbols for Alice and Bob chunk by chunk.
+
+    The chunks are the same as the slices of the arrays returned by
+    :func:`generate_symbols` with the same seed, and can for instance be given
+    to the streaming reconciliation (see :mod:`qosst_pp.reconciliation.streaming`).
+    Each chunk is a new array.
+
+    Args:
+        num_symbols (int): total number of symbols, multiple of the MDR dimension.
+        signal_to_noise_ratio (float): signal to noise ratio of the channel.
+        mdr_dimension (int): dimension of the multidimensional reconciliation.
+        seed (Optional[int], optional): seed of the generation, or None for a random seed. Defaults to None.
+        chunk_size (int, optional): number of symbols per chunk, rounded down to a multiple of the MDR dimension. Defaults to DEFAULT_CHUNK_SIZE.
+        dtype (DTypeLike, optional): type of the symbols, np.float64 or np.float32. Defaults to np.float64.
+
+    Raises:
+        ValueError: if the number of symbols is not a positive multiple of the MDR dimension.
+
+    Yields:
+        Tuple[np.ndarray, np.ndarray]: the symbols of Alice and Bob of each chunk.
+    """
+    chunk_size = _check_sizes(num_symbols, mdr_dimension, chunk_size)
+    alice_rng, noise_rng = _generators(seed)
+    scale = np.sqrt(signal_to_noise_ratio)
+    for start in range(0, num_symbols, chunk_size):
+        size = min(chunk_size, num_symbols - start)
+        alice = alice_rng.standard_normal(size, dtype=dtype)
+        alice *= scale
+        bob = noise_rng.standard_normal(size, dtype=dtype)
+        bob += alice
+        yield alice, bob
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+def write_symbols(
+    alice_path: str,
+    bob_path: str,
+    num_symbols: int,
+    signal_to_noise_ratio: float,
+    mdr_dimension: int,
+    seed: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dtype: DTypeLike = np.float64,
+) -> Tuple[np.memmap, np.memmap]:
+    """
+    Generate correlated symbols for Alice and Bob in memory-mapped ``.npy`` files.
+
+    The files can be loaded with ``np.load(path, mmap_mode="r")``, or given to
+    the reconciliation servers in the ``symbols_file`` field of the requests
+    (see :mod:`qosst_pp.messages`).
+
+    Args:
+        alice_path (str): path of the file of the symbols of Alice.
+        bob_path (str): path of the file of the symbols of Bob.
+        num_symbols (int): number of symbols, multiple of the MDR dimension.
+        signal_to_noise_ratio (float): signal to noise ratio of the channel.
+        mdr_dimension (int): dimension of the multidimensional reconciliation.
+        seed (Optional[int], optional): seed of the generation, or None for a random seed. Defaults to None.
+        chunk_size (int, optional): number of symbols generated at once. Defaults to DEFAULT_CHUNK_SIZE.
+        dtype (DTypeLike, optional): type of the symbols, np.float64 or np.float32. Defaults to np.float64.
+
+    Raises:
+        ValueError: if the number of symbols is not a positive multiple of the MDR dimension.
+
+    Returns:
+        Tuple[np.memmap, np.memmap]: the memory-mapped symbols of Alice and Bob.
+    """
+    chunk_size = _check_sizes(num_symbols, mdr_dimension, chunk_size)
+    alice_symbols = np.lib.format.open_memmap(
+        alice_path, mode="w+", dtype=dtype, shape=(num_symbols,)
+    )
+    bob_symbols = np.lib.format.open_memmap(
+        bob_path, mode="w+", dtype=dtype, shape=(num_symbols,)
+    )
+    _fill(alice_symbols, bob_symbols, signal_to_noise_ratio, chunk_size, seed)
+    alice_symbols.flush()
+    bob_symbols.flush()
+    logger.info("%i symbols written to %s and %s.", num_symbols, alice_path, bob_path)
+    return alice_symbols, bob_symbols